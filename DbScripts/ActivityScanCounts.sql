@@ -0,0 +1,17 @@
+-- Create ActivityScanCounts Table
+-- Per-activity scan totals, kept up to date in the same transaction as every scan insert
+CREATE TABLE activity_scan_counts (
+    activity_id INT PRIMARY KEY,
+    activity_category NVARCHAR(255) NOT NULL,
+    scan_count INT NOT NULL DEFAULT 0,
+    FOREIGN KEY (activity_id) REFERENCES Activities(id) ON DELETE CASCADE
+);
+GO
+
+-- Backfill from existing scans (same as `flask rebuild-scan-counts`)
+INSERT INTO activity_scan_counts (activity_id, activity_category, scan_count)
+SELECT Activities.id, Activities.activity_category, COUNT(Scans.id)
+FROM Activities
+JOIN Scans ON Scans.activity_id = Activities.id
+GROUP BY Activities.id, Activities.activity_category;
+GO
@@ -0,0 +1,21 @@
+-- Indexes for the scan tables
+-- Kept in sync with app/models/models.py (__table_args__) and app/migrations/versions/0003_scan_indexes.py
+
+-- Per-activity time ranges (/scan_count_by_time_period) and summary rebuilds
+CREATE INDEX ix_scans_activity_id_scanned_at ON Scans (activity_id, scanned_at);
+GO
+
+-- A user's scans (user profile endpoints); covers the columns they read
+CREATE INDEX ix_scans_user_id ON Scans (user_id) INCLUDE (activity_id, scanned_at);
+GO
+
+-- Time-range reads across all activities
+CREATE INDEX ix_scans_scanned_at ON Scans (scanned_at);
+GO
+
+-- Networking lists, paginated by (scanned_at, id)
+CREATE INDEX ix_userscans_scanner_id_scanned_at ON UserScans (scanner_id, scanned_at, id);
+GO
+
+CREATE INDEX ix_userscans_scanned_id_scanned_at ON UserScans (scanned_id, scanned_at, id);
+GO
@@ -1,15 +1,109 @@
-from flask import Flask
+import atexit
+from functools import partial
+from flask import Flask, request
 from config.config import Config
-from app.database import db, get_db
+from app.database import db, engine_options, configure_engine, new_session, close_db, database_clock
+from app.cache.badge_cache import badge_cache, badge_cache_ttl
+from app.cache.network_graph import network_graph
+from app.cache.recent_scans import recent_scans
+from app.cache.scan_feed import scan_feed
+from app.cache.response_cache import response_cache, make_backend
+from app.replicas import replica_router, pin_writes_to_primary
+from app.serializers.json_provider import install_json_provider
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
-    # Load configuration
+    # Load configuration, with optional overrides (e.g. from the benchmark driver)
     app.config.from_object(Config)
+    if config:
+        app.config.update(config)
 
-    # Initialize database
+    # Initialize database with pool settings for the configured backend
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **engine_options(app.config),
+        **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {})
+    }
+    replicas = [f"replica_{i}" for i in range(len(app.config["DATABASE_REPLICA_URLS"]))]
+    app.config["SQLALCHEMY_BINDS"] = {
+        **app.config.get("SQLALCHEMY_BINDS", {}),
+        **{
+            name: {"url": url, **engine_options(app.config, url)}
+            for name, url in zip(replicas, app.config["DATABASE_REPLICA_URLS"])
+        }
+    }
     db.init_app(app)
+    database_clock.configure(app.config["DB_TIMEZONE"], app.config["SQLALCHEMY_DATABASE_URI"])
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        for name in replicas:
+            configure_engine(db.engines[name], app.config)
+
+        # Route GET reads to the replicas, keeping clients that just wrote on the primary
+        replica_router.configure(
+            {name: db.engines[name] for name in replicas},
+            max_lag=app.config["DB_REPLICA_MAX_LAG_SECONDS"],
+            check_interval=app.config["DB_REPLICA_CHECK_INTERVAL"],
+            retry_after=app.config["DB_REPLICA_RETRY_SECONDS"]
+        )
+    if replicas:
+        window = app.config["DB_REPLICA_MAX_LAG_SECONDS"]
+        app.after_request(lambda response: pin_writes_to_primary(response, request, window))
+
+    # Close each request's sessions and hand their connections back to the pool
+    app.teardown_appcontext(close_db)
+
+    # Size the badge lookup cache from the loaded configuration
+    badge_cache.configure(app.config["BADGE_CACHE_SIZE"], badge_cache_ttl(app.config))
+
+    # The networking graph is loaded on first use (or by the server's warm-up)
+    network_graph.configure(app.config["NETWORK_GRAPH_REFRESH_SECONDS"], app.config["NETWORK_GRAPH_COMPACT_EDGES"])
+
+    # Repeat scans within these windows return the first scan instead of inserting
+    recent_scans.configure(
+        app.config["SCAN_DEDUPE_WINDOW_SECONDS"],
+        app.config["SCAN_DEDUPE_CATEGORY_WINDOWS"],
+        app.config["SCAN_DEDUPE_ACTIVITY_WINDOWS"],
+        app.config["USER_SCAN_DEDUPE_WINDOW_SECONDS"],
+        app.config["SCAN_DEDUPE_MAX_ENTRIES"]
+    )
+
+    # Live scan count streams; the counts are loaded by the first stream. Each stream
+    # holds a server thread while open, so always leave one for other requests
+    scan_feed.configure(
+        app.config["SCAN_STREAM_MAX_RATE"],
+        app.config["SCAN_STREAM_HEARTBEAT_SECONDS"],
+        app.config["SCAN_STREAM_RECONCILE_SECONDS"],
+        max(min(app.config["SCAN_STREAM_MAX_CLIENTS"], app.config["WEB_THREADS"] - 1), 0)
+    )
+
+    # Tag-invalidated response cache; with replicas, responses read right after a write
+    # to one of their tags aren't stored, since the replica may not have it yet
+    response_cache.configure(
+        make_backend(app.config),
+        stale_window=app.config["DB_REPLICA_MAX_LAG_SECONDS"] if replicas else 0.0,
+        lock_timeout=app.config["RESPONSE_CACHE_LOCK_TIMEOUT"]
+    )
+
+    # Optional write-behind ingestion for PUT /scan/<badge_code>
+    if app.config["SCAN_INGEST_MODE"] == "buffered":
+        from app.ingest.scan_buffer import ScanBuffer
+        with app.app_context():
+            engine = db.engine
+        scan_buffer = ScanBuffer(
+            partial(new_session, engine),
+            max_size=app.config["SCAN_BUFFER_MAX_SIZE"],
+            batch_size=app.config["SCAN_BUFFER_BATCH_SIZE"],
+            flush_interval_ms=app.config["SCAN_BUFFER_FLUSH_INTERVAL_MS"],
+            durability=app.config["SCAN_BUFFER_DURABILITY"],
+            enqueue_timeout=app.config["SCAN_BUFFER_ENQUEUE_TIMEOUT"],
+            ack_timeout=app.config["SCAN_BUFFER_ACK_TIMEOUT"]
+        )
+        app.extensions["scan_buffer"] = scan_buffer
+        atexit.register(scan_buffer.stop)
+
+    # Faster JSON encoding when orjson is available; before the metrics wrap app.json
+    install_json_provider(app)
 
     # Register Blueprints (Routes)
     from app.routes.user_routes import user_bp
@@ -18,5 +112,20 @@ def create_app():
     app.register_blueprint(scan_bp)
     from app.routes.user_scan_routes import user_scan_bp
     app.register_blueprint(user_scan_bp)
+    from app.routes.network_routes import network_bp
+    app.register_blueprint(network_bp)
+
+    # Statement budgets, N+1 detection and the slow-query log
+    from app.diagnostics.query_budget import init_query_budget
+    with app.app_context():
+        init_query_budget(app, db.engines.values())
+
+    # Request and database instrumentation, exposed on /metrics
+    from app.metrics.instrumentation import init_metrics
+    init_metrics(app)
+
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
 
     return app
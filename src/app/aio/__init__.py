@@ -0,0 +1,62 @@
+from quart import Quart
+from config.config import Config
+from app.aio.caches import init_cache_loading
+from app.aio.database import init_async_db
+from app.cache.badge_cache import badge_cache, badge_cache_ttl
+from app.cache.network_graph import network_graph
+from app.cache.recent_scans import recent_scans
+from app.cache.scan_feed import scan_feed
+from app.serializers.json_provider import install_json_provider
+
+
+def create_async_app(config=None):
+    """
+    Builds the asyncio variant of the API: the same endpoints and JSON as `create_app`,
+    served by async handlers on an AsyncEngine, so a worker keeps serving other
+    requests while one waits on the database. Run it with an ASGI server, e.g.
+    `hypercorn main_async:app`. Needs the packages in requirements-async.txt.
+
+    Read replicas, the write-behind scan buffer, the response cache, query budgets and
+    /metrics are only wired into the sync app.
+    Args:
+        config (dict, optional): Overrides for the loaded configuration.
+    Returns:
+        Quart: The application.
+    """
+    app = Quart(__name__)
+
+    app.config.from_object(Config)
+    if config:
+        app.config.update(config)
+
+    init_async_db(app)
+    init_cache_loading(app)
+    badge_cache.configure(app.config["BADGE_CACHE_SIZE"], badge_cache_ttl(app.config))
+    network_graph.configure(app.config["NETWORK_GRAPH_REFRESH_SECONDS"], app.config["NETWORK_GRAPH_COMPACT_EDGES"])
+    recent_scans.configure(
+        app.config["SCAN_DEDUPE_WINDOW_SECONDS"],
+        app.config["SCAN_DEDUPE_CATEGORY_WINDOWS"],
+        app.config["SCAN_DEDUPE_ACTIVITY_WINDOWS"],
+        app.config["USER_SCAN_DEDUPE_WINDOW_SECONDS"],
+        app.config["SCAN_DEDUPE_MAX_ENTRIES"],
+        # Services run on the event loop thread here, so a repeat must never wait
+        wait_timeout=0
+    )
+    scan_feed.configure(
+        app.config["SCAN_STREAM_MAX_RATE"],
+        app.config["SCAN_STREAM_HEARTBEAT_SECONDS"],
+        app.config["SCAN_STREAM_RECONCILE_SECONDS"],
+        app.config["SCAN_STREAM_MAX_CLIENTS"]
+    )
+    install_json_provider(app)
+
+    from app.aio.routes.user_routes import user_bp
+    app.register_blueprint(user_bp)
+    from app.aio.routes.scan_routes import scan_bp
+    app.register_blueprint(scan_bp)
+    from app.aio.routes.user_scan_routes import user_scan_bp
+    app.register_blueprint(user_scan_bp)
+    from app.aio.routes.network_routes import network_bp
+    app.register_blueprint(network_bp)
+
+    return app
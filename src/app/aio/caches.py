@@ -0,0 +1,29 @@
+import asyncio
+from quart import current_app
+
+
+def init_cache_loading(app):
+    """
+    Registers the asyncio locks `load_once` uses; one per cache, created on first use.
+    """
+    app.extensions["cache_load_locks"] = {}
+
+
+async def load_once(cache, db, load_rows):
+    """
+    Loads a process-wide cache (network_graph, scan_feed) on first use, the way its
+    `ensure_loaded` does in the sync app. Handlers run on the event loop thread, so
+    concurrent first requests must wait on an asyncio lock here rather than on the
+    cache's threading lock inside `run_sync`, which would block the loop the first
+    request needs to finish its query.
+    Args:
+        cache: The cache; it has `loaded` and `load(rows)`.
+        db (AsyncSession): The session to query with.
+        load_rows (callable): Takes the sync session and returns the rows for `load`.
+    """
+    if cache.loaded:
+        return
+    lock = current_app.extensions["cache_load_locks"].setdefault(cache, asyncio.Lock())
+    async with lock:
+        if not cache.loaded:
+            await db.run_sync(lambda session: cache.load(load_rows(session)))
@@ -0,0 +1,108 @@
+from quart import g, current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from app.database import engine_options, configure_engine, database_clock
+
+# The asyncio driver used for each backend; DATABASE_URL keeps naming the sync driver
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+    "mssql": "aioodbc",
+    "mysql": "aiomysql"
+}
+
+
+def async_url(url):
+    """
+    Swaps the driver of a database URL for its asyncio counterpart, e.g.
+    postgresql+psycopg2:// becomes postgresql+asyncpg://.
+    Args:
+        url (str): The sync database URL.
+    Returns:
+        URL: The async database URL.
+    Raises:
+        ValueError: If the backend has no supported asyncio driver.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def async_engine_options(config):
+    """
+    Builds create_async_engine arguments from the same pool settings as the sync app.
+    The instrumented QueuePool can't wrap asyncio connections, so SQLAlchemy's default
+    async pool is used, and asyncpg takes the statement timeout as a server setting.
+    Args:
+        config (dict): The app config.
+    Returns:
+        dict: Keyword arguments for create_async_engine.
+    """
+    options = engine_options(config)
+    options.pop("poolclass", None)
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if make_url(config["SQLALCHEMY_DATABASE_URI"]).get_backend_name() == "postgresql" and timeout_ms:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(timeout_ms)}}
+    return options
+
+
+def init_async_db(app):
+    """
+    Creates the app's AsyncEngine and closes each request's sessions when it ends.
+    Args:
+        app (Quart): The application.
+    """
+    engine = create_async_engine(async_url(app.config["SQLALCHEMY_DATABASE_URI"]), **async_engine_options(app.config))
+    configure_engine(engine.sync_engine, app.config)
+    database_clock.configure(app.config["DB_TIMEZONE"], app.config["SQLALCHEMY_DATABASE_URI"])
+    app.extensions["async_engine"] = engine
+    app.teardown_appcontext(close_db)
+
+    @app.after_serving
+    async def _dispose_engine():
+        await engine.dispose()
+
+
+def new_session(engine, read_only=False):
+    """
+    Creates an AsyncSession on `engine`, configured like app.database.new_session.
+    Args:
+        engine (AsyncEngine): The engine to bind to.
+        read_only (bool): Whether the session may only read.
+    Returns:
+        AsyncSession: The new session.
+    """
+    session = AsyncSession(engine, autoflush=not read_only, expire_on_commit=False)
+    session.info["read_only"] = read_only
+    return session
+
+
+def get_db(read_only=False):
+    """
+    Returns the AsyncSession for the current request, creating it on first use.
+    Handlers run the sync services on it with `await db.run_sync(...)`, so every
+    statement the service issues awaits the asyncio driver instead of blocking.
+    Args:
+        read_only (bool): Whether to return the request's read-only session.
+    Returns:
+        AsyncSession: The request's session.
+    """
+    key = "db_read_session" if read_only else "db_session"
+    session = g.get(key)
+    if session is None:
+        session = new_session(current_app.extensions["async_engine"], read_only)
+        setattr(g, key, session)
+    return session
+
+
+async def close_db(exception=None):
+    """
+    Closes the sessions opened by `get_db` for this request, rolling back any open
+    transaction. Registered with `app.teardown_appcontext`.
+    """
+    for key in ("db_read_session", "db_session"):
+        session = g.pop(key, None)
+        if session is not None:
+            await session.close()
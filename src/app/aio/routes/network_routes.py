@@ -0,0 +1,55 @@
+from quart import Blueprint, current_app, request, jsonify
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.aio.caches import load_once
+from app.aio.database import get_db
+from app.cache.network_graph import network_graph
+from app.repositories.user_scan_repository import UserScanRepository
+from app.services.network_service import NetworkService
+from app.utils.pagination import parse_limit
+
+network_bp = Blueprint("network", __name__)
+
+"""
+Runs one of the networking graph queries and shapes its response.
+Args:
+    query (callable): Takes the sync session and the page size.
+    *args: Passed to `query` before the page size.
+Returns:
+    Response: 200 with the result, 400 for a bad limit, or the service's error.
+"""
+async def _network_response(query, *args):
+    db: AsyncSession = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    await load_once(network_graph, db, UserScanRepository.get_user_scan_edges)
+    result = await db.run_sync(query, *args, limit)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
+
+"""
+Retrieves the users connected to both given users.
+See app.routes.network_routes.get_mutual_connections.
+"""
+@network_bp.route("/network/mutual/<badge_code>/<other_badge_code>", methods=["GET"])
+async def get_mutual_connections(badge_code, other_badge_code):
+    return await _network_response(NetworkService.get_mutual_connections, badge_code, other_badge_code)
+
+"""
+Retrieves the users with the most connections.
+See app.routes.network_routes.get_top_connectors.
+"""
+@network_bp.route("/network/top-connectors", methods=["GET"])
+async def get_top_connectors():
+    return await _network_response(NetworkService.get_top_connectors)
+
+"""
+Suggests people a user should meet.
+See app.routes.network_routes.get_suggestions.
+"""
+@network_bp.route("/network/suggestions/<badge_code>", methods=["GET"])
+async def get_suggestions(badge_code):
+    return await _network_response(NetworkService.get_suggestions, badge_code)
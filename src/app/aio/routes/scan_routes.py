@@ -0,0 +1,157 @@
+import asyncio
+import time
+from quart import Blueprint, Response, request, jsonify, current_app
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.aio.caches import load_once
+from app.aio.database import get_db
+from app.cache.scan_feed import scan_feed, FeedFull
+from app.repositories.scan_repository import ScanRepository
+from app.services.scan_service import ScanService
+from app.utils.sse import KEEP_ALIVE, SSE_HEADERS, format_event
+
+scan_bp = Blueprint("scan", __name__)
+
+"""
+Adds a scan for a user by badge code. Always commits in the request; buffered
+ingestion is only available in the sync app. A repeat of a scan that is still being
+recorded gets 409 Conflict instead of waiting for it.
+See app.routes.scan_routes.add_scan.
+"""
+@scan_bp.route("/scan/<string:badge_code>", methods=["PUT"])
+async def add_scan(badge_code):
+    db: AsyncSession = get_db()
+    data = await request.get_json()
+
+    # Validate request body
+    if "activity_name" not in data or "activity_category" not in data:
+        return jsonify({"error": "Missing activity fields"}), 400
+
+    response = await db.run_sync(ScanService.add_scan, badge_code, data["activity_name"], data["activity_category"])
+
+    if isinstance(response, tuple):
+        return jsonify(response[0]), response[1]
+    return jsonify(response)
+
+"""
+Adds many scans in one request.
+See app.routes.scan_routes.add_scans_batch.
+"""
+@scan_bp.route("/scans/batch", methods=["POST"])
+async def add_scans_batch():
+    db: AsyncSession = get_db()
+    items = await request.get_json(silent=True)
+
+    # Validate request body
+    if not isinstance(items, list):
+        return jsonify({"error": "Request body must be a JSON array of scans"}), 400
+    if len(items) > current_app.config["SCAN_BATCH_MAX_SIZE"]:
+        return jsonify({"error": f"Batch exceeds {current_app.config['SCAN_BATCH_MAX_SIZE']} scans"}), 413
+
+    response = await db.run_sync(ScanService.add_scans_batch, items)
+
+    return jsonify(response)
+
+"""
+Retrieves aggregated scan data with optional filters.
+See app.routes.scan_routes.get_scan_aggregates.
+"""
+@scan_bp.route("/scans", methods=["GET"])
+async def get_scan_aggregates():
+    db: AsyncSession = get_db(read_only=True)
+
+    # Parse query parameters
+    min_frequency = request.args.get("min_frequency", type=int)
+    max_frequency = request.args.get("max_frequency", type=int)
+    activity_category = request.args.get("activity_category", type=str)
+
+    results = await db.run_sync(ScanService.get_scan_aggregates, min_frequency, max_frequency, activity_category)
+
+    return jsonify(results)
+
+"""
+Streams live per-activity scan counts as Server-Sent Events. Each stream waits on
+the event loop instead of holding a thread, so this app suits many dashboards.
+See app.routes.scan_routes.stream_scan_counts.
+"""
+@scan_bp.route("/scans/stream", methods=["GET"])
+async def stream_scan_counts():
+    db: AsyncSession = get_db()
+
+    try:
+        scan_feed.check_capacity()
+    except FeedFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    await load_once(scan_feed, db, ScanRepository.get_scan_counts)
+    await db.close()
+
+    response = Response(_scan_count_events(db, current_app.json.dumps), mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Quart cuts responses off after RESPONSE_TIMEOUT; streams stay open until the client leaves
+    response.timeout = None
+    return response
+
+
+async def _scan_count_events(db, dumps):
+    # The loop of ScanService.stream_scan_counts, waiting on the event loop
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    try:
+        subscriber, snapshot = scan_feed.subscribe(lambda: loop.call_soon_threadsafe(wake.set))
+    except FeedFull:
+        # Lost a race for the last slot after check_capacity; the client reconnects
+        return
+    try:
+        yield format_event("snapshot", {"activities": snapshot}, dumps)
+        sent_at = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(wake.wait(), scan_feed.wait_interval)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            if scan_feed.claim_reconcile():
+                await db.run_sync(ScanService.reconcile_scan_feed)
+                await db.close()
+
+            # Let changes pile up until the client's next update is due
+            delay = sent_at + scan_feed.min_interval - time.monotonic()
+            if subscriber.pending and delay > 0:
+                await asyncio.sleep(delay)
+            changes = scan_feed.drain(subscriber)
+            if changes:
+                yield format_event("counts", {"activities": changes}, dumps)
+            elif time.monotonic() - sent_at >= scan_feed.heartbeat_interval:
+                yield KEEP_ALIVE
+            else:
+                continue
+            sent_at = time.monotonic()
+    finally:
+        scan_feed.unsubscribe(subscriber)
+
+"""
+Retrieves the scan count for a specific activity in fixed-width time buckets.
+See app.routes.scan_routes.get_scan_count_by_time_period.
+"""
+@scan_bp.route("/scan_count_by_time_period", methods=["GET"])
+async def get_scan_count_by_time_period():
+    db: AsyncSession = get_db(read_only=True)
+
+    # Get parameters from the request
+    activity_name = request.args.get("activity_name")
+    start_str = request.args.get("start")
+    end_str = request.args.get("end")
+    bucket = request.args.get("bucket", "1h")
+
+    # Validate the required parameters
+    if not activity_name or not start_str or not end_str:
+        return jsonify({"error": "Missing required parameters"}), 400
+
+    try:
+        time_distribution = await db.run_sync(
+            ScanService.get_scan_count_by_time_period, activity_name, start_str, end_str, bucket,
+            current_app.config["TIME_BUCKET_MAX_COUNT"]
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({"time_distribution": time_distribution})
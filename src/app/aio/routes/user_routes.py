@@ -0,0 +1,99 @@
+from quart import Blueprint, current_app, jsonify, request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.aio.database import get_db
+from app.services.user_service import UserService
+from app.serializers.serializer import serialize_user
+from app.utils.pagination import parse_limit
+from app.utils.http_cache import user_validators, is_not_modified, with_validators, not_modified
+from app.utils.projection import parse_user_projection, projection_variant
+
+user_bp = Blueprint("user", __name__)
+
+"""
+Retrieves one page of users and their scan details, ordered by ID.
+See app.routes.user_routes.get_all_users.
+"""
+@user_bp.route("/users", methods=["GET"])
+async def get_all_users():
+    db: AsyncSession = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+        projection = parse_user_projection(request.args)
+        users, next_cursor = await db.run_sync(UserService.get_user_page, projection, limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "users": users,
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
+
+"""
+Retrieves a specific user by their ID and their scan details.
+See app.routes.user_routes.get_user.
+"""
+@user_bp.route("/users/<int:user_id>", methods=["GET"])
+async def get_user(user_id):
+    db: AsyncSession = get_db(read_only=True)
+    return await _conditional_user_response(db, user_id=user_id)
+
+"""
+Retrieves a specific user by their badge code and their scan details.
+See app.routes.user_routes.get_user_badge.
+"""
+@user_bp.route("/users/badge/<string:badge_code>", methods=["GET"])
+async def get_user_badge(badge_code):
+    db: AsyncSession = get_db(read_only=True)
+    return await _conditional_user_response(db, badge_code=badge_code)
+
+"""
+Answers a user profile request, checking the client's cached copy first.
+Args:
+    db (AsyncSession): The read-only session.
+    user_id (int, optional): The ID of the user.
+    badge_code (str, optional): The badge code of the user, if no ID is given.
+Returns:
+    Response: 200 with the profile, 304 Not Modified, or 404 Not Found.
+"""
+async def _conditional_user_response(db, user_id=None, badge_code=None):
+    try:
+        projection = parse_user_projection(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    version = await db.run_sync(UserService.get_user_version, user_id=user_id, badge_code=badge_code)
+    if not version:
+        return jsonify({"error": "User not found"}), 404
+    etag, last_modified = user_validators(version, projection_variant(projection))
+    if is_not_modified(etag, last_modified, request):
+        return not_modified(etag, last_modified, Response)
+
+    user = await db.run_sync(UserService.get_user_profile, projection, version)
+    return with_validators(jsonify(user), etag, last_modified)
+
+"""
+Updates the information of an existing user.
+See app.routes.user_routes.update_user.
+"""
+@user_bp.route("/users/<int:user_id>", methods=["PUT"])
+async def update_user(user_id):
+    db: AsyncSession = get_db()
+    update_data = await request.get_json()
+
+    # Fetch user
+    user = await db.run_sync(UserService.get_user_by_id, user_id)
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    # Allowed fields for update
+    allowed_fields = {"name", "email", "phone", "badge_code"}
+    update_data = {key: value for key, value in update_data.items() if key in allowed_fields}
+
+    # Edge case: Empty update data
+    if not update_data:
+        return jsonify({"error": "No valid fields provided for the update"}), 400
+
+    user = await db.run_sync(UserService.update_user, user_id, update_data)
+
+    return jsonify(serialize_user(user))
@@ -0,0 +1,65 @@
+from quart import Blueprint, current_app, request, jsonify
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.aio.database import get_db
+from app.services.user_scan_service import UserScanService
+from app.utils.pagination import parse_limit
+
+user_scan_bp = Blueprint("user_scan", __name__)
+
+"""
+Scans a user's badge and records the scan activity. A repeat of a scan that is still
+being recorded gets 409 Conflict instead of waiting for it.
+See app.routes.user_scan_routes.scan_badge.
+"""
+@user_scan_bp.route("/scan-badge", methods=["POST"])
+async def scan_badge():
+    db: AsyncSession = get_db()
+    data = await request.get_json()
+    scanner_badge = data.get("scanner_badge")
+    scanned_badge = data.get("scanned_badge")
+
+    if not scanner_badge or not scanned_badge:
+        return jsonify({"error": "Both scanner_badge and scanned_badge are required"}), 400
+
+    result = await db.run_sync(UserScanService.scan_badge, scanner_badge, scanned_badge)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
+
+"""
+Runs one of the user scan list queries and shapes its response.
+Args:
+    db (AsyncSession): The read-only session.
+    list_users (callable): UserScanService.get_scanned_users or get_users_who_scanned.
+    badge_code (str): The badge code of the user.
+Returns:
+    Response: 200 with a page of users, 400 for a bad limit or cursor, or 404.
+"""
+async def _user_page_response(db, list_users, badge_code):
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+        result = await db.run_sync(list_users, badge_code, limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
+
+"""
+Retrieves one page of users scanned by the specified badge code, in scan order.
+See app.routes.user_scan_routes.get_scanned_users.
+"""
+@user_scan_bp.route("/scanned-users/<badge_code>", methods=["GET"])
+async def get_scanned_users(badge_code):
+    db: AsyncSession = get_db(read_only=True)
+    return await _user_page_response(db, UserScanService.get_scanned_users, badge_code)
+
+"""
+Retrieves one page of users who have scanned the specified badge code, in scan order.
+See app.routes.user_scan_routes.get_users_who_scanned.
+"""
+@user_scan_bp.route("/users-who-scanned/<badge_code>", methods=["GET"])
+async def get_users_who_scanned(badge_code):
+    db: AsyncSession = get_db(read_only=True)
+    return await _user_page_response(db, UserScanService.get_users_who_scanned, badge_code)
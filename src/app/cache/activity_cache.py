@@ -0,0 +1,57 @@
+import threading
+from collections import namedtuple
+
+ActivityRef = namedtuple("ActivityRef", ["id", "activity_name", "activity_category"])
+
+
+class ActivityCache:
+    """
+    A thread-safe activity_name -> ActivityRef map.
+    Activities are few and never renamed, so the whole table is kept in memory once
+    loaded; names missing from the map are looked up (or created) and added on demand.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._activities = {}
+        self.loaded = False
+
+    def load(self, activities):
+        """
+        Replaces the map with the given activities.
+        Args:
+            activities (iterable): ActivityRef tuples for every known activity.
+        """
+        with self._lock:
+            self._activities = {activity.activity_name: activity for activity in activities}
+            self.loaded = True
+
+    def get(self, activity_name):
+        """
+        Args:
+            activity_name (str): The name of the activity.
+        Returns:
+            ActivityRef: The cached activity, or None if it is not in the map.
+        """
+        return self._activities.get(activity_name)
+
+    def add(self, activity):
+        """
+        Adds a single activity to the map.
+        Args:
+            activity (ActivityRef): The activity to add.
+        """
+        with self._lock:
+            self._activities[activity.activity_name] = activity
+
+    def clear(self):
+        """
+        Empties the map so the next lookup reloads it from the database.
+        """
+        with self._lock:
+            self._activities = {}
+            self.loaded = False
+
+
+# activity_name -> ActivityRef, shared by every request in this process.
+activity_cache = ActivityCache()
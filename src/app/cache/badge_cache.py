@@ -0,0 +1,25 @@
+from collections import namedtuple
+from config.config import Config
+from app.cache.lru_cache import LRUCache
+
+# The user columns the scan and networking services need when they resolve a badge.
+UserRef = namedtuple("UserRef", ["id", "name", "email", "phone", "badge_code"])
+
+# badge_code -> UserRef, shared by every request in this process.
+badge_cache = LRUCache(maxsize=Config.BADGE_CACHE_SIZE, ttl=Config.BADGE_CACHE_TTL)
+
+
+def badge_cache_ttl(config):
+    """
+    Picks the badge cache's TTL. Invalidations after a badge edit only reach the
+    process that made it, so with several server workers (WEB_CONCURRENCY) the TTL is
+    capped at BADGE_CACHE_MULTI_WORKER_TTL, which bounds how long another worker can
+    resolve a reassigned badge to its old owner.
+    Args:
+        config (dict): The app's config.
+    Returns:
+        float: The TTL in seconds.
+    """
+    if config["WEB_CONCURRENCY"] > 1:
+        return min(config["BADGE_CACHE_TTL"], config["BADGE_CACHE_MULTI_WORKER_TTL"])
+    return config["BADGE_CACHE_TTL"]
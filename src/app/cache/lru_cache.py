@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded LRU cache whose entries expire after a fixed TTL.
+    Keeps hit/miss/eviction counters so callers can tell whether it is pulling its weight.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, maxsize, ttl):
+        """
+        Resizes the cache and changes its TTL, dropping every current entry.
+        Args:
+            maxsize (int): The maximum number of entries kept; 0 disables the cache.
+            ttl (float): How long an entry stays valid, in seconds.
+        """
+        with self._lock:
+            self.maxsize = maxsize
+            self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, key, default=None):
+        """
+        Looks up a key, refreshing its recency on a hit.
+        Args:
+            key: The cache key.
+            default: The value returned on a miss.
+        Returns:
+            The cached value, or `default` if the key is absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+        Args:
+            key: The cache key.
+            value: The value to cache.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """
+        Removes the given keys from the cache, if present.
+        Args:
+            *keys: The cache keys to drop.
+        """
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: The current size, capacity, TTL and hit/miss/eviction counters.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
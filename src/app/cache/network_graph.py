@@ -0,0 +1,291 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+# Refreshes re-read this many user scan IDs below the watermark, so scans whose IDs
+# were assigned before the watermark but committed after it are still picked up
+REFRESH_OVERLAP = 1000
+
+
+class _Snapshot:
+    """
+    An immutable adjacency index in CSR (compressed sparse row) form: ids holds every
+    connected user ID in ascending order, and the neighbours of ids[i] are
+    targets[offsets[i]:offsets[i + 1]], also sorted. The whole graph is three flat
+    arrays of 64-bit integers, about 8 bytes per edge end, instead of a Python set
+    per user. ranking lists the user IDs by number of connections, highest first.
+    """
+    __slots__ = ("ids", "offsets", "targets", "ranking")
+
+    def __init__(self, adjacency):
+        """
+        Args:
+            adjacency (dict): user_id -> set of neighbouring user IDs.
+        """
+        self.ids = array("q", sorted(adjacency))
+        self.offsets = array("q", [0])
+        self.targets = array("q")
+        for user_id in self.ids:
+            self.targets.extend(sorted(adjacency[user_id]))
+            self.offsets.append(len(self.targets))
+        positions = sorted(range(len(self.ids)), key=lambda i: self.offsets[i] - self.offsets[i + 1])
+        self.ranking = array("q", (self.ids[i] for i in positions))
+
+    def _bounds(self, user_id):
+        position = bisect_left(self.ids, user_id)
+        if position == len(self.ids) or self.ids[position] != user_id:
+            return 0, 0
+        return self.offsets[position], self.offsets[position + 1]
+
+    def neighbours(self, user_id):
+        start, end = self._bounds(user_id)
+        return self.targets[start:end]
+
+    def degree(self, user_id):
+        start, end = self._bounds(user_id)
+        return end - start
+
+    def connected(self, user_id, other_id):
+        start, end = self._bounds(user_id)
+        position = bisect_left(self.targets, other_id, start, end)
+        return position < end and self.targets[position] == other_id
+
+    def merged(self, delta):
+        """
+        Returns:
+            _Snapshot: A new snapshot with the edges in `delta` (user_id -> set) added.
+        """
+        adjacency = defaultdict(set)
+        for position, user_id in enumerate(self.ids):
+            adjacency[user_id].update(self.targets[self.offsets[position]:self.offsets[position + 1]])
+        for user_id, neighbours in delta.items():
+            adjacency[user_id].update(neighbours)
+        return _Snapshot(adjacency)
+
+
+class NetworkGraph:
+    """
+    An in-process, undirected index of who has connected with whom through badge
+    scans: two users are connected once either has scanned the other. It is loaded
+    from the userscans table once, then kept current by adding each new user scan
+    after it commits, plus a periodic catch-up query for scans recorded by other
+    processes (rows with an ID above the watermark).
+
+    New edges go into a small per-user delta that is merged into a fresh CSR snapshot
+    on a background thread once it holds `compact_threshold` edges. The current
+    (snapshot, merging, delta) triple is swapped atomically, so reads take no lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._state = (_Snapshot({}), {}, defaultdict(set))
+        self._delta_edges = 0
+        self._compacting = False
+        self._watermark = 0
+        self._checked_at = 0.0
+        self.loaded = False
+        self.refresh_interval = 5.0
+        self.compact_threshold = 50000
+        self.compactions = 0
+
+    def configure(self, refresh_interval, compact_threshold):
+        """
+        Args:
+            refresh_interval (float): Seconds between catch-up queries for scans
+                recorded by other processes (0 checks on every request).
+            compact_threshold (int): New edges kept in the delta before it is merged
+                into the CSR snapshot.
+        """
+        self.refresh_interval = refresh_interval
+        self.compact_threshold = max(compact_threshold, 1)
+
+    @property
+    def watermark(self):
+        """
+        int: The highest user scan ID included in the graph.
+        """
+        return self._watermark
+
+    def load(self, rows):
+        """
+        Replaces the graph with the given user scans.
+        Args:
+            rows (iterable): (id, scanner_id, scanned_id) rows for every user scan.
+        """
+        adjacency = defaultdict(set)
+        watermark = 0
+        for scan_id, scanner_id, scanned_id in rows:
+            watermark = max(watermark, scan_id)
+            if scanner_id != scanned_id:
+                adjacency[scanner_id].add(scanned_id)
+                adjacency[scanned_id].add(scanner_id)
+        snapshot = _Snapshot(adjacency)
+        with self._lock:
+            self._state = (snapshot, {}, defaultdict(set))
+            self._delta_edges = 0
+            self._watermark = watermark
+            self._checked_at = time.monotonic()
+            self.loaded = True
+
+    def ensure_loaded(self, load_rows):
+        """
+        Loads the graph on first use; concurrent callers wait for one load. The async
+        app loads through app.aio.caches.load_once instead, since waiting on this lock
+        would block its event loop.
+        Args:
+            load_rows (callable): Returns the rows for `load`.
+        """
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load(load_rows())
+
+    def claim_refresh(self):
+        """
+        Returns:
+            bool: True for the one caller per refresh interval that should query for
+            user scans above the watermark.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self.loaded or now - self._checked_at < self.refresh_interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def add(self, rows):
+        """
+        Adds user scans to a loaded graph. Scans between users who are already
+        connected, and scans already added, change nothing.
+        Args:
+            rows (iterable): (id, scanner_id, scanned_id) rows.
+        """
+        if not self.loaded:
+            return
+        compact = False
+        with self._lock:
+            snapshot, merging, delta = self._state
+            for scan_id, scanner_id, scanned_id in rows:
+                self._watermark = max(self._watermark, scan_id)
+                if scanner_id == scanned_id or self._connected(scanner_id, scanned_id):
+                    continue
+                delta[scanner_id].add(scanned_id)
+                delta[scanned_id].add(scanner_id)
+                self._delta_edges += 1
+            if self._delta_edges >= self.compact_threshold and not self._compacting:
+                self._compacting = compact = True
+                self._state = (snapshot, delta, defaultdict(set))
+                self._delta_edges = 0
+        if compact:
+            threading.Thread(target=self._compact, name="network-graph-compact", daemon=True).start()
+
+    def _compact(self):
+        try:
+            snapshot, merging, _ = self._state
+            merged = snapshot.merged(merging)
+            with self._lock:
+                # A reload while merging replaced the state; keep the reloaded graph
+                if self._state[1] is merging:
+                    self._state = (merged, {}, self._state[2])
+                    self.compactions += 1
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _connected(self, user_id, other_id):
+        snapshot, merging, delta = self._state
+        return (
+            snapshot.connected(user_id, other_id)
+            or other_id in merging.get(user_id, ())
+            or other_id in delta.get(user_id, ())
+        )
+
+    def neighbours(self, user_id):
+        """
+        Returns:
+            set: The IDs of the users connected to the given user.
+        """
+        snapshot, merging, delta = self._state
+        neighbours = set(snapshot.neighbours(user_id))
+        neighbours.update(merging.get(user_id, ()))
+        neighbours.update(delta.get(user_id, ()))
+        return neighbours
+
+    def degree(self, user_id):
+        """
+        Returns:
+            int: The number of users connected to the given user.
+        """
+        snapshot, merging, delta = self._state
+        if user_id not in merging and user_id not in delta:
+            return snapshot.degree(user_id)
+        return len(self.neighbours(user_id))
+
+    def mutual(self, user_id, other_id):
+        """
+        Returns:
+            list: The IDs of the users connected to both users, ascending.
+        """
+        return sorted(self.neighbours(user_id) & self.neighbours(other_id))
+
+    def top_connectors(self, limit):
+        """
+        Ranks users by number of connections. Only users with new edges can have moved
+        up since the snapshot was built, so those plus the snapshot's first
+        `limit + len(moved)` entries are enough candidates.
+        Args:
+            limit (int): The number of users to return.
+        Returns:
+            list: (user_id, connections) pairs, most connected first, then by ID.
+        """
+        snapshot, merging, delta = self._state
+        changed = set(merging) | set(delta)
+        candidates = set(snapshot.ranking[:limit + len(changed)]) | changed
+        ranked = sorted(((self.degree(user_id), user_id) for user_id in candidates), key=lambda pair: (-pair[0], pair[1]))
+        return [(user_id, connections) for connections, user_id in ranked[:limit] if connections]
+
+    def suggestions(self, user_id, limit):
+        """
+        Friends of friends: users two hops away who aren't connected to the user yet,
+        ranked by how many connections they share with the user.
+        Args:
+            user_id (int): The user to suggest connections for.
+            limit (int): The number of users to return.
+        Returns:
+            list: (user_id, mutual_connections) pairs, most shared connections first, then by ID.
+        """
+        neighbours = self.neighbours(user_id)
+        counts = Counter()
+        for neighbour in neighbours:
+            counts.update(self.neighbours(neighbour))
+        for excluded in neighbours | {user_id}:
+            counts.pop(excluded, None)
+        return sorted(counts.items(), key=lambda pair: (-pair[1], pair[0]))[:limit]
+
+    def stats(self):
+        """
+        Returns:
+            dict: Users and edges in the graph, edges not yet compacted, compactions
+            done and the watermark.
+        """
+        # `add` mutates the delta in place under the lock, so walk it under the lock too
+        with self._lock:
+            snapshot, merging, delta = self._state
+            pending = (sum(len(n) for n in merging.values()) + sum(len(n) for n in delta.values())) // 2
+            new_users = sum(1 for user_id in set(merging) | set(delta) if not snapshot.degree(user_id))
+        return {
+            "loaded": self.loaded,
+            "users": len(snapshot.ids) + new_users,
+            "edges": len(snapshot.targets) // 2 + pending,
+            "pending_edges": pending,
+            "compactions": self.compactions,
+            "watermark": self._watermark
+        }
+
+
+# The connection graph shared by every request in this process.
+network_graph = NetworkGraph()
@@ -0,0 +1,187 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# The answer to a repeat that arrives while the first scan is still being recorded,
+# when the caller can't wait for it
+IN_PROGRESS = ({"error": "An identical scan is still being recorded"}, 409)
+
+
+class _Entry:
+    __slots__ = ("expires_at", "result", "done")
+
+    def __init__(self, expires_at):
+        self.expires_at = expires_at
+        self.result = None
+        self.done = threading.Event()
+
+
+class _Claim:
+    """
+    What RecentScans.claim yields: either the result of an earlier identical scan
+    (`duplicate`), or the right to record this one and `complete` it with its result.
+    """
+    __slots__ = ("_entry", "duplicate", "completed")
+
+    def __init__(self, entry, duplicate):
+        self._entry = entry
+        self.duplicate = duplicate
+        self.completed = False
+
+    def complete(self, result):
+        """
+        Remembers the scan's result for the rest of its window; identical scans
+        (including ones waiting for this one) return it instead of inserting again.
+        Args:
+            result: The service's return value for the scan.
+        """
+        self.completed = True
+        if self._entry is not None:
+            self._entry.result = result
+            self._entry.done.set()
+
+
+class RecentScans:
+    """
+    A thread-safe index of the scans recorded in the last few seconds or minutes, used
+    to suppress duplicates from badge readers that double-fire and clients that retry.
+    Each key (a user and activity, or a scanner and scanned user) maps to the first
+    scan's result until its window ends.
+
+    Entries are also queued in one FIFO per window length. Within a queue, expiry
+    follows insertion order, so eviction pops from the front instead of scanning.
+    The index is per process, so duplicates that land on different workers are
+    both recorded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._queues = {}
+        self.scan_window = 0.0
+        self.category_windows = {}
+        self.activity_windows = {}
+        self.user_scan_window = 0.0
+        self.max_entries = 100000
+        self.wait_timeout = 5.0
+        self.duplicates = 0
+
+    def configure(self, scan_window, category_windows, activity_windows, user_scan_window, max_entries,
+                  wait_timeout=5.0):
+        """
+        Args:
+            scan_window (float): Seconds an activity scan suppresses repeats (0 disables).
+            category_windows (dict): activity_category -> seconds, overriding scan_window.
+            activity_windows (dict): activity_name -> seconds, overriding both.
+            user_scan_window (float): Seconds a badge-to-badge scan suppresses repeats.
+            max_entries (int): The most scans remembered; the soonest to expire go first.
+            wait_timeout (float): Seconds a repeat waits for the first scan to be recorded.
+                0 answers it at once with IN_PROGRESS instead, for callers that must not
+                block, e.g. the async app, whose services run on the event loop thread.
+        """
+        with self._lock:
+            self.scan_window = scan_window
+            self.category_windows = dict(category_windows)
+            self.activity_windows = dict(activity_windows)
+            self.user_scan_window = user_scan_window
+            self.max_entries = max_entries
+            self.wait_timeout = wait_timeout
+            self._entries.clear()
+            self._queues.clear()
+
+    def window_for(self, activity_name, activity_category):
+        """
+        Returns:
+            float: The dedupe window for a scan of the activity, in seconds.
+        """
+        if activity_name in self.activity_windows:
+            return self.activity_windows[activity_name]
+        return self.category_windows.get(activity_category, self.scan_window)
+
+    @contextmanager
+    def claim(self, key, window):
+        """
+        Looks up an identical scan within its window, or reserves the key for this one.
+        If the identical scan is still being recorded, waits for it (up to wait_timeout)
+        rather than inserting a second row, or with a wait_timeout of 0 returns IN_PROGRESS. A reservation that isn't completed, e.g.
+        because the insert failed, is released on exit.
+        Args:
+            key (tuple): What identifies identical scans.
+            window (float): Seconds this scan suppresses repeats (0 skips the index).
+        Yields:
+            _Claim: `duplicate` holds the earlier result, or None if this scan should be recorded.
+        """
+        entry, duplicate = self._claim(key, window) if window > 0 else (None, None)
+        claim = _Claim(entry, duplicate)
+        try:
+            yield claim
+        finally:
+            if entry is not None and not claim.completed:
+                self._release(key, entry)
+
+    def _claim(self, key, window):
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._evict(now)
+                entry = self._entries.get(key)
+                if entry is None or entry.expires_at <= now:
+                    entry = _Entry(now + window)
+                    self._entries[key] = entry
+                    self._queues.setdefault(window, deque()).append((entry.expires_at, key, entry))
+                    self._trim()
+                    return entry, None
+                if entry.done.is_set():
+                    self.duplicates += 1
+                    return None, entry.result
+                if self.wait_timeout <= 0:
+                    self.duplicates += 1
+                    return None, IN_PROGRESS
+                pending = entry.done
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not pending.wait(remaining):
+                # The first scan is stuck; record this one rather than fail it
+                return None, None
+
+    def _release(self, key, entry):
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def _evict(self, now):
+        for queue in self._queues.values():
+            while queue and queue[0][0] <= now:
+                self._drop(*queue.popleft())
+
+    def _trim(self):
+        while len(self._entries) > self.max_entries:
+            queue = min((queue for queue in self._queues.values() if queue), key=lambda queue: queue[0][0])
+            self._drop(*queue.popleft())
+
+    def _drop(self, expires_at, key, entry):
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def stats(self):
+        """
+        Returns:
+            dict: The scans remembered and the duplicates suppressed.
+        """
+        with self._lock:
+            return {"size": len(self._entries), "duplicates": self.duplicates}
+
+
+def scan_key(user_id, activity_name):
+    return ("scan", user_id, activity_name)
+
+
+def user_scan_key(scanner_id, scanned_id):
+    return ("user_scan", scanner_id, scanned_id)
+
+
+# Recent scans, shared by every request in this process.
+recent_scans = RecentScans()
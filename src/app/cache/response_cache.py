@@ -0,0 +1,371 @@
+import functools
+import logging
+import threading
+import time
+from flask import Response, make_response, request
+from app.cache.lru_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AUTO = "auto"  # Local with one server worker, off with several
+BACKEND_OFF = "off"
+BACKEND_LOCAL = "local"  # Per-process LRU; invalidations reach only this process
+BACKEND_REDIS = "redis"  # Shared by every worker; needs the optional redis package
+
+# Dependency tags. Every scan write bumps SCAN_COUNTS_TAG, since it changes the
+# unfiltered aggregate; category- and activity-filtered responses only depend on theirs.
+SCAN_COUNTS_TAG = "scan_counts"
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+def activity_tag(activity_name):
+    return f"activity:{activity_name}"
+
+
+def category_tag(activity_category):
+    return f"category:{activity_category}"
+
+
+def scan_tags(activity, user_id):
+    """
+    Returns:
+        list: The tags a new scan of `activity` by `user_id` invalidates.
+    """
+    return [SCAN_COUNTS_TAG, activity_tag(activity.activity_name),
+            category_tag(activity.activity_category), user_tag(user_id)]
+
+
+def cache_key(endpoint, view_args, args, params):
+    """
+    Returns:
+        str: The endpoint and its URL arguments, plus the query parameters the route
+             reads in sorted order. Other and empty parameters don't split the cache.
+    """
+    parts = [f"{name}={value}" for name, value in sorted(view_args.items())]
+    parts.extend(f"{name}={args[name]}" for name in sorted(params) if args.get(name))
+    return f"{endpoint}?{'&'.join(parts)}"
+
+
+class LocalBackend:
+    """
+    Keeps entries in an LRUCache and tag versions in a dict, both in this process.
+    """
+
+    # Tag versions kept before ones older than the entry TTL are dropped
+    MAX_TAGS = 100000
+
+    def __init__(self, maxsize, ttl):
+        self._entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._tags = {}
+        self._seq = 0
+        self.ttl = ttl
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, entry):
+        self._entries.set(key, entry)
+
+    def current_seq(self):
+        return self._seq
+
+    def tag_states(self, tags):
+        tag_states = self._tags
+        return [tag_states.get(tag, (0, 0.0)) for tag in tags]
+
+    def bump(self, tags):
+        now = time.time()
+        with self._lock:
+            self._seq += 1
+            for tag in tags:
+                self._tags[tag] = (self._seq, now)
+            if len(self._tags) > self.MAX_TAGS:
+                # Every entry that depends on an older version has expired, and a missing
+                # tag reads as version 0, which no live entry predates
+                self._tags = {tag: state for tag, state in self._tags.items() if now - state[1] < self.ttl}
+
+    def clear(self):
+        self._entries.clear()
+
+    def size(self):
+        return self._entries.stats()["size"]
+
+
+class RedisBackend:
+    """
+    Keeps entries and tag versions in Redis, so an invalidation in one worker is seen by
+    all of them. Entries expire through Redis TTLs; tag versions outlive them by one TTL.
+    """
+
+    def __init__(self, url, ttl, lock_timeout, prefix="response_cache:"):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._redis.ping()
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._prefix = prefix
+
+    def get(self, key):
+        entry = self._redis.hgetall(self._prefix + "entry:" + key)
+        if not entry:
+            return None
+        tags = entry[b"tags"].decode()
+        return int(entry[b"seq"]), entry[b"mimetype"].decode(), tuple(tags.split("\n")) if tags else (), entry[b"body"]
+
+    def set(self, key, entry):
+        seq, mimetype, tags, body = entry
+        name = self._prefix + "entry:" + key
+        pipeline = self._redis.pipeline()
+        pipeline.hset(name, mapping={"seq": seq, "mimetype": mimetype, "tags": "\n".join(tags), "body": body})
+        pipeline.expire(name, int(self.ttl) or 1)
+        pipeline.execute()
+
+    def current_seq(self):
+        return int(self._redis.get(self._prefix + "seq") or 0)
+
+    def tag_states(self, tags):
+        if not tags:
+            return []
+        states = []
+        for value in self._redis.mget([self._prefix + "tag:" + tag for tag in tags]):
+            if value is None:
+                states.append((0, 0.0))
+            else:
+                seq, bumped_at = value.decode().split(":")
+                states.append((int(seq), float(bumped_at)))
+        return states
+
+    def bump(self, tags):
+        seq = self._redis.incr(self._prefix + "seq")
+        value = f"{seq}:{time.time()}"
+        pipeline = self._redis.pipeline()
+        for tag in tags:
+            pipeline.set(self._prefix + "tag:" + tag, value, ex=int(self.ttl * 2) or 1)
+        pipeline.execute()
+
+    def acquire(self, key):
+        """
+        Returns:
+            bool: Whether this process may compute `key`; another worker holds the lock otherwise.
+        """
+        return bool(self._redis.set(self._prefix + "lock:" + key, 1, nx=True, px=int(self.lock_timeout * 1000)))
+
+    def release(self, key):
+        self._redis.delete(self._prefix + "lock:" + key)
+
+    def clear(self):
+        for name in self._redis.scan_iter(self._prefix + "*"):
+            self._redis.delete(name)
+
+    def size(self):
+        return sum(1 for _ in self._redis.scan_iter(self._prefix + "entry:*"))
+
+
+class _Flight:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class ResponseCache:
+    """
+    Caches successful GET responses by route and normalized query parameters.
+
+    Each entry records the invalidation sequence number current when it started being
+    computed, plus the dependency tags (user, activity, category) of what it shows.
+    Writes bump their tags after commit; an entry is served only while none of its tags
+    has been bumped since it was computed, so unrelated writes leave it in place.
+
+    A cold key is computed once: concurrent requests for it wait for the first one (and,
+    with Redis, for the worker holding the key's lock) instead of all hitting the database.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.stale_window = 0.0
+        self.lock_timeout = 5.0
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._counts = dict.fromkeys(("hits", "misses", "stale", "coalesced", "skipped"), 0)
+
+    def configure(self, backend, stale_window=0.0, lock_timeout=5.0):
+        """
+        Args:
+            backend: A LocalBackend or RedisBackend, or None to disable the cache.
+            stale_window (float): Don't store a response computed within this many seconds
+                of an invalidation of one of its tags, e.g. because it may have been read
+                from a replica that hasn't caught up with the write yet.
+            lock_timeout (float): The longest a request waits for another to compute a key.
+        """
+        self.backend = backend
+        self.stale_window = stale_window
+        self.lock_timeout = lock_timeout
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def invalidate(self, *tags):
+        """
+        Drops every entry that depends on one of `tags`.
+        """
+        if self.backend is not None and tags:
+            self.backend.bump(set(tags))
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _lookup(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        seq, _, tags, _ = entry
+        if any(tag_seq > seq for tag_seq, _ in self.backend.tag_states(tags)):
+            self._count("stale")
+            return None
+        return entry
+
+    def _store(self, key, seq, response, tags):
+        tags = tuple(tags(response.get_json()) if tags else ())
+        now = time.time()
+        for tag_seq, bumped_at in self.backend.tag_states(tags):
+            if tag_seq > seq or now - bumped_at < self.stale_window:
+                self._count("skipped")
+                return
+        self.backend.set(key, (seq, response.mimetype, tags, response.get_data()))
+
+    def _compute(self, key, view, args, kwargs, tags):
+        seq = self.backend.current_seq()
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            self._store(key, seq, response, tags)
+        return response
+
+    def _serve(self, key, view, args, kwargs, tags):
+        entry = self._lookup(key)
+        if entry is not None:
+            self._count("hits")
+            return _hit(entry)
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            # Another request is computing this key; use its result if it stored one
+            self._count("coalesced")
+            flight.done.wait(self.lock_timeout)
+            entry = self._lookup(key)
+            if entry is not None:
+                return _hit(entry)
+            self._count("misses")
+            return make_response(view(*args, **kwargs))
+
+        self._count("misses")
+        try:
+            acquire = getattr(self.backend, "acquire", None)
+            if acquire is not None and not acquire(key):
+                entry = self._wait_for_other_worker(key)
+                if entry is not None:
+                    return _hit(entry)
+                return self._compute(key, view, args, kwargs, tags)
+            try:
+                return self._compute(key, view, args, kwargs, tags)
+            finally:
+                if acquire is not None:
+                    self.backend.release(key)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _wait_for_other_worker(self, key):
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def cached(self, params=(), tags=None):
+        """
+        Decorates a GET view so its 200 responses are cached.
+        Args:
+            params (tuple): The query parameters that select the response.
+            tags (callable, optional): Takes the response JSON and returns its dependency tags.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                key = cache_key(request.endpoint, kwargs, request.args, params)
+                return self._serve(key, view, args, kwargs, tags)
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """
+        Returns:
+            dict: The backend, entry count and hit/miss/stale/coalesced/skipped counters.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        if self.backend is None:
+            return {"backend": BACKEND_OFF, "size": 0, **counts}
+        backend = BACKEND_REDIS if isinstance(self.backend, RedisBackend) else BACKEND_LOCAL
+        return {"backend": backend, "size": self.backend.size(), **counts}
+
+
+def _hit(entry):
+    _, mimetype, _, body = entry
+    return Response(body, status=200, mimetype=mimetype)
+
+
+def make_backend(config):
+    """
+    Builds the backend selected by RESPONSE_CACHE_BACKEND. A local backend's
+    invalidations only reach its own process, so with several server workers (WEB_CONCURRENCY)
+    "auto" turns the cache off, and so does a Redis backend whose package or server is
+    unavailable; with one worker both use the local backend.
+    Returns:
+        LocalBackend, RedisBackend or None: None when the cache is off.
+    """
+    name = config["RESPONSE_CACHE_BACKEND"]
+    workers = config["WEB_CONCURRENCY"]
+    if name == BACKEND_AUTO:
+        name = BACKEND_LOCAL if workers <= 1 else BACKEND_OFF
+    if name == BACKEND_OFF or config["RESPONSE_CACHE_SIZE"] <= 0:
+        return None
+    if name == BACKEND_REDIS:
+        try:
+            return RedisBackend(
+                config["RESPONSE_CACHE_REDIS_URL"], config["RESPONSE_CACHE_TTL"], config["RESPONSE_CACHE_LOCK_TIMEOUT"]
+            )
+        except Exception as e:
+            if workers > 1:
+                logger.warning("Response cache is off; Redis is unavailable with %d workers: %s", workers, e)
+                return None
+            logger.warning("Response cache falls back to the local backend; Redis is unavailable: %s", e)
+    elif workers > 1:
+        logger.warning(
+            "Response cache uses the local backend with %d workers; other workers can serve "
+            "stale entries for up to RESPONSE_CACHE_TTL seconds", workers
+        )
+    return LocalBackend(config["RESPONSE_CACHE_SIZE"], config["RESPONSE_CACHE_TTL"])
+
+
+# Cached responses of the read routes, shared by every request in this process.
+response_cache = ResponseCache()
@@ -0,0 +1,228 @@
+import threading
+import time
+
+
+class FeedFull(Exception):
+    """
+    Raised when a process already serves SCAN_STREAM_MAX_CLIENTS live streams.
+    """
+
+
+class _Subscriber:
+    __slots__ = ("pending", "wake")
+
+    def __init__(self, wake):
+        # activity_name -> scans added since the last update sent to this client
+        self.pending = {}
+        self.wake = wake
+
+
+class ScanFeed:
+    """
+    An in-process fan-out of per-activity scan count changes to the live dashboard
+    streams. It keeps the current count of every activity, so a new stream starts
+    from a snapshot without querying. Writes publish their per-activity deltas once
+    they commit. Each subscriber merges them into one pending change per activity
+    until its next update, so a client gets at most `max_rate` updates per second
+    however fast scans arrive.
+
+    Scans recorded by other processes, and rebuilds of the summary table, are picked
+    up by a periodic reconciliation against the summary table, which one stream per
+    interval runs on behalf of all of them. Counts can be off by a scan committing
+    during that read until the next reconciliation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._counts = {}
+        self._subscribers = set()
+        self._checked_at = 0.0
+        self.loaded = False
+        self.max_rate = 2.0
+        self.heartbeat_interval = 15.0
+        self.reconcile_interval = 5.0
+        self.max_clients = 100
+        self.updates = 0
+
+    def configure(self, max_rate, heartbeat_interval, reconcile_interval, max_clients):
+        """
+        Args:
+            max_rate (float): The most updates per second sent to one client.
+            heartbeat_interval (float): Seconds of silence before a keep-alive comment
+                is sent, which is also how soon a closed connection is noticed.
+            reconcile_interval (float): Seconds between reads of the summary table for
+                scans recorded by other processes (0 disables).
+            max_clients (int): The most streams this process serves at once.
+        """
+        self.max_rate = max_rate
+        self.heartbeat_interval = heartbeat_interval
+        self.reconcile_interval = reconcile_interval
+        self.max_clients = max_clients
+
+    @property
+    def min_interval(self):
+        """
+        float: The fewest seconds between two updates to one client.
+        """
+        return 1.0 / self.max_rate if self.max_rate > 0 else 0.0
+
+    @property
+    def wait_interval(self):
+        """
+        float: How long a stream sleeps without news before it checks in again.
+        """
+        if self.reconcile_interval > 0:
+            return min(self.heartbeat_interval, self.reconcile_interval)
+        return self.heartbeat_interval
+
+    def load(self, rows):
+        """
+        Replaces the counts with the given ones.
+        Args:
+            rows (iterable): Rows from ScanRepository.get_scan_counts.
+        """
+        counts = {row.activity_name: [row.activity_category, row.scan_count] for row in rows}
+        with self._lock:
+            self._counts = counts
+            self._checked_at = time.monotonic()
+            self.loaded = True
+
+    def ensure_loaded(self, load_rows):
+        """
+        Loads the counts on first use; concurrent callers wait for one load. The async
+        app loads through app.aio.caches.load_once instead, since waiting on this lock
+        would block its event loop.
+        Args:
+            load_rows (callable): Returns the rows for `load`.
+        """
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self.load(load_rows())
+
+    def claim_reconcile(self):
+        """
+        Returns:
+            bool: True for the one caller per reconcile interval that should read the
+            summary table and pass the rows to `reconcile`.
+        """
+        if self.reconcile_interval <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if not self.loaded or now - self._checked_at < self.reconcile_interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def reconcile(self, rows):
+        """
+        Publishes the difference between the summary table and the counts kept here.
+        Args:
+            rows (iterable): Rows from ScanRepository.get_scan_counts.
+        """
+        stored = {row.activity_name: (row.activity_category, row.scan_count) for row in rows}
+        with self._lock:
+            deltas = {}
+            for activity_name, (activity_category, scan_count) in stored.items():
+                known = self._counts.get(activity_name)
+                delta = scan_count - (known[1] if known else 0)
+                if delta:
+                    deltas[activity_name] = (activity_category, delta)
+            for activity_name, (activity_category, scan_count) in self._counts.items():
+                # The summary table only lists activities with scans
+                if activity_name not in stored and scan_count:
+                    deltas[activity_name] = (activity_category, -scan_count)
+            self._apply(deltas)
+
+    def publish(self, deltas):
+        """
+        Adds committed scans to the counts and queues them for every subscriber.
+        Args:
+            deltas (dict): ActivityRef -> number of scans added.
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            self._apply({
+                activity.activity_name: (activity.activity_category, delta) for activity, delta in deltas.items()
+            })
+
+    def _apply(self, deltas):
+        if not deltas:
+            return
+        for activity_name, (activity_category, delta) in deltas.items():
+            count = self._counts.setdefault(activity_name, [activity_category, 0])
+            count[1] += delta
+        for subscriber in self._subscribers:
+            for activity_name, (_, delta) in deltas.items():
+                subscriber.pending[activity_name] = subscriber.pending.get(activity_name, 0) + delta
+            subscriber.wake()
+
+    def check_capacity(self):
+        """
+        A quick check before opening a stream that subscribes later, e.g. once its
+        response starts; `subscribe` makes the final decision.
+        Raises:
+            FeedFull: If the process already serves max_clients streams.
+        """
+        if len(self._subscribers) >= self.max_clients:
+            raise FeedFull("Too many live streams; retry later")
+
+    def subscribe(self, wake):
+        """
+        Registers a stream.
+        Args:
+            wake (callable): Called, with the feed's lock held, when changes are queued
+                for the stream; it must only signal the stream, e.g. set an Event.
+        Returns:
+            tuple: The subscriber to pass to `drain` and `unsubscribe`, and the
+            snapshot of every activity's count.
+        Raises:
+            FeedFull: If the process already serves max_clients streams.
+        """
+        subscriber = _Subscriber(wake)
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                raise FeedFull("Too many live streams; retry later")
+            self._subscribers.add(subscriber)
+            snapshot = [self._describe(activity_name) for activity_name in sorted(self._counts)]
+        return subscriber, [activity for activity in snapshot if activity["scan_count"]]
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def drain(self, subscriber):
+        """
+        Returns:
+            list: The activities whose count changed since the subscriber's last drain,
+            with the change and the new count, by activity name.
+        """
+        with self._lock:
+            pending, subscriber.pending = subscriber.pending, {}
+            changes = [
+                dict(self._describe(activity_name), delta=delta)
+                for activity_name, delta in sorted(pending.items()) if delta
+            ]
+            if changes:
+                self.updates += 1
+            return changes
+
+    def _describe(self, activity_name):
+        activity_category, scan_count = self._counts[activity_name]
+        return {"activity_name": activity_name, "activity_category": activity_category, "scan_count": scan_count}
+
+    def stats(self):
+        """
+        Returns:
+            dict: The open streams, activities tracked and updates sent.
+        """
+        with self._lock:
+            return {"clients": len(self._subscribers), "activities": len(self._counts), "updates": self.updates}
+
+
+# The live scan count feed shared by every stream in this process.
+scan_feed = ScanFeed()
@@ -0,0 +1,58 @@
+import click
+from app.database import db
+from sqlalchemy.orm import Session
+
+
+def register_commands(app):
+    """
+    Registers the maintenance commands available through `flask <command>`.
+    Args:
+        app (Flask): The application.
+    """
+
+    @app.cli.command("rebuild-scan-counts")
+    def rebuild_scan_counts():
+        """Rebuild the per-activity scan summary from the scans table."""
+        from app.repositories.scan_repository import ScanRepository
+        with Session(db.engine) as session, session.begin():
+            activities = ScanRepository.rebuild_scan_counts(session)
+        click.echo(f"Rebuilt scan counts for {activities} activities")
+
+    @app.cli.command("db-upgrade")
+    @click.option("--target", type=int, help="Last migration version to apply (defaults to the newest).")
+    def db_upgrade(target):
+        """Apply pending schema migrations."""
+        from app.migrations import runner
+        applied = runner.upgrade(db.engine, target)
+        for version, name in applied:
+            click.echo(f"Applied {version:04d}_{name}")
+        if not applied:
+            click.echo("Database is up to date")
+
+    @app.cli.command("db-status")
+    def db_status():
+        """List schema migrations and whether each has been applied."""
+        from app.migrations import runner
+        for version, name, applied in runner.status(db.engine):
+            click.echo(f"[{'x' if applied else ' '}] {version:04d}_{name}")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans():
+        """Fail if a hot query's plan does a full scan or a model index is missing."""
+        from app.diagnostics import query_plans
+        failed = False
+
+        for table, index in query_plans.missing_indexes(db.engine):
+            click.echo(f"Missing index {index} on {table}; run `flask db-upgrade`")
+            failed = True
+
+        if db.engine.dialect.name not in query_plans.FULL_SCAN_PATTERNS:
+            click.echo(f"Query plan checks are not supported on {db.engine.dialect.name}; only indexes were checked")
+        problems = query_plans.full_scans(db.engine)
+        for scenario, statement, plan in problems:
+            click.echo(f"Full scan in {scenario}:\n{statement}\n  " + "\n  ".join(plan))
+            failed = True
+
+        if failed:
+            raise SystemExit(1)
+        click.echo("All checked query plans use indexes")
@@ -1,21 +1,234 @@
+import math
+from contextlib import contextmanager
+from datetime import timezone
+from zoneinfo import ZoneInfo
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InvalidRequestError, DBAPIError
+from sqlalchemy.orm import Session
 from sqlalchemy.ext.declarative import declarative_base
-from flask import current_app
+from flask import g, request, has_request_context
 
 db = SQLAlchemy()
 
 # Define the Base class for declarative models
 Base = declarative_base()
 
-def get_db():
+def engine_options(config, url=None):
     """
-    Returns a new session from the SQLAlchemy database connection.
-    Ensures that each request gets a separate session.
+    Builds SQLALCHEMY_ENGINE_OPTIONS for the configured database URL, or for `url`.
+    File-backed SQLite, PostgreSQL and SQL Server share the pool settings; in-memory
+    SQLite keeps SQLAlchemy's single-connection pool.
+    Args:
+        config (dict): The Flask app config.
+        url (str, optional): Another database URL, e.g. a read replica's.
+    Returns:
+        dict: Keyword arguments for create_engine.
     """
-    if 'db_session' not in current_app.config:
-        engine = db.engine  # Use SQLAlchemy's engine
-        session_factory = sessionmaker(bind=engine)
-        current_app.config['db_session'] = scoped_session(session_factory)
+    from app.metrics.pool import InstrumentedQueuePool
 
-    return current_app.config['db_session']
+    url = make_url(url or config["SQLALCHEMY_DATABASE_URI"])
+    backend = url.get_backend_name()
+    options = {}
+
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+        pool_pre_ping=config["DB_POOL_PRE_PING"]
+    )
+
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if backend == "postgresql" and timeout_ms:
+        # Passed as a startup option so it survives the rollback on pool return
+        options["connect_args"] = {"options": f"-c statement_timeout={timeout_ms}"}
+    if backend == "mssql" and url.get_driver_name() == "pyodbc":
+        options["fast_executemany"] = config["DB_FAST_EXECUTEMANY"]
+
+    return options
+
+def configure_engine(engine, config):
+    """
+    Applies settings that cannot be expressed as create_engine arguments.
+    On SQL Server (pyodbc) and MySQL the statement timeout is set on every new
+    connection.
+    """
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if not timeout_ms:
+        return
+
+    if engine.dialect.name == "mssql" and engine.driver == "pyodbc":
+        @event.listens_for(engine, "connect")
+        def _set_query_timeout(dbapi_connection, connection_record):
+            # pyodbc only takes whole seconds
+            dbapi_connection.timeout = math.ceil(timeout_ms / 1000)
+    elif engine.dialect.name == "mysql":
+        @event.listens_for(engine, "connect")
+        def _set_max_execution_time(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {int(timeout_ms)}")
+            cursor.close()
+
+class DatabaseClock:
+    """
+    The time zone of the database's clock. Timestamps are stored naive, and the column
+    defaults (CURRENT_TIMESTAMP, GETDATE()) write the database server's time: UTC on
+    SQLite, the server's local time on SQL Server. Timestamps received from clients are
+    converted to that zone, and timestamps read back are interpreted in it.
+    """
+
+    def __init__(self):
+        self.zone = timezone.utc
+
+    def configure(self, zone_name, database_url):
+        """
+        Args:
+            zone_name (str): "UTC", an IANA zone such as "America/Toronto", "local" for
+                this host's zone, or "" to pick UTC on SQLite and "local" elsewhere.
+            database_url (str): The primary database's URL.
+        """
+        if not zone_name:
+            zone_name = "UTC" if make_url(database_url).get_backend_name() == "sqlite" else "local"
+        if zone_name == "local":
+            self.zone = None
+        elif zone_name.upper() == "UTC":
+            self.zone = timezone.utc
+        else:
+            self.zone = ZoneInfo(zone_name)
+
+    def to_database(self, value):
+        """
+        Args:
+            value (datetime): A timestamp; naive values are taken to be in the
+                database's zone already.
+        Returns:
+            datetime: The naive timestamp in the database's zone.
+        """
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(self.zone).replace(tzinfo=None)
+
+    def to_utc(self, value):
+        """
+        Args:
+            value (datetime): A naive timestamp read from the database.
+        Returns:
+            datetime: The same instant as an aware UTC datetime.
+        """
+        if self.zone is None:
+            return value.astimezone(timezone.utc)
+        return value.replace(tzinfo=self.zone).astimezone(timezone.utc)
+
+
+# The primary database's clock, configured by the app factories.
+database_clock = DatabaseClock()
+
+def new_session(engine, read_only=False):
+    """
+    Creates a session on `engine`. Objects stay readable after commit, so a write
+    doesn't need a connection again just to serialize its result.
+    Read-only sessions also skip autoflush and refuse to flush at all.
+    Args:
+        engine (Engine): The engine to bind to.
+        read_only (bool): Whether the session may only read.
+    Returns:
+        Session: The new session.
+    """
+    session = Session(bind=engine, autoflush=not read_only, expire_on_commit=False)
+    session.info["read_only"] = read_only
+    return session
+
+def get_db(read_only=False):
+    """
+    Returns the session for the current request, creating it on first use.
+    GET routes ask for a read-only session; write routes use the default session
+    and wrap their changes in `unit_of_work`. Both are closed by `close_db` when
+    the request ends, which also returns their connections to the pool.
+    When read replicas are configured, the read-only session is bound to one of them,
+    unless the client wrote recently or no replica is usable.
+    Args:
+        read_only (bool): Whether to return the request's read-only session.
+    Returns:
+        Session: The request's session.
+    """
+    key = "db_read_session" if read_only else "db_session"
+    session = g.get(key)
+    if session is None:
+        session = _new_read_session() if read_only else new_session(db.engine)
+        setattr(g, key, session)
+    return session
+
+def _new_read_session():
+    from app.replicas import replica_router, is_pinned_to_primary
+
+    if replica_router.enabled and not (has_request_context() and is_pinned_to_primary(request)):
+        replica = replica_router.choose()
+        if replica is not None:
+            session = new_session(replica, read_only=True)
+            # Replicas may lag, so what they return must not outlive the request in a cache
+            session.info["replica"] = True
+            try:
+                # Connect now so an unreachable replica falls back before any query runs
+                session.connection()
+                return session
+            except DBAPIError:
+                session.close()
+                replica_router.mark_unavailable(replica)
+    return new_session(db.engine, read_only=True)
+
+def close_db(exception=None):
+    """
+    Closes the sessions opened by `get_db` for this request. Any transaction left
+    open is rolled back. Registered with `app.teardown_appcontext`.
+    """
+    for key in ("db_read_session", "db_session"):
+        session = g.pop(key, None)
+        if session is not None:
+            session.close()
+
+@contextmanager
+def unit_of_work(session):
+    """
+    Commits everything done in the block as one transaction, or rolls it back if the
+    block raises. Repositories only flush, so the caller decides where a write ends.
+    The session gives its connection back to the pool as soon as the block exits.
+    Args:
+        session (Session): The session doing the write.
+    """
+    try:
+        yield session
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+
+def after_commit(session, callback):
+    """
+    Runs `callback` once the session's current transaction commits.
+    Used to update in-process caches only with data that is actually durable;
+    the callback is dropped if the transaction rolls back instead.
+    Args:
+        session (Session): The SQLAlchemy session doing the write.
+        callback (callable): A function taking no arguments.
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+@event.listens_for(Session, "before_flush")
+def _reject_read_only_flush(session, flush_context, instances):
+    if session.info.get("read_only"):
+        raise InvalidRequestError("Cannot flush changes from a read-only session")
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit_callbacks(session):
+    for callback in session.info.pop("after_commit", []):
+        callback()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit_callbacks(session):
+    session.info.pop("after_commit", None)
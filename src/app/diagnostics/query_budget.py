@@ -0,0 +1,250 @@
+import functools
+import logging
+import os
+import re
+import sysconfig
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+MODE_OFF = "off"
+MODE_LOG = "log"  # Log budget overruns and suspected N+1 queries
+MODE_RAISE = "raise"  # Raise QueryBudgetExceeded instead, e.g. in tests
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DIAGNOSTICS_DIR = os.path.dirname(os.path.abspath(__file__))
+_LIBRARY_DIRS = tuple({sysconfig.get_paths()["stdlib"], sysconfig.get_paths()["purelib"], sysconfig.get_paths()["platlib"]})
+
+# Placeholder lists of any length ("IN (?, ?, ?)") have the same shape
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+MAX_LOGGED_PARAMETERS = 1000  # Characters of bound parameters kept in the slow-query log
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """
+    Raised in "raise" mode when a block runs more statements than its budget, or
+    repeats one statement shape often enough to look like an N+1 query.
+    """
+
+
+class _Settings:
+    mode = MODE_OFF
+    repeat_threshold = 5
+    slow_query_ms = 0
+
+
+settings = _Settings()
+
+
+class _Frame:
+    __slots__ = ("name", "max_statements", "statements", "shapes", "call_sites")
+
+    def __init__(self, name, max_statements):
+        self.name = name
+        self.max_statements = max_statements
+        self.statements = 0
+        self.shapes = Counter()
+        self.call_sites = {}
+
+
+# The budgets active in the current thread or task, outermost first
+_frames = ContextVar("query_budget_frames", default=())
+
+# Set while statements run once per chunk of a deliberately split IN list
+_chunked = ContextVar("query_budget_chunked", default=False)
+
+
+def statement_shape(statement):
+    """
+    Returns:
+        str: The statement with whitespace and placeholder lists normalized, so
+             repeats with different parameters compare equal.
+    """
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement)).strip()
+
+
+@contextmanager
+def chunked_statements():
+    """
+    Marks the statements run in the block as one per chunk of a split IN list (see
+    app.utils.batching.chunked), so their repeated shape isn't reported as an N+1
+    query. They still count against statement budgets.
+    """
+    # Restored by value rather than with a reset token, since a generator using this
+    # may be closed from another context
+    previous = _chunked.get()
+    _chunked.set(True)
+    try:
+        yield
+    finally:
+        _chunked.set(previous)
+
+
+def _call_site():
+    # The innermost application frame outside this package, e.g. the repository
+    # method or serializer that triggered the statement; otherwise the innermost
+    # frame outside the standard library and installed packages
+    stack = [frame for frame in traceback.extract_stack() if not frame.filename.startswith(_DIAGNOSTICS_DIR)]
+    for frame in reversed(stack):
+        if frame.filename.startswith(_APP_DIR):
+            return f"{os.path.relpath(frame.filename, _APP_DIR)}:{frame.lineno} in {frame.name}"
+    for frame in reversed(stack):
+        if not frame.filename.startswith(_LIBRARY_DIRS):
+            return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+def _report(message):
+    if settings.mode == MODE_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _check(frame, outermost):
+    if frame.max_statements is not None and frame.statements > frame.max_statements:
+        top = ", ".join(f"{count}x {shape[:80]}" for shape, count in frame.shapes.most_common(3))
+        _report(f"{frame.name} ran {frame.statements} SQL statements; its budget is "
+                 f"{frame.max_statements}. Most frequent: {top}")
+    if outermost:
+        for shape, count in frame.shapes.items():
+            if count >= settings.repeat_threshold:
+                _report(f"Suspected N+1 in {frame.name}: the same statement ran {count} times, "
+                        f"first from {frame.call_sites.get(shape, 'unknown')}: {shape[:200]}")
+
+
+class query_budget:
+    """
+    Declares the most SQL statements a block may run. Works as a decorator on routes
+    and repository methods, or as a context manager:
+
+        @query_budget(2)
+        def get_all_users(): ...
+
+        with query_budget(1, "summary"):
+            ...
+
+    Overruns are logged or raised depending on QUERY_BUDGET_MODE. The outermost budget,
+    normally the one opened for the request, also reports statement shapes repeated
+    QUERY_REPEAT_THRESHOLD times or more as suspected N+1 queries.
+    """
+
+    def __init__(self, max_statements=None, name=None):
+        self.max_statements = max_statements
+        self.name = name or "block"
+        self._tokens = []
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with query_budget(self.max_statements, self.name if self.name != "block" else func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        if settings.mode == MODE_OFF:
+            return self
+        frame = _Frame(self.name, self.max_statements)
+        self._tokens.append((_frames.set(_frames.get() + (frame,)), frame))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Don't mask the block's own error with a budget report
+        self.close(check=exc_type is None)
+        return False
+
+    def close(self, check=True):
+        """
+        Ends the most recently entered budget, reporting overruns if `check` is set.
+        """
+        if not self._tokens:
+            return
+        token, frame = self._tokens.pop()
+        outermost = len(_frames.get()) == 1
+        _frames.reset(token)
+        if check:
+            _check(frame, outermost)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    frames = _frames.get()
+    if frames:
+        for frame in frames:
+            frame.statements += 1
+        if not _chunked.get():
+            outermost = frames[0]
+            shape = statement_shape(statement)
+            outermost.shapes[shape] += 1
+            if outermost.shapes[shape] == settings.repeat_threshold:
+                outermost.call_sites[shape] = _call_site()
+    if settings.slow_query_ms:
+        conn.info.setdefault("query_budget_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not settings.slow_query_ms:
+        return
+    elapsed_ms = (time.perf_counter() - conn.info["query_budget_started"].pop()) * 1000
+    if elapsed_ms >= settings.slow_query_ms:
+        logger.warning("Slow query (%.1f ms) from %s: %s; parameters: %s",
+                       elapsed_ms, _call_site(), _WHITESPACE.sub(" ", statement),
+                       repr(parameters)[:MAX_LOGGED_PARAMETERS])
+
+
+def _handle_error(context):
+    started = context.connection.info.get("query_budget_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _open_request_budget():
+    budget = query_budget(name=f"{request.method} {request.path}")
+    budget.__enter__()
+    request.environ["query_budget"] = budget
+
+
+def _close_request_budget(response):
+    # Checked before the response is sent, so "raise" mode fails the request (and a test)
+    budget = request.environ.pop("query_budget", None)
+    if budget is not None:
+        budget.close()
+    return response
+
+
+def _discard_request_budget(exception=None):
+    # The request failed before after_request ran; its own error is what matters
+    budget = request.environ.pop("query_budget", None)
+    if budget is not None:
+        budget.close(check=False)
+
+
+def init_query_budget(app, engines):
+    """
+    Installs the statement counting and slow-query listeners on `engines` and opens a
+    budget for every request, according to QUERY_BUDGET_MODE, QUERY_REPEAT_THRESHOLD
+    and SLOW_QUERY_MS. Nothing is installed when both checks are off.
+    Args:
+        app (Flask): The application.
+        engines (iterable): The engines to watch.
+    """
+    settings.mode = app.config["QUERY_BUDGET_MODE"]
+    settings.repeat_threshold = app.config["QUERY_REPEAT_THRESHOLD"]
+    settings.slow_query_ms = app.config["SLOW_QUERY_MS"]
+    if settings.mode == MODE_OFF and not settings.slow_query_ms:
+        return
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    if settings.mode != MODE_OFF:
+        app.before_request(_open_request_budget)
+        app.after_request(_close_request_budget)
+        app.teardown_request(_discard_request_budget)
@@ -0,0 +1,162 @@
+import logging
+import re
+from datetime import datetime
+from xml.etree import ElementTree
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models.models import User, Activity, Scan, UserScan
+from app.repositories.scan_repository import ScanRepository
+from app.repositories.user_repository import UserRepository
+from app.repositories.user_scan_repository import UserScanRepository
+from app.utils.projection import USER_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Tables that grow with attendance; a full scan of these is a regression
+LARGE_TABLES = {"scans", "userscans"}
+
+FULL_SCAN_PATTERNS = {
+    # SQLite reports "SCAN scans" (optionally "USING [COVERING] INDEX ...") for full scans and
+    # "SEARCH scans USING INDEX ..." for index seeks
+    "sqlite": re.compile(r"\bSCAN (\w+)"),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+    # Summaries from showplan_operators: "Clustered Index Scan on scans", "Index Seek on scans"
+    "mssql": re.compile(r"\b(?:Table|Index) Scan on (\w+)"),
+}
+
+EXPLAIN_PREFIX = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+SHOWPLAN_NAMESPACE = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+_START = datetime(2025, 1, 1)
+_END = datetime(2025, 1, 2)
+
+# The hot read paths, as (name, callable taking a session and the fixture IDs)
+SCENARIOS = [
+    ("GET /users", lambda db, ids: UserRepository.get_scan_rows(
+        db, [row.id for row in UserRepository.get_user_columns_page(db, USER_FIELDS, 50)])),
+    ("GET /users/badge/<badge_code>", lambda db, ids: UserRepository.get_scan_rows(
+        db, [UserRepository.get_user_version_by_badge_code(db, ids["badge_code"]).id])),
+    ("GET /users?scans_limit=", lambda db, ids: UserRepository.get_scan_rows(db, [ids["user_id"]], 5)),
+    ("GET /scanned-users/<badge_code>", lambda db, ids: UserScanRepository.get_users_scanned_by(db, ids["user_id"], 50, (_START, 0))),
+    ("GET /users-who-scanned/<badge_code>", lambda db, ids: UserScanRepository.get_users_who_scanned(db, ids["user_id"], 50, (_START, 0))),
+    ("GET /scan_count_by_time_period", lambda db, ids: ScanRepository.get_scan_count_by_time_period(db, ids["activity_id"], _START, _END, 3600)),
+    ("GET /scans", lambda db, ids: ScanRepository.get_scan_counts(db, 1, 100, "meal")),
+    ("GET /network/* (graph refresh)", lambda db, ids: UserScanRepository.get_user_scan_edges(db, 1).all()),
+]
+
+
+def _insert_fixture(db):
+    # Relationship loaders only run their queries when there are rows to load for
+    user = User(name="plan check", email="plan-check@example.invalid", phone="0", badge_code="__plan_check__")
+    activity = Activity(activity_name="__plan_check__", activity_category="meal")
+    db.add_all([user, activity])
+    db.flush()
+    db.add_all([
+        Scan(user_id=user.id, activity_id=activity.id, scanned_at=_START),
+        UserScan(scanner_id=user.id, scanned_id=user.id, scanned_at=_START),
+    ])
+    db.flush()
+    return {"user_id": user.id, "badge_code": user.badge_code, "activity_id": activity.id}
+
+
+def missing_indexes(engine):
+    """
+    Compares the indexes declared in the models' __table_args__ with the database.
+    Args:
+        engine (Engine): The database engine.
+    Returns:
+        list: (table, index name) for every declared index the database doesn't have.
+    """
+    inspector = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not table.indexes:
+            continue
+        existing = {index["name"].lower() for index in inspector.get_indexes(table.name) if index["name"]}
+        missing += [(table.name, index.name) for index in table.indexes if index.name.lower() not in existing]
+    return missing
+
+
+def showplan_operators(plan_xml):
+    """
+    Summarizes a SQL Server XML showplan.
+    Args:
+        plan_xml (str): The plan returned under SET SHOWPLAN_XML ON.
+    Returns:
+        list: "<PhysicalOp> on <table>" for every operator that reads a table or index.
+    """
+    lines = []
+    for rel_op in ElementTree.fromstring(plan_xml).iter(f"{SHOWPLAN_NAMESPACE}RelOp"):
+        # The operator's own element, e.g. IndexScan, names the objects it reads
+        for operator in rel_op:
+            for table in operator.findall(f"{SHOWPLAN_NAMESPACE}Object"):
+                if table.get("Table"):
+                    lines.append(f"{rel_op.get('PhysicalOp')} on {table.get('Table').strip('[]')}")
+    return lines
+
+
+def _explain(conn, dialect, statement, parameters):
+    if dialect == "mssql":
+        # The estimated plan is returned instead of running the statement; the setting
+        # has to be the only statement in its batch
+        conn.exec_driver_sql("SET SHOWPLAN_XML ON")
+        try:
+            return showplan_operators(conn.exec_driver_sql(statement, parameters).scalar())
+        finally:
+            conn.exec_driver_sql("SET SHOWPLAN_XML OFF")
+    return [
+        " ".join(str(value) for value in row)
+        for row in conn.exec_driver_sql(EXPLAIN_PREFIX[dialect] + statement, parameters)
+    ]
+
+
+def full_scans(engine):
+    """
+    Runs every scenario against the database, EXPLAINs each statement it issues, and
+    reports statements whose plan reads a large table in full. A small fixture is
+    inserted first and rolled back afterwards.
+    Args:
+        engine (Engine): The database engine.
+    Returns:
+        list: (scenario, statement, plan lines) for every statement that does a full scan;
+        empty, with a warning logged, on backends whose plans can't be checked.
+    """
+    dialect = engine.dialect.name
+    if dialect not in FULL_SCAN_PATTERNS:
+        logger.warning("Query plan checks are not supported on %s; skipping them", dialect)
+        return []
+    pattern = FULL_SCAN_PATTERNS[dialect]
+
+    problems = []
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            ids = _insert_fixture(db)
+
+            for name, scenario in SCENARIOS:
+                statements = []
+
+                def capture(conn, cursor, statement, parameters, context, executemany):
+                    if not executemany and statement.lstrip().upper().startswith("SELECT"):
+                        statements.append((statement, parameters))
+
+                event.listen(conn, "before_cursor_execute", capture)
+                try:
+                    scenario(db, ids)
+                finally:
+                    event.remove(conn, "before_cursor_execute", capture)
+
+                for statement, parameters in statements:
+                    plan = _explain(conn, dialect, statement, parameters)
+                    scanned = {table.lower() for line in plan for table in pattern.findall(line)}
+                    if scanned & LARGE_TABLES:
+                        problems.append((name, statement, plan))
+        finally:
+            transaction.rollback()
+    return problems
@@ -0,0 +1,242 @@
+import logging
+import os
+import queue
+import threading
+import time
+from app.repositories.scan_repository import ScanRepository
+from app.database import unit_of_work
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_ENQUEUE = "enqueue"  # Acknowledge as soon as the scan is queued
+DURABILITY_FLUSH = "flush"  # Acknowledge once the scan's group has committed
+
+
+class BufferFull(Exception):
+    pass
+
+
+class PendingScan:
+    """
+    A scan waiting in the buffer. Callers that need flush durability wait on it; once
+    it is flushed, `scanned_at` holds the time the database stamped it with.
+    """
+
+    __slots__ = ("user_id", "activity_name", "activity_category", "scanned_at", "error", "_done")
+
+    def __init__(self, user_id, activity_name, activity_category):
+        self.user_id = user_id
+        self.activity_name = activity_name
+        self.activity_category = activity_category
+        self.scanned_at = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the scan's group has been flushed.
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait.
+        Returns:
+            bool: True if the flush finished (successfully or not) within the timeout.
+        """
+        return self._done.wait(timeout)
+
+    def _finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+
+class ScanBuffer:
+    """
+    A bounded in-process queue of accepted scans, drained by a background thread that
+    commits them in groups. A group is flushed when it reaches `batch_size` scans or when
+    `flush_interval_ms` has passed since its first scan, whichever comes first; with flush
+    durability it is also flushed as soon as the queue is momentarily empty, since its
+    callers are waiting. Each group is one bulk insert, one users.updated_at UPDATE and
+    one commit, instead of one commit per scan.
+    """
+
+    def __init__(self, session_factory, max_size=10000, batch_size=500, flush_interval_ms=50,
+                 durability=DURABILITY_FLUSH, enqueue_timeout=0.5, ack_timeout=5.0):
+        if durability not in (DURABILITY_ENQUEUE, DURABILITY_FLUSH):
+            raise ValueError(f"Unknown scan buffer durability: {durability}")
+        self._session_factory = session_factory
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.durability = durability
+        self.enqueue_timeout = enqueue_timeout
+        # How long a request with flush durability waits for its scan's group to commit
+        self.ack_timeout = ack_timeout
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self.flushed = 0
+        self.failed = 0
+        self.groups = 0
+        self.rejected = 0
+
+    def _ensure_started(self):
+        # Threads don't survive fork(), so a worker process starts its own flusher
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._stopping = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="scan-buffer-flusher", daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, activity_name, activity_category):
+        """
+        Queues a scan for the next group commit.
+        Args:
+            user_id (int): The ID of the user scanning.
+            activity_name (str): The name of the activity.
+            activity_category (str): The category of the activity.
+        Returns:
+            PendingScan: A handle that can be waited on until the scan is flushed.
+        Raises:
+            BufferFull: If the queue stays full for longer than `enqueue_timeout` seconds.
+        """
+        self._ensure_started()
+        if self._stopping:
+            raise BufferFull("Scan buffer is shutting down")
+        pending = PendingScan(user_id, activity_name, activity_category)
+        try:
+            self._queue.put(pending, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise BufferFull("Scan buffer is full")
+        return pending
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping:
+                    return
+                continue
+            if first is None:
+                # Stop sentinel: everything queued before it has been flushed
+                return
+
+            group = [first]
+            deadline = time.monotonic() + self.flush_interval
+            stop_after_flush = False
+            while len(group) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    # Callers waiting on flush durability are blocked until this group commits,
+                    # so don't linger for more scans; whatever arrives meanwhile forms the next group
+                    if self.durability == DURABILITY_FLUSH or remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is None:
+                    stop_after_flush = True
+                    break
+                group.append(item)
+
+            self._flush(group)
+            if stop_after_flush:
+                return
+
+    def _flush(self, group):
+        try:
+            self._commit(group)
+        except Exception as e:
+            if len(group) == 1:
+                logger.exception("Failed to flush a buffered scan")
+                self._finish(group, e)
+                return
+            # One bad scan (e.g. its user was deleted after it was queued) fails the whole
+            # group; commit the scans one by one so only the offending ones fail
+            logger.exception("Failed to flush %d buffered scans; retrying them one by one", len(group))
+            for pending in group:
+                try:
+                    self._commit([pending])
+                except Exception as item_error:
+                    logger.warning("Dropped buffered scan for user %s: %s", pending.user_id, item_error)
+                    self._finish([pending], item_error)
+                else:
+                    self._finish([pending])
+            return
+        self._finish(group)
+
+    def _commit(self, group):
+        # The flusher has its own session; request sessions never cross threads
+        session = self._session_factory()
+        try:
+            with unit_of_work(session):
+                activities = ScanRepository.get_or_create_activities(
+                    session, {pending.activity_name: pending.activity_category for pending in group}
+                )
+                # Stamp the group with the database's clock, like scans written directly;
+                # scans retried one by one keep the time of their first attempt
+                now = ScanRepository.get_database_time(session)
+                for pending in group:
+                    if pending.scanned_at is None:
+                        pending.scanned_at = now
+                ScanRepository.create_scans(session, [{
+                    "user_id": pending.user_id,
+                    "activity": activities[pending.activity_name],
+                    "scanned_at": pending.scanned_at
+                } for pending in group])
+        finally:
+            session.close()
+
+    def _finish(self, group, error=None):
+        with self._lock:
+            if error is None:
+                self.flushed += len(group)
+                self.groups += 1
+            else:
+                self.failed += len(group)
+        for pending in group:
+            pending._finish(error)
+
+    def stop(self, timeout=10):
+        """
+        Stops accepting scans and waits for everything already queued to be flushed.
+        Args:
+            timeout (float): The maximum number of seconds to wait for the drain.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("Scan buffer still full after %ss; %d scans not flushed", timeout, self._queue.qsize())
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Queue depth and capacity, plus flushed/failed/rejected scan and group counters.
+        """
+        with self._lock:
+            return {
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "max_size": self.max_size,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "groups": self.groups,
+                "rejected": self.rejected
+            }
@@ -0,0 +1,111 @@
+import logging
+import time
+from app.database import db, new_session
+
+logger = logging.getLogger(__name__)
+
+
+def dispose_engines(app):
+    """
+    Drops the connections a worker inherited from the process that forked it. The
+    parent keeps using them, so the worker's pools start empty instead of sharing sockets.
+    Args:
+        app (Flask): The application, created before fork().
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def warm_up(app):
+    """
+    Prepares a worker before it accepts requests: opens WARMUP_POOL_CONNECTIONS pooled
+    connections to the primary, and loads the activity map, the badge cache and the
+    networking graph, so the first requests don't pay for connecting or cache misses. Failures are logged, not
+    raised; the worker then warms up on its first requests instead.
+    Args:
+        app (Flask): The application.
+    Returns:
+        dict: The connections opened, badges cached, graph edges and seconds taken.
+    """
+    from app.repositories.scan_repository import ScanRepository
+    from app.repositories.user_repository import UserRepository
+    from app.repositories.user_scan_repository import UserScanRepository
+
+    started = time.perf_counter()
+    with app.app_context():
+        engine = db.engine
+        connections = []
+        try:
+            # Hold them all at once, so the pool really ends up with that many
+            for _ in range(app.config["WARMUP_POOL_CONNECTIONS"]):
+                connections.append(engine.connect())
+        except Exception:
+            logger.exception("Opened only %d connections while warming up", len(connections))
+        finally:
+            for connection in connections:
+                connection.close()
+
+        users = edges = 0
+        session = new_session(engine, read_only=True)
+        try:
+            ScanRepository.load_activities(session)
+            users = UserRepository.prime_badge_cache(session, app.config["BADGE_CACHE_SIZE"])
+            edges = UserScanRepository.get_network_graph(session).stats()["edges"]
+        except Exception:
+            logger.exception("Could not prime the activity and badge caches and the networking graph")
+        finally:
+            session.close()
+
+    return {
+        "connections": len(connections),
+        "badges": users,
+        "network_edges": edges,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def load_network_graph(app):
+    """
+    Loads the networking graph in the process that forks the workers. Its CSR arrays
+    are plain buffers that reference counting never writes to, so the workers share
+    those memory pages instead of each building a copy; each worker then only catches
+    up on the scans recorded since. Failures are logged, not raised; the workers then
+    load the graph while warming up.
+    Args:
+        app (Flask): The application, created before fork().
+    Returns:
+        dict: The graph's stats, or None if it could not be loaded.
+    """
+    from app.repositories.user_scan_repository import UserScanRepository
+
+    with app.app_context():
+        session = new_session(db.engine, read_only=True)
+        try:
+            return UserScanRepository.get_network_graph(session).stats()
+        except Exception:
+            logger.exception("Could not load the networking graph")
+            return None
+        finally:
+            session.close()
+
+
+def shut_down(app, timeout=10):
+    """
+    Flushes the scans still queued in the write-behind buffer and closes the worker's
+    connections. Runs after the server has finished the worker's in-flight requests.
+    Args:
+        app (Flask): The application.
+        timeout (float): The maximum number of seconds to wait for the buffer to drain.
+    Returns:
+        dict: The scan buffer's final stats, or None without a buffer.
+    """
+    stats = None
+    scan_buffer = app.extensions.get("scan_buffer")
+    if scan_buffer is not None:
+        scan_buffer.stop(timeout)
+        stats = scan_buffer.stats()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    return stats
@@ -0,0 +1,297 @@
+import time
+from contextvars import ContextVar
+from flask import Blueprint, Response, current_app, request
+from flask.json.provider import JSONProvider
+from sqlalchemy import event
+from app.database import db, Base
+from app.metrics.registry import Registry, Counter, Gauge
+
+registry = Registry()
+
+ROUTE_LABELS = ("method", "route")
+
+http_requests = registry.counter(
+    "http_requests_total", "Requests served.", ROUTE_LABELS + ("status",))
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time from the start of a request until it is torn down.", ROUTE_LABELS)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests currently being handled.")
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "Response body size.", ROUTE_LABELS,
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216))
+sql_statements = registry.histogram(
+    "http_request_sql_statements", "SQL statements run by one request.", ROUTE_LABELS,
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, 250))
+sql_duration = registry.histogram(
+    "http_request_sql_duration_seconds", "Time one request spent executing SQL statements.", ROUTE_LABELS)
+orm_rows = registry.histogram(
+    "http_request_orm_rows_hydrated", "ORM objects loaded by one request.", ROUTE_LABELS,
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000))
+json_encode_duration = registry.histogram(
+    "http_request_json_encode_seconds", "Time one request spent encoding JSON responses.", ROUTE_LABELS)
+background_statements = registry.counter(
+    "db_background_statements_total", "SQL statements run outside a request, e.g. by the scan buffer.")
+
+
+class RequestStats:
+    __slots__ = ("started", "statements", "sql_seconds", "rows", "json_seconds", "status", "size")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.json_seconds = 0.0
+        self.status = 500
+        self.size = None
+
+
+# The stats of the request being handled in the current thread or task
+_current = ContextVar("request_stats", default=None)
+
+
+def _route_labels():
+    return request.method, request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    if request.endpoint == "metrics.metrics":
+        return
+    _current.set(RequestStats())
+    http_in_flight.inc()
+
+
+def _after_request(response):
+    stats = _current.get()
+    if stats is not None:
+        stats.status = response.status_code
+        stats.size = response.content_length
+    return response
+
+
+def _teardown_request(exception=None):
+    stats = _current.get()
+    if stats is None:
+        return
+    _current.set(None)
+    http_in_flight.dec()
+    labels = _route_labels()
+    http_requests.inc(labels + (str(stats.status),))
+    http_request_duration.observe(time.perf_counter() - stats.started, labels)
+    if stats.size is not None:
+        http_response_size.observe(stats.size, labels)
+    sql_statements.observe(stats.statements, labels)
+    sql_duration.observe(stats.sql_seconds, labels)
+    orm_rows.observe(stats.rows, labels)
+    json_encode_duration.observe(stats.json_seconds, labels)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        background_statements.inc()
+        return
+    stats.statements += 1
+    stats.sql_seconds += time.perf_counter() - started
+
+
+def _handle_error(context):
+    started = context.connection.info.get("metrics_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def _on_load(target, context):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+class TimedJSONProvider(JSONProvider):
+    """
+    Wraps the app's JSON provider and adds the time spent encoding responses to the
+    current request's stats.
+    """
+
+    def __init__(self, app, inner):
+        super().__init__(app)
+        self.inner = inner
+
+    def _timed(self, encode, *args, **kwargs):
+        stats = _current.get()
+        if stats is None:
+            return encode(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return encode(*args, **kwargs)
+        finally:
+            stats.json_seconds += time.perf_counter() - started
+
+    def dumps(self, obj, **kwargs):
+        return self._timed(self.inner.dumps, obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return self.inner.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        return self._timed(self.inner.response, *args, **kwargs)
+
+
+def _component_metrics():
+    """
+    Reads pool, cache, buffer and replica stats at scrape time, so they cost nothing
+    between scrapes.
+    """
+    from app.cache.badge_cache import badge_cache
+    from app.cache.network_graph import network_graph
+    from app.cache.recent_scans import recent_scans
+    from app.cache.scan_feed import scan_feed
+    from app.cache.response_cache import response_cache
+    from app.replicas import replica_router
+
+    metrics = []
+
+    pool_gauges = {
+        key: Gauge(f"db_pool_{key}", help_text, ("engine",)) for key, help_text in (
+            ("pool_size", "Connections the pool keeps open."),
+            ("checked_out", "Connections currently checked out."),
+            ("saturation", "Checked-out connections over pool_size + max_overflow."),
+            ("checkout_wait_seconds_max", "Longest wait for a connection.")
+        )
+    }
+    pool_counters = {
+        key: Counter(name, help_text, ("engine",)) for key, name, help_text in (
+            ("checkouts", "db_pool_checkouts_total", "Connections checked out of the pool."),
+            ("checkout_timeouts", "db_pool_checkout_timeouts_total", "Checkouts that timed out waiting for a connection."),
+            ("checkout_wait_seconds_total", "db_pool_checkout_wait_seconds_total", "Total time spent waiting for connections.")
+        )
+    }
+    for name, engine in db.engines.items():
+        if not hasattr(engine.pool, "stats"):
+            continue
+        stats = engine.pool.stats()
+        labels = (name or "primary",)
+        for key, metric in {**pool_gauges, **pool_counters}.items():
+            if isinstance(metric, Gauge):
+                metric.set(stats[key], labels)
+            else:
+                metric.inc(labels, stats[key])
+    metrics.extend(pool_gauges.values())
+    metrics.extend(pool_counters.values())
+
+    cache = badge_cache.stats()
+    cache_size = Gauge("badge_cache_entries", "Entries in the badge lookup cache.")
+    cache_size.set(cache["size"])
+    cache_lookups = Counter("badge_cache_lookups_total", "Badge cache lookups.", ("result",))
+    cache_lookups.inc(("hit",), cache["hits"])
+    cache_lookups.inc(("miss",), cache["misses"])
+    cache_evictions = Counter("badge_cache_evictions_total", "Entries evicted from the badge cache.")
+    cache_evictions.inc(amount=cache["evictions"])
+    metrics.extend([cache_size, cache_lookups, cache_evictions])
+
+    if response_cache.enabled:
+        stats = response_cache.stats()
+        entries = Gauge("response_cache_entries", "Entries in the response cache.", ("backend",))
+        entries.set(stats["size"], (stats["backend"],))
+        lookups = Counter("response_cache_lookups_total", "Response cache lookups by outcome.", ("result",))
+        for result in ("hits", "misses", "stale", "coalesced"):
+            lookups.inc((result,), stats[result])
+        skipped = Counter("response_cache_skipped_stores_total",
+                          "Responses not stored because a tag was invalidated while or just before computing them.")
+        skipped.inc(amount=stats["skipped"])
+        metrics.extend([entries, lookups, skipped])
+
+    if network_graph.loaded:
+        stats = network_graph.stats()
+        graph_size = Gauge("network_graph_size", "Users and connections in the networking graph.", ("kind",))
+        graph_size.set(stats["users"], ("users",))
+        graph_size.set(stats["edges"], ("edges",))
+        graph_size.set(stats["pending_edges"], ("pending_edges",))
+        compactions = Counter("network_graph_compactions_total", "Rebuilds of the graph's CSR arrays.")
+        compactions.inc(amount=stats["compactions"])
+        metrics.extend([graph_size, compactions])
+
+    stats = recent_scans.stats()
+    recent = Gauge("scan_dedupe_entries", "Recent scans remembered for duplicate suppression.")
+    recent.set(stats["size"])
+    duplicates = Counter("scan_dedupe_duplicates_total", "Repeat scans answered without an insert.")
+    duplicates.inc(amount=stats["duplicates"])
+    metrics.extend([recent, duplicates])
+
+    stats = scan_feed.stats()
+    clients = Gauge("scan_stream_clients", "Open /scans/stream connections.")
+    clients.set(stats["clients"])
+    updates = Counter("scan_stream_updates_total", "Count updates sent to /scans/stream clients.")
+    updates.inc(amount=stats["updates"])
+    metrics.extend([clients, updates])
+
+    scan_buffer = current_app.extensions.get("scan_buffer")
+    if scan_buffer is not None:
+        stats = scan_buffer.stats()
+        queued = Gauge("scan_buffer_queued", "Scans waiting in the write-behind buffer.")
+        queued.set(stats["queued"])
+        scans = Counter("scan_buffer_scans_total", "Buffered scans by outcome.", ("outcome",))
+        for outcome in ("flushed", "failed", "rejected"):
+            scans.inc((outcome,), stats[outcome])
+        groups = Counter("scan_buffer_groups_total", "Group commits done by the scan buffer.")
+        groups.inc(amount=stats["groups"])
+        metrics.extend([queued, scans, groups])
+
+    if replica_router.enabled:
+        stats = replica_router.stats()
+        available = Gauge("db_replica_available", "Whether reads are routed to the replica.", ("replica",))
+        lag = Gauge("db_replica_lag_seconds", "Last measured replication lag.", ("replica",))
+        reads = Counter("db_replica_reads_total", "Read-only sessions bound to the replica.", ("replica",))
+        for name, replica in stats["replicas"].items():
+            available.set(int(replica["available"]), (name,))
+            lag.set(replica["lag_seconds"], (name,))
+            reads.inc((name,), replica["reads"])
+        fallbacks = Counter("db_replica_fallbacks_total", "Reads that fell back to the primary.")
+        fallbacks.inc(amount=stats["fallbacks"])
+        metrics.extend([available, lag, reads, fallbacks])
+
+    return metrics
+
+
+registry.add_collector(_component_metrics)
+
+metrics_bp = Blueprint("metrics", __name__)
+
+"""
+Exposes the request, database and component metrics in the Prometheus text format.
+Returns:
+    Response: 200 OK with the metrics as text/plain.
+"""
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    """
+    Installs the request hooks, engine and ORM events, JSON timing and the /metrics
+    endpoint. Nothing is installed when METRICS_ENABLED is off.
+    Args:
+        app (Flask): The application, after the database is initialized.
+    """
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.json = TimedJSONProvider(app, app.json)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+            event.listen(engine, "handle_error", _handle_error)
+    if not event.contains(Base, "load", _on_load):
+        event.listen(Base, "load", _on_load, propagate=True)
+    app.register_blueprint(metrics_bp)
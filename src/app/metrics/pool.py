@@ -0,0 +1,59 @@
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait for a connection and how close
+    the pool is to its limit. Read the numbers with `stats()`, e.g.
+    `db.engine.pool.stats()`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._peak_checked_out = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+        checked_out = self.checkedout()
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._peak_checked_out = max(self._peak_checked_out, checked_out)
+        return connection
+
+    def stats(self):
+        """
+        Returns:
+            dict: Checkout counters since the pool was created and its current usage.
+                  saturation is checked-out connections over pool_size + max_overflow.
+        """
+        capacity = self.size() + max(self._max_overflow, 0)
+        checked_out = self.checkedout()
+        with self._stats_lock:
+            return {
+                "pool_size": self.size(),
+                "max_overflow": self._max_overflow,
+                "checked_out": checked_out,
+                "peak_checked_out": self._peak_checked_out,
+                "saturation": checked_out / capacity if capacity else 0.0,
+                "checkouts": self._checkouts,
+                "checkout_timeouts": self._timeouts,
+                "checkout_wait_seconds_total": self._wait_total,
+                "checkout_wait_seconds_max": self._wait_max
+            }
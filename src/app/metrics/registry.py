@@ -0,0 +1,152 @@
+import bisect
+import math
+import threading
+
+# Latency buckets in seconds, as in the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def samples(self):
+        """
+        Returns:
+            list: (name suffix, label names, label values, value) tuples.
+        """
+        with self._lock:
+            return [("", self.labelnames, labels, value) for labels, value in self._values.items()]
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, e.g. the number of requests served.
+    """
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, e.g. the number of requests in flight.
+    """
+    type = "gauge"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, value, labels=()):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into cumulative buckets, e.g. request latencies.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum of all observations
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+
+    def samples(self):
+        labelnames = self.labelnames + ("le",)
+        samples = []
+        with self._lock:
+            for labels, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), counts):
+                    cumulative += count
+                    samples.append(("_bucket", labelnames, labels + (_format_value(bound),), cumulative))
+                samples.append(("_sum", self.labelnames, labels, total))
+                samples.append(("_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+class Registry:
+    """
+    Holds the metrics updated by the request hooks plus collectors that read other
+    components' stats only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        Args:
+            collector (callable): Returns fresh metrics to render, e.g. gauges set from
+                a component's stats(), each time the registry is rendered.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format.
+        """
+        metrics = list(self._metrics)
+        for collector in self._collectors:
+            metrics.extend(collector())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, names, values, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
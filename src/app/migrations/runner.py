@@ -0,0 +1,84 @@
+import importlib.util
+import os
+import re
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, insert, select
+
+VERSIONS_DIR = os.path.join(os.path.dirname(__file__), "versions")
+VERSION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+
+metadata = MetaData()
+
+# One row per applied migration
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def discover():
+    """
+    Finds every migration in the versions directory.
+    Each migration is a module named `NNNN_description.py` that defines `upgrade(conn)`.
+    Returns:
+        list: (version, name, module) tuples in version order.
+    """
+    migrations = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        match = VERSION_FILE.match(filename)
+        if not match:
+            continue
+        spec = importlib.util.spec_from_file_location(
+            f"app.migrations.versions.{filename[:-3]}", os.path.join(VERSIONS_DIR, filename)
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append((int(match.group(1)), match.group(2), module))
+    return migrations
+
+
+def applied_versions(engine):
+    """
+    Args:
+        engine (Engine): The database engine.
+    Returns:
+        set: The versions already applied to the database.
+    """
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine, target=None):
+    """
+    Applies every pending migration up to `target`, each in its own transaction
+    together with its schema_migrations row.
+    Args:
+        engine (Engine): The database engine.
+        target (int, optional): The last version to apply; defaults to the newest.
+    Returns:
+        list: (version, name) of the migrations that were applied.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for version, name, module in discover():
+        if version in done or (target is not None and version > target):
+            continue
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(insert(schema_migrations).values(version=version, name=name, applied_at=datetime.now()))
+        applied.append((version, name))
+    return applied
+
+
+def status(engine):
+    """
+    Args:
+        engine (Engine): The database engine.
+    Returns:
+        list: (version, name, applied) for every known migration.
+    """
+    done = applied_versions(engine)
+    return [(version, name, version in done) for version, name, _ in discover()]
@@ -0,0 +1,44 @@
+"""
+Creates the original tables (DbScripts/CreateDB.sql and UserScan.sql) on databases
+that don't have them yet, e.g. local SQLite or PostgreSQL stand-ins.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, func
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("name", String(255), nullable=False),
+    Column("email", String(255), unique=True, nullable=False),
+    Column("phone", String(50), nullable=False),
+    Column("badge_code", String(255), unique=True, nullable=False),
+    Column("updated_at", DateTime, server_default=func.now(), nullable=False),
+)
+
+Table(
+    "activities", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("activity_name", String(255), unique=True, nullable=False),
+    Column("activity_category", String(255), nullable=False),
+)
+
+Table(
+    "scans", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("activity_id", Integer, ForeignKey("activities.id", ondelete="CASCADE"), nullable=False),
+    Column("scanned_at", DateTime, nullable=False),
+)
+
+Table(
+    "userscans", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("scanner_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("scanned_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("scanned_at", DateTime, server_default=func.now(), nullable=False),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,38 @@
+"""
+Adds the per-activity scan summary read by GET /scans (DbScripts/ActivityScanCounts.sql)
+and backfills it from the existing scans.
+"""
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, func, insert, select
+
+metadata = MetaData()
+
+activities = Table(
+    "activities", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("activity_category", String(255)),
+)
+
+scans = Table(
+    "scans", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("activity_id", Integer),
+)
+
+activity_scan_counts = Table(
+    "activity_scan_counts", metadata,
+    Column("activity_id", Integer, ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True, autoincrement=False),
+    Column("activity_category", String(255), nullable=False),
+    Column("scan_count", Integer, nullable=False, default=0),
+)
+
+
+def upgrade(conn):
+    if conn.dialect.has_table(conn, "activity_scan_counts"):
+        return
+    activity_scan_counts.create(conn)
+    counts = (
+        select(activities.c.id, activities.c.activity_category, func.count(scans.c.id))
+        .join(scans, scans.c.activity_id == activities.c.id)
+        .group_by(activities.c.id, activities.c.activity_category)
+    )
+    conn.execute(insert(activity_scan_counts).from_select(["activity_id", "activity_category", "scan_count"], counts))
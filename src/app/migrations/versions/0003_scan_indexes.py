@@ -0,0 +1,39 @@
+"""
+Adds the indexes behind the aggregate, user profile and networking queries
+(DbScripts/Indexes.sql). Mirrors the __table_args__ of Scan and UserScan in app/models/models.py.
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table
+
+metadata = MetaData()
+
+scans = Table(
+    "scans", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer),
+    Column("activity_id", Integer),
+    Column("scanned_at", DateTime),
+)
+
+userscans = Table(
+    "userscans", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("scanner_id", Integer),
+    Column("scanned_id", Integer),
+    Column("scanned_at", DateTime),
+)
+
+INDEXES = [
+    Index("ix_scans_activity_id_scanned_at", scans.c.activity_id, scans.c.scanned_at),
+    Index(
+        "ix_scans_user_id", scans.c.user_id,
+        mssql_include=["activity_id", "scanned_at"], postgresql_include=["activity_id", "scanned_at"]
+    ),
+    Index("ix_scans_scanned_at", scans.c.scanned_at),
+    Index("ix_userscans_scanner_id_scanned_at", userscans.c.scanner_id, userscans.c.scanned_at, userscans.c.id),
+    Index("ix_userscans_scanned_id_scanned_at", userscans.c.scanned_id, userscans.c.scanned_at, userscans.c.id),
+]
+
+
+def upgrade(conn):
+    for index in INDEXES:
+        index.create(conn, checkfirst=True)
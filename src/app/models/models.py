@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class UserScan(Base):
     __tablename__ = "userscans"
+    # Kept in sync with app/migrations/versions/0003_scan_indexes.py and DbScripts/Indexes.sql
+    __table_args__ = (
+        Index("ix_userscans_scanner_id_scanned_at", "scanner_id", "scanned_at", "id"),
+        Index("ix_userscans_scanned_id_scanned_at", "scanned_id", "scanned_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     scanner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -38,6 +43,15 @@ class Activity(Base):
 
 class Scan(Base):
     __tablename__ = "scans"
+    # Kept in sync with app/migrations/versions/0003_scan_indexes.py and DbScripts/Indexes.sql
+    __table_args__ = (
+        Index("ix_scans_activity_id_scanned_at", "activity_id", "scanned_at"),
+        Index(
+            "ix_scans_user_id", "user_id",
+            mssql_include=["activity_id", "scanned_at"], postgresql_include=["activity_id", "scanned_at"]
+        ),
+        Index("ix_scans_scanned_at", "scanned_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -46,3 +60,11 @@ class Scan(Base):
 
     user = relationship("User", back_populates="scans")
     activity = relationship("Activity", back_populates="scans")
+
+class ActivityScanCount(Base):
+    __tablename__ = "activity_scan_counts"
+
+    # Maintained alongside every scan insert so GET /scans reads one row per activity
+    activity_id = Column(Integer, ForeignKey("activities.id"), primary_key=True)
+    activity_category = Column(String, nullable=False)
+    scan_count = Column(Integer, nullable=False, default=0)
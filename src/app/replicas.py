@@ -0,0 +1,178 @@
+import itertools
+import logging
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+# Cookie that keeps a client's reads on the primary for a while after it writes
+PRIMARY_PIN_COOKIE = "db_primary_until"
+
+# Replication lag in seconds, per dialect. Dialects without a probe only get a
+# liveness check and are assumed to be within the staleness tolerance.
+LAG_QUERIES = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+        "ELSE 0 END"
+    )
+}
+
+
+class _Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.lag = 0.0
+        self.checked_at = 0.0
+        self.unavailable_until = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for read-only sessions. Replicas are used round-robin while they
+    answer and their replication lag is within `max_lag`; otherwise reads fall back to
+    the primary. Health and lag are re-checked at most every `check_interval` seconds,
+    and a replica that fails is skipped for `retry_after` seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._replicas = []
+        self._cycle = iter(())
+        self.max_lag = 5.0
+        self.check_interval = 2.0
+        self.retry_after = 30.0
+        self.fallbacks = 0
+
+    def configure(self, engines, max_lag=5.0, check_interval=2.0, retry_after=30.0):
+        """
+        Args:
+            engines (dict): Replica name -> Engine.
+            max_lag (float): The staleness tolerance in seconds.
+            check_interval (float): Seconds between health and lag checks of a replica.
+            retry_after (float): Seconds a failed replica is skipped for.
+        """
+        replicas = [_Replica(name, engine) for name, engine in engines.items()]
+        for replica in replicas:
+            event.listen(replica.engine, "handle_error", self._on_error(replica))
+        with self._lock:
+            self._replicas = replicas
+            self._cycle = itertools.cycle(replicas) if replicas else iter(())
+            self.max_lag = max_lag
+            self.check_interval = check_interval
+            self.retry_after = retry_after
+            self.fallbacks = 0
+
+    @property
+    def enabled(self):
+        return bool(self._replicas)
+
+    def _on_error(self, replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.mark_unavailable(replica.engine)
+        return handle_error
+
+    def mark_unavailable(self, engine):
+        """
+        Stops routing reads to the replica behind `engine` for `retry_after` seconds.
+        """
+        for replica in self._replicas:
+            if replica.engine is engine:
+                with self._lock:
+                    replica.failures += 1
+                    replica.unavailable_until = time.monotonic() + self.retry_after
+                logger.warning("Replica %s is unavailable, reading from the primary", replica.name)
+
+    def _check(self, replica, now):
+        query = LAG_QUERIES.get(replica.engine.dialect.name, "SELECT 1")
+        try:
+            with replica.engine.connect() as conn:
+                value = conn.execute(text(query)).scalar()
+        except DBAPIError:
+            self.mark_unavailable(replica.engine)
+            return
+        replica.lag = float(value) if replica.engine.dialect.name in LAG_QUERIES else 0.0
+        replica.checked_at = now
+
+    def choose(self):
+        """
+        Returns:
+            Engine: A healthy replica within the staleness tolerance, or None to use the primary.
+        """
+        for _ in range(len(self._replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+            now = time.monotonic()
+            if now < replica.unavailable_until:
+                continue
+            if now - replica.checked_at >= self.check_interval:
+                self._check(replica, now)
+                if now < replica.unavailable_until:
+                    continue
+            if replica.lag > self.max_lag:
+                continue
+            with self._lock:
+                replica.reads += 1
+            return replica.engine
+        if self._replicas:
+            with self._lock:
+                self.fallbacks += 1
+        return None
+
+    def stats(self):
+        """
+        Returns:
+            dict: Per-replica state and the number of reads that fell back to the primary.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "fallbacks": self.fallbacks,
+                "replicas": {
+                    replica.name: {
+                        "available": now >= replica.unavailable_until,
+                        "lag_seconds": replica.lag,
+                        "reads": replica.reads,
+                        "failures": replica.failures
+                    }
+                    for replica in self._replicas
+                }
+            }
+
+
+def pin_writes_to_primary(response, request, window):
+    """
+    After a successful write, sets a cookie that sends the client's reads to the
+    primary for `window` seconds, so it reads its own writes even if replicas lag.
+    Args:
+        response (Response): The response to the write request.
+        request (Request): The write request.
+        window (float): The staleness tolerance in seconds.
+    Returns:
+        Response: The response, with the cookie set if the request wrote.
+    """
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(PRIMARY_PIN_COOKIE, f"{time.time() + window:.3f}",
+                            max_age=int(window) + 1, httponly=True, samesite="Lax")
+    return response
+
+
+def is_pinned_to_primary(request):
+    """
+    Returns:
+        bool: Whether the request carries a live read-your-writes cookie.
+    """
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Shared by every request in this process.
+replica_router = ReplicaRouter()
@@ -1,48 +1,295 @@
+from collections import Counter
 from sqlalchemy.orm import Session
-from app.models.models import User, Activity, Scan
-from sqlalchemy import func, cast, Time
-from sqlalchemy.sql import text
+from app.models.models import User, Activity, Scan, ActivityScanCount
+from app.database import after_commit, database_clock
+from app.cache.activity_cache import activity_cache, ActivityRef
+from app.cache.response_cache import response_cache, scan_tags
+from app.cache.scan_feed import scan_feed
+from app.utils.batching import chunked
+from sqlalchemy import func, update, insert, delete, select, literal, DateTime
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from app.repositories.sql_functions import seconds_since
 
 class ScanRepository:
 
     """
-    Checks if an activity exists in the database by activity_name. If it doesn't exist, 
-    creates a new activity record and commits it to the database.
+    Loads every activity into the in-process activity map.
+    Args:
+        db (Session): The SQLAlchemy session.
+    """
+    @staticmethod
+    def load_activities(db: Session):
+        rows = db.query(Activity.id, Activity.activity_name, Activity.activity_category).all()
+        activity_cache.load(ActivityRef(*row) for row in rows)
+
+    """
+    Looks up a single activity by name in the database.
+    Args:
+        db (Session): The SQLAlchemy session.
+        activity_name (str): The name of the activity.
+    Returns:
+        ActivityRef: The activity, or None if it doesn't exist.
+    """
+    @staticmethod
+    def _find_activity(db: Session, activity_name: str):
+        row = (
+            db.query(Activity.id, Activity.activity_name, Activity.activity_category)
+            .filter(Activity.activity_name == activity_name)
+            .first()
+        )
+        return ActivityRef(*row) if row else None
+
+    """
+    Inserts an activity in one statement, doing nothing if another transaction already
+    inserted the same activity_name. PostgreSQL and SQLite use ON CONFLICT DO NOTHING;
+    other backends wrap a plain INSERT in a savepoint and swallow the unique violation.
     Args:
         db (Session): The SQLAlchemy session.
         activity_name (str): The name of the activity.
         activity_category (str): The category under which the activity falls.
     Returns:
-        Activity: The existing or newly created Activity object with related information.
+        int: The new activity's ID, or None if the name already existed.
+    """
+    @staticmethod
+    def _insert_activity(db: Session, activity_name: str, activity_category: str):
+        values = {"activity_name": activity_name, "activity_category": activity_category}
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+            stmt = (
+                dialect_insert(Activity).values(**values)
+                .on_conflict_do_nothing(index_elements=[Activity.activity_name])
+                .returning(Activity.id)
+            )
+            return db.execute(stmt).scalar()
+        try:
+            with db.begin_nested():
+                return db.execute(insert(Activity).values(**values).returning(Activity.id)).scalar()
+        except IntegrityError:
+            return None
+
+    """
+    Resolves an activity by activity_name, creating it if it doesn't exist.
+    Known activities are served from the in-process activity map (loaded in full on first
+    use); a miss is looked up in the database, and only then inserted. The insert does not
+    commit, so it shares a transaction with the scan that follows, and it tolerates a
+    concurrent insert of the same name.
+    Args:
+        db (Session): The SQLAlchemy session.
+        activity_name (str): The name of the activity.
+        activity_category (str): The category under which the activity falls.
+    Returns:
+        ActivityRef: The existing or newly created activity's ID, name and category.
     """
     @staticmethod
     def get_or_create_activity(db: Session, activity_name: str, activity_category: str):
-        activity = db.query(Activity).filter(Activity.activity_name == activity_name).first()
-        if not activity:
-            activity = Activity(activity_name=activity_name, activity_category=activity_category)
-            db.add(activity)
-            db.commit()
-            db.refresh(activity)
+        if not activity_cache.loaded:
+            ScanRepository.load_activities(db)
+
+        activity = activity_cache.get(activity_name)
+        if activity:
+            return activity
+
+        # Refresh on miss: another worker may have created it since the map was loaded
+        activity = ScanRepository._find_activity(db, activity_name)
+        if activity:
+            activity_cache.add(activity)
+            return activity
+
+        activity_id = ScanRepository._insert_activity(db, activity_name, activity_category)
+        if activity_id is None:
+            # Lost the race to a concurrent insert; use the winner's row
+            activity = ScanRepository._find_activity(db, activity_name)
+            activity_cache.add(activity)
+            return activity
+
+        activity = ActivityRef(activity_id, activity_name, activity_category)
+        after_commit(db, lambda: activity_cache.add(activity))
         return activity
 
+    """
+    Resolves many activities at once, creating the ones that don't exist yet.
+    Known activities come from the in-process activity map; the rest are looked up with
+    one IN query per chunk, and only names still missing after that are inserted. Like
+    get_or_create_activity, nothing is committed here.
+    Args:
+        db (Session): The SQLAlchemy session.
+        activities (dict): activity_name -> activity_category for every activity needed.
+    Returns:
+        dict: activity_name -> ActivityRef for every requested activity.
+    """
+    @staticmethod
+    def get_or_create_activities(db: Session, activities: dict):
+        if not activity_cache.loaded:
+            ScanRepository.load_activities(db)
+
+        resolved = {}
+        missing = []
+        for activity_name in activities:
+            activity = activity_cache.get(activity_name)
+            if activity:
+                resolved[activity_name] = activity
+            else:
+                missing.append(activity_name)
+
+        for chunk in chunked(missing):
+            rows = (
+                db.query(Activity.id, Activity.activity_name, Activity.activity_category)
+                .filter(Activity.activity_name.in_(chunk))
+                .all()
+            )
+            for row in rows:
+                activity = ActivityRef(*row)
+                activity_cache.add(activity)
+                resolved[activity.activity_name] = activity
+
+        for activity_name in missing:
+            if activity_name not in resolved:
+                resolved[activity_name] = ScanRepository.get_or_create_activity(
+                    db, activity_name, activities[activity_name]
+                )
+        return resolved
+
+    """
+    Adds scan deltas to the per-activity summary table, creating missing rows.
+    PostgreSQL and SQLite do this with a single multi-row INSERT ... ON CONFLICT DO UPDATE;
+    other backends UPDATE first and fall back to a savepoint-wrapped INSERT, retrying the
+    UPDATE if a concurrent transaction created the row first. Runs inside the caller's
+    transaction, so the summary commits or rolls back together with the scans; the live
+    scan feed gets the deltas once it commits.
+    Args:
+        db (Session): The SQLAlchemy session.
+        deltas (dict): ActivityRef -> number of scans added.
+    """
+    @staticmethod
+    def _increment_scan_counts(db: Session, deltas: dict):
+        published = dict(deltas)
+        after_commit(db, lambda: scan_feed.publish(published))
+        dialect = db.get_bind().dialect.name
+        # Increment in activity ID order so concurrent transactions lock rows in the same order
+        deltas = sorted(deltas.items())
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+            for chunk in chunked(deltas):
+                stmt = dialect_insert(ActivityScanCount).values([{
+                    "activity_id": activity.id,
+                    "activity_category": activity.activity_category,
+                    "scan_count": delta
+                } for activity, delta in chunk])
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=[ActivityScanCount.activity_id],
+                    set_={"scan_count": ActivityScanCount.scan_count + stmt.excluded.scan_count}
+                ))
+            return
+
+        for activity, delta in deltas:
+            increment = (
+                update(ActivityScanCount)
+                .where(ActivityScanCount.activity_id == activity.id)
+                .values(scan_count=ActivityScanCount.scan_count + delta)
+            )
+            if db.execute(increment, execution_options={"synchronize_session": False}).rowcount:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(insert(ActivityScanCount).values(
+                        activity_id=activity.id, activity_category=activity.activity_category, scan_count=delta
+                    ))
+            except IntegrityError:
+                db.execute(increment, execution_options={"synchronize_session": False})
+
+    """
+    Inserts many scans in the caller's transaction. The scan rows are sent as one
+    executemany/bulk INSERT, each affected user's updated_at is bumped with one
+    UPDATE per chunk of user IDs, and the activity summary gets one increment per
+    activity. Cached responses tagged with the scans' activities, categories and
+    users are invalidated once the transaction commits.
+    Args:
+        db (Session): The SQLAlchemy session.
+        scans (list): Dicts with user_id, activity (ActivityRef) and scanned_at keys.
+    Returns:
+        int: The number of scans inserted.
+    """
+    @staticmethod
+    def create_scans(db: Session, scans: list):
+        if not scans:
+            return 0
+        db.execute(insert(Scan), [{
+            "user_id": scan["user_id"],
+            "activity_id": scan["activity"].id,
+            "scanned_at": scan["scanned_at"]
+        } for scan in scans])
+        user_ids = {scan["user_id"] for scan in scans}
+        for chunk in chunked(sorted(user_ids)):
+            db.execute(
+                update(User).where(User.id.in_(chunk)).values(updated_at=func.now()),
+                execution_options={"synchronize_session": False}
+            )
+        ScanRepository._increment_scan_counts(db, Counter(scan["activity"] for scan in scans))
+        tags = {tag for scan in scans for tag in scan_tags(scan["activity"], scan["user_id"])}
+        after_commit(db, lambda: response_cache.invalidate(*tags))
+        return len(scans)
+
+    """
+    Reads the database's current time, the clock the scans.scanned_at column default uses,
+    so scans stamped by the app agree with scans stamped by the database.
+    Args:
+        db (Session): The SQLAlchemy session.
+    Returns:
+        datetime: The naive current time in the database clock's zone.
+    """
+    @staticmethod
+    def get_database_time(db: Session):
+        return database_clock.to_database(db.execute(select(func.now())).scalar_one())
+
     """
     Creates a new scan record for a user and activity. The scan is timestamped with the current time.
+    Cached responses that depend on the activity, its category or the user are invalidated on commit.
     Args:
         db (Session): The SQLAlchemy session.
-        user (User): The User object representing the person scanning.
-        activity (Activity): The Activity object representing the scanned activity.
+        user_id (int): The ID of the user scanning.
+        activity (ActivityRef): The activity being scanned.
     Returns:
         Scan: The newly created Scan object.
     """
     @staticmethod
-    def create_scan(db: Session, user: User, activity: Activity):
-        scan = Scan(user_id=user.id, activity_id=activity.id, scanned_at=func.now())
+    def create_scan(db: Session, user_id: int, activity: ActivityRef):
+        scan = Scan(user_id=user_id, activity_id=activity.id, scanned_at=func.now())
         db.add(scan)
-        user.updated_at = func.now()  # Update user's last modified timestamp
-        db.commit()
+        # Update user's last modified timestamp
+        db.execute(
+            update(User).where(User.id == user_id).values(updated_at=func.now()),
+            execution_options={"synchronize_session": False}
+        )
+        ScanRepository._increment_scan_counts(db, {activity: 1})
+        after_commit(db, lambda: response_cache.invalidate(*scan_tags(activity, user_id)))
+        db.flush()
         db.refresh(scan)
         return scan
 
+    """
+    Rebuilds the per-activity summary table from the scans table, e.g. to backfill it
+    after a bulk load that bypassed create_scan/create_scans.
+    Args:
+        db (Session): The SQLAlchemy session.
+    Returns:
+        int: The number of activities with at least one scan.
+    """
+    @staticmethod
+    def rebuild_scan_counts(db: Session):
+        db.execute(delete(ActivityScanCount), execution_options={"synchronize_session": False})
+        counts = (
+            select(Activity.id, Activity.activity_category, func.count(Scan.id))
+            .join(Scan, Scan.activity_id == Activity.id)
+            .group_by(Activity.id, Activity.activity_category)
+        )
+        result = db.execute(insert(ActivityScanCount).from_select(
+            ["activity_id", "activity_category", "scan_count"], counts
+        ))
+        return result.rowcount
+
     """
     Retrieves the number of scans per activity, optionally filtered by frequency or category.
     Args:
@@ -55,52 +302,67 @@ class ScanRepository:
     """
     @staticmethod
     def get_scan_counts(db: Session, min_frequency=None, max_frequency=None, activity_category=None):
-        query = db.query(
+        # Reads the per-activity summary table, so the cost follows the number of activities
+        stmt = select(
             Activity.activity_name,
-            Activity.activity_category,
-            func.count(Scan.id).label("scan_count")
-        ).join(Scan, Scan.activity_id == Activity.id).group_by(Activity.id, Activity.activity_name, Activity.activity_category)
+            ActivityScanCount.activity_category,
+            ActivityScanCount.scan_count
+        ).join(Activity, Activity.id == ActivityScanCount.activity_id).where(ActivityScanCount.scan_count > 0)
 
         # Apply filters
         if min_frequency is not None:
-            query = query.having(func.count(Scan.id) >= min_frequency)
+            stmt = stmt.where(ActivityScanCount.scan_count >= min_frequency)
         if max_frequency is not None:
-            query = query.having(func.count(Scan.id) <= max_frequency)
+            stmt = stmt.where(ActivityScanCount.scan_count <= max_frequency)
         if activity_category:
-            query = query.filter(Activity.activity_category == activity_category)
+            stmt = stmt.where(ActivityScanCount.activity_category == activity_category)
 
-        return query.all()
+        return db.connection().execute(stmt).all()
     
     """
-    Retrieves the number of scans for an activity, grouped by the hour, within a given time range.
+    Resolves an activity by name without creating it.
     Args:
         db (Session): The SQLAlchemy session.
         activity_name (str): The name of the activity.
-        start_time (str): The start time in 'HH:MM' format.
-        end_time (str): The end time in 'HH:MM' format.
     Returns:
-        list: A list of tuples with the time period and scan count.
+        ActivityRef: The activity, or None if it doesn't exist.
+    """
+    @staticmethod
+    def get_activity(db: Session, activity_name: str):
+        if not activity_cache.loaded:
+            ScanRepository.load_activities(db)
+        activity = activity_cache.get(activity_name)
+        if activity is None:
+            activity = ScanRepository._find_activity(db, activity_name)
+            if activity:
+                activity_cache.add(activity)
+        return activity
+
+    """
+    Counts an activity's scans in fixed-width time buckets over [start, end).
+    The WHERE clause is a plain range on scanned_at for one activity_id, so an index on
+    (activity_id, scanned_at) serves it. Bucket k covers [start + k * width, start + (k + 1) * width).
+    Only non-empty buckets are returned.
+    Args:
+        db (Session): The SQLAlchemy session.
+        activity_id (int): The ID of the activity.
+        start (datetime): The inclusive start of the range.
+        end (datetime): The exclusive end of the range.
+        bucket_seconds (int): The bucket width in seconds.
+    Returns:
+        list: A list of tuples with the bucket index and scan count.
     """
     @staticmethod
-    def get_scan_count_by_time_period(db, activity_name, start_time, end_time):
-        # SQL query to group by hour and count the number of scans
-        stmt = text("""
-            SELECT DATEPART(hour, scans.scanned_at) AS time_period, COUNT(scans.id) AS scan_count
-            FROM scans 
-            JOIN activities ON scans.activity_id = activities.id 
-            WHERE activities.activity_name = :activity_name
-            AND CAST(scans.scanned_at AS TIME) BETWEEN :start_time AND :end_time
-            GROUP BY DATEPART(hour, scans.scanned_at)
-            ORDER BY DATEPART(hour, scans.scanned_at)
-        """)
-
-        params = {
-            "activity_name": activity_name,
-            "start_time": start_time,
-            "end_time": end_time
-        }
-
-        # Execute the query and fetch the results
-        result = db.execute(stmt, params).fetchall()
-
-        return result
+    def get_scan_count_by_time_period(db: Session, activity_id: int, start, end, bucket_seconds: int):
+        # Bucket in a subquery: SQL Server rejects GROUP BY on expressions with bound parameters
+        buckets = (
+            select((seconds_since(Scan.scanned_at, literal(start, DateTime)) // bucket_seconds).label("bucket"))
+            .where(Scan.activity_id == activity_id, Scan.scanned_at >= start, Scan.scanned_at < end)
+            .subquery()
+        )
+        stmt = (
+            select(buckets.c.bucket, func.count().label("scan_count"))
+            .group_by(buckets.c.bucket)
+            .order_by(buckets.c.bucket)
+        )
+        return db.connection().execute(stmt).all()
@@ -0,0 +1,37 @@
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Integer
+
+
+class seconds_since(FunctionElement):
+    """
+    Whole seconds elapsed from `start` to `timestamp`, i.e. seconds_since(timestamp, start).
+    SQL has no portable way to subtract timestamps, so each backend gets its own rendering.
+    """
+    type = Integer()
+    name = "seconds_since"
+    inherit_cache = True
+
+
+@compiles(seconds_since)
+def _seconds_since_sqlite(element, compiler, **kw):
+    timestamp, start = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"(CAST(strftime('%s', {timestamp}) AS INTEGER) - CAST(strftime('%s', {start}) AS INTEGER))"
+
+
+@compiles(seconds_since, "postgresql")
+def _seconds_since_postgresql(element, compiler, **kw):
+    timestamp, start = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"CAST(FLOOR(EXTRACT(EPOCH FROM ({timestamp} - {start}))) AS INTEGER)"
+
+
+@compiles(seconds_since, "mssql")
+def _seconds_since_mssql(element, compiler, **kw):
+    timestamp, start = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"DATEDIFF(second, {start}, {timestamp})"
+
+
+@compiles(seconds_since, "mysql")
+def _seconds_since_mysql(element, compiler, **kw):
+    timestamp, start = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"TIMESTAMPDIFF(SECOND, {start}, {timestamp})"
@@ -1,20 +1,100 @@
 import string
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from app.models.models import User
+from app.models.models import User, Scan, Activity
+from app.cache.badge_cache import badge_cache, UserRef
+from app.cache.response_cache import response_cache, user_tag
+from app.utils.batching import chunked
+from app.database import after_commit
 
 class UserRepository:
     """
-    Retrieves all users from the database.
-        
+    Reads what a user's response depends on in one statement: the user's own columns
+    plus the number and highest ID of their scans, from correlated subqueries on the
+    scans.user_id index. Scans are only ever inserted, so a new scan always changes the
+    count and ID even when updated_at doesn't move (SQLite's clock has 1 s resolution).
     Args:
         db (Session): The SQLAlchemy session.
-        
+        condition: The filter selecting the user, e.g. User.id == 5.
+    Returns:
+        Row: id, updated_at, name, email, phone, badge_code, scan_count and last_scan_id,
+        or None if the user doesn't exist.
+    """
+    @staticmethod
+    def _get_user_version(db: Session, condition):
+        return db.connection().execute(
+            select(
+                User.id, User.updated_at, User.name, User.email, User.phone, User.badge_code,
+                select(func.count(Scan.id)).where(Scan.user_id == User.id).scalar_subquery().label("scan_count"),
+                select(func.max(Scan.id)).where(Scan.user_id == User.id).scalar_subquery().label("last_scan_id")
+            ).where(condition)
+        ).first()
+
+    @staticmethod
+    def get_user_version_by_id(db: Session, user_id: int):
+        return UserRepository._get_user_version(db, User.id == user_id)
+
+    @staticmethod
+    def get_user_version_by_badge_code(db: Session, badge_code: str):
+        return UserRepository._get_user_version(db, User.badge_code == badge_code)
+
+    """
+    Retrieves one page of users, ordered by ID, selecting only the given columns.
+    Uses a keyset predicate on the primary key instead of OFFSET, so every page costs
+    the same regardless of how deep into the list it is. Like the other read queries
+    here, it runs on the session's connection rather than through the ORM, so rows
+    come back as plain tuples with no User objects or identity map bookkeeping.
+    Args:
+        db (Session): The SQLAlchemy session.
+        fields (tuple): The User column names to select; the ID is always included.
+        limit (int): The maximum number of users to return.
+        after_id (int, optional): Only return users with an ID greater than this one.
+    Returns:
+        list: Up to `limit + 1` rows with `id` plus the requested columns.
+    """
+    @staticmethod
+    def get_user_columns_page(db: Session, fields: tuple, limit: int, after_id: int = None):
+        stmt = select(User.id, *[getattr(User, field) for field in fields if field != "id"])
+        if after_id is not None:
+            stmt = stmt.where(User.id > after_id)
+        return db.connection().execute(stmt.order_by(User.id).limit(limit + 1)).all()
+
+    """
+    Retrieves the scans of the given users with their activity names, without loading
+    ORM objects. With `limit`, only each user's most recent scans are kept, using
+    ROW_NUMBER() over the user's scans so the cut happens in SQL.
+    Args:
+        db (Session): The SQLAlchemy session.
+        user_ids (list): The IDs of the users whose scans are needed.
+        limit (int, optional): The maximum number of scans per user.
+        since (datetime, optional): Only scans at or after this time.
     Returns:
-        list: A list of all User objects.
+        list: Rows of (user_id, activity_name, activity_category, scanned_at), ordered
+        by user and then scan time.
     """
     @staticmethod
-    def get_all_users(db: Session):
-        return db.query(User).all()
+    def get_scan_rows(db: Session, user_ids: list, limit: int = None, since=None):
+        rows = []
+        for chunk in chunked(user_ids):
+            stmt = (
+                select(Scan.user_id, Activity.activity_name, Activity.activity_category, Scan.scanned_at, Scan.id)
+                .join(Activity, Activity.id == Scan.activity_id)
+                .where(Scan.user_id.in_(chunk))
+            )
+            if since is not None:
+                stmt = stmt.where(Scan.scanned_at >= since)
+            if limit is not None:
+                ranked = stmt.add_columns(func.row_number().over(
+                    partition_by=Scan.user_id, order_by=(Scan.scanned_at.desc(), Scan.id.desc())
+                ).label("position")).subquery()
+                stmt = select(
+                    ranked.c.user_id, ranked.c.activity_name, ranked.c.activity_category, ranked.c.scanned_at, ranked.c.id
+                ).where(ranked.c.position <= limit)
+                order = (ranked.c.user_id, ranked.c.scanned_at, ranked.c.id)
+            else:
+                order = (Scan.user_id, Scan.scanned_at, Scan.id)
+            rows.extend(db.connection().execute(stmt.order_by(*order)).all())
+        return rows
 
     """
     Retrieves a user by their ID.
@@ -44,6 +124,111 @@ class UserRepository:
     def get_user_by_badge_code(db: Session, badge_code: string):
         return db.query(User).filter(User.badge_code == badge_code).first()
 
+    """
+    Resolves a badge code to the handful of user columns the scan services need.
+    Served from the in-process badge cache when possible; on a miss only those
+    columns are selected, and the result is cached unless it was read from a replica,
+    which could still hold a badge that has since been reassigned.
+        
+    Args:
+        db (Session): The SQLAlchemy session.
+        badge_code (string): The badge code of the user.
+        
+    Returns:
+        UserRef: The user's id, name, email, phone and badge code, or None if not found.
+    """
+    @staticmethod
+    def get_user_ref_by_badge_code(db: Session, badge_code: string):
+        user_ref = badge_cache.get(badge_code)
+        if user_ref is not None:
+            return user_ref
+
+        row = db.connection().execute(
+            select(User.id, User.name, User.email, User.phone, User.badge_code)
+            .where(User.badge_code == badge_code)
+        ).first()
+        if row is None:
+            return None
+        user_ref = UserRef(*row)
+        if not db.info.get("replica"):
+            badge_cache.set(badge_code, user_ref)
+        return user_ref
+
+    """
+    Looks up the short form of many users by ID, e.g. to name the users returned by
+    the networking graph. One IN query per chunk of IDs.
+    Args:
+        db (Session): The SQLAlchemy session.
+        user_ids (iterable): The IDs of the users.
+    Returns:
+        dict: user_id -> row of (id, name, badge_code) for every ID that exists.
+    """
+    @staticmethod
+    def get_user_refs_by_ids(db: Session, user_ids):
+        users = {}
+        for chunk in chunked(user_ids):
+            rows = db.connection().execute(
+                select(User.id, User.name, User.badge_code).where(User.id.in_(chunk))
+            ).all()
+            users.update((row.id, row) for row in rows)
+        return users
+
+    """
+    Fills the badge cache with the most recently active users, e.g. before a worker
+    starts serving. Scans bump users.updated_at, so these are the users most likely
+    to scan next.
+    Args:
+        db (Session): The SQLAlchemy session.
+        limit (int): The maximum number of users to load.
+    Returns:
+        int: The number of users cached.
+    """
+    @staticmethod
+    def prime_badge_cache(db: Session, limit: int):
+        rows = db.connection().execute(
+            select(User.id, User.name, User.email, User.phone, User.badge_code)
+            .order_by(User.updated_at.desc())
+            .limit(limit)
+        ).all()
+        for row in rows:
+            badge_cache.set(row.badge_code, UserRef(*row))
+        return len(rows)
+
+    """
+    Resolves many badge codes at once. Cached badges are served from the badge cache and
+    the rest are fetched with one IN query per chunk of badge codes, then cached unless
+    they were read from a replica.
+        
+    Args:
+        db (Session): The SQLAlchemy session.
+        badge_codes (iterable): The badge codes to resolve.
+        
+    Returns:
+        dict: badge_code -> UserRef for every badge code that belongs to a user.
+    """
+    @staticmethod
+    def get_user_refs_by_badge_codes(db: Session, badge_codes):
+        user_refs = {}
+        missing = []
+        for badge_code in set(badge_codes):
+            user_ref = badge_cache.get(badge_code)
+            if user_ref is not None:
+                user_refs[badge_code] = user_ref
+            else:
+                missing.append(badge_code)
+
+        for chunk in chunked(missing):
+            rows = db.connection().execute(
+                select(User.id, User.name, User.email, User.phone, User.badge_code)
+                .where(User.badge_code.in_(chunk))
+            ).all()
+            for row in rows:
+                user_ref = UserRef(*row)
+                user_refs[user_ref.badge_code] = user_ref
+                if not db.info.get("replica"):
+                    badge_cache.set(user_ref.badge_code, user_ref)
+        return user_refs
+
     """
     Updates a user's details.
         
@@ -57,11 +242,16 @@ class UserRepository:
     """
     @staticmethod
     def update_user(db: Session, user_id: int, update_data: dict):
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, user_id)
         if not user:
             return None
+        old_badge_code = user.badge_code
         for key, value in update_data.items():
             setattr(user, key, value)
-        db.commit()
+        user.updated_at = func.now()
+        new_badge_code = user.badge_code
+        db.flush()
+        after_commit(db, lambda: badge_cache.invalidate(old_badge_code, new_badge_code))
+        after_commit(db, lambda: response_cache.invalidate(user_tag(user_id)))
         db.refresh(user)
         return user
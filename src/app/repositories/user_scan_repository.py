@@ -1,5 +1,9 @@
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
 from app.models.models import UserScan, User
+from app.database import after_commit
+from app.cache.response_cache import response_cache, user_tag
+from app.cache.network_graph import network_graph, REFRESH_OVERLAP
 
 class UserScanRepository:
 
@@ -16,40 +20,104 @@ class UserScanRepository:
     def create_user_scan(db: Session, scanner_id: int, scanned_id: int):
         user_scan = UserScan(scanner_id=scanner_id, scanned_id=scanned_id)
         db.add(user_scan)
-        db.commit()
+        after_commit(db, lambda: response_cache.invalidate(user_tag(scanner_id), user_tag(scanned_id)))
+        db.flush()
         db.refresh(user_scan)
+        after_commit(db, lambda: network_graph.add([(user_scan.id, scanner_id, scanned_id)]))
         return user_scan
 
     """
-    Retrieves a list of users that a given user has scanned.
+    Reads the user scans that make up the networking graph, in ID order. Only the
+    three integer columns are selected, and rows are streamed in batches, so loading
+    a large table doesn't hold every row in memory at once.
+    Args:
+        db (Session): The SQLAlchemy session.
+        after_id (int, optional): Only return user scans with an ID greater than this one.
+    Returns:
+        Result: Rows of (id, scanner_id, scanned_id).
+    """
+    @staticmethod
+    def get_user_scan_edges(db: Session, after_id: int = None):
+        stmt = select(UserScan.id, UserScan.scanner_id, UserScan.scanned_id)
+        if after_id is not None:
+            stmt = stmt.where(UserScan.id > after_id)
+        return db.connection().execution_options(yield_per=10000).execute(stmt.order_by(UserScan.id))
+
+    """
+    Returns the in-process networking graph, loading it from the userscans table on
+    first use. At most once per NETWORK_GRAPH_REFRESH_SECONDS it also adds the user
+    scans recorded since the watermark, e.g. by other worker processes.
+    Args:
+        db (Session): The SQLAlchemy session.
+    Returns:
+        NetworkGraph: The loaded graph.
+    """
+    @staticmethod
+    def get_network_graph(db: Session):
+        network_graph.ensure_loaded(lambda: UserScanRepository.get_user_scan_edges(db))
+        if network_graph.claim_refresh():
+            network_graph.add(UserScanRepository.get_user_scan_edges(
+                db, max(network_graph.watermark - REFRESH_OVERLAP, 0)
+            ))
+        return network_graph
+
+    """
+    Runs a keyset-paginated select over user scans, ordered by (scanned_at, id).
+    The tuple comparison is spelled out with OR/AND because SQL Server has no
+    row-value comparison.
+    Args:
+        db (Session): The SQLAlchemy session.
+        user_column (Column): The UserScan column joined to the returned users.
+        owner_column (Column): The UserScan column filtered on the owner's ID.
+        owner_id (int): The ID of the user whose scans are listed.
+        limit (int): The maximum number of rows to return.
+        after (tuple, optional): The (scanned_at, id) of the last row on the previous page.
+    Returns:
+        list: Up to `limit + 1` rows of (id, name, badge_code, scanned_at, scan_id).
+    """
+    @staticmethod
+    def _page_of_users(db: Session, user_column, owner_column, owner_id: int, limit: int, after: tuple = None):
+        stmt = (
+            select(User.id, User.name, User.badge_code, UserScan.scanned_at, UserScan.id.label("scan_id"))
+            .join(UserScan, User.id == user_column)
+            .where(owner_column == owner_id)
+        )
+        if after is not None:
+            after_scanned_at, after_id = after
+            stmt = stmt.where(or_(
+                UserScan.scanned_at > after_scanned_at,
+                and_(UserScan.scanned_at == after_scanned_at, UserScan.id > after_id)
+            ))
+        return db.connection().execute(stmt.order_by(UserScan.scanned_at, UserScan.id).limit(limit + 1)).all()
+
+    """
+    Retrieves one page of users that a given user has scanned, in scan order.
     Args:
         db (Session): The SQLAlchemy session.
         scanner_id (int): The ID of the user who performed scans.
+        limit (int): The maximum number of users to return.
+        after (tuple, optional): The (scanned_at, id) of the last user scan on the previous page.
     Returns:
-        list: A list of User objects that were scanned by the given user.
+        list: Up to `limit + 1` rows of (id, name, badge_code, scanned_at, scan_id).
     """
     @staticmethod
-    def get_users_scanned_by(db: Session, scanner_id: int):
-        return (
-            db.query(User)
-            .join(UserScan, User.id == UserScan.scanned_id)
-            .filter(UserScan.scanner_id == scanner_id)
-            .all()
+    def get_users_scanned_by(db: Session, scanner_id: int, limit: int, after: tuple = None):
+        return UserScanRepository._page_of_users(
+            db, UserScan.scanned_id, UserScan.scanner_id, scanner_id, limit, after
         )
 
     """
-    Retrieves a list of users who have scanned a given user.
+    Retrieves one page of users who have scanned a given user, in scan order.
     Args:
         db (Session): The SQLAlchemy session.
         scanned_id (int): The ID of the user who was scanned.
+        limit (int): The maximum number of users to return.
+        after (tuple, optional): The (scanned_at, id) of the last user scan on the previous page.
     Returns:
-        list: A list of User objects that have scanned the given user.
+        list: Up to `limit + 1` rows of (id, name, badge_code, scanned_at, scan_id).
     """
     @staticmethod
-    def get_users_who_scanned(db: Session, scanned_id: int):
-        return (
-            db.query(User)
-            .join(UserScan, User.id == UserScan.scanner_id)
-            .filter(UserScan.scanned_id == scanned_id)
-            .all()
+    def get_users_who_scanned(db: Session, scanned_id: int, limit: int, after: tuple = None):
+        return UserScanRepository._page_of_users(
+            db, UserScan.scanner_id, UserScan.scanned_id, scanned_id, limit, after
         )
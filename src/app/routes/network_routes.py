@@ -0,0 +1,77 @@
+from flask import Blueprint, current_app, request, jsonify
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.diagnostics.query_budget import query_budget
+from app.services.network_service import NetworkService
+from app.utils.pagination import parse_limit
+
+network_bp = Blueprint("network", __name__)
+
+"""
+Runs one of the networking graph queries and shapes its response.
+Args:
+    query (callable): Takes the read-only session and the page size.
+Returns:
+    Response: 200 with the result, 400 for a bad limit, or the service's error.
+"""
+def _network_response(query):
+    db: Session = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = query(db, limit)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
+    return jsonify(result)
+
+"""
+Retrieves the users connected to both given users. Two users are connected once
+either has scanned the other's badge.
+Args:
+    badge_code (str): The badge code of the first user.
+    other_badge_code (str): The badge code of the second user.
+    limit (int, query, optional): Maximum number of users to list.
+Returns:
+    jsonify: The mutual connections.
+    - 200 OK with `count` (all mutual connections), `users` (ordered by ID) and `limit`.
+    - 400 Bad Request if the limit is invalid.
+    - 404 Not Found if either user is not found.
+"""
+@network_bp.route("/network/mutual/<badge_code>/<other_badge_code>", methods=["GET"])
+@query_budget(4)
+def get_mutual_connections(badge_code, other_badge_code):
+    return _network_response(
+        lambda db, limit: NetworkService.get_mutual_connections(db, badge_code, other_badge_code, limit)
+    )
+
+"""
+Retrieves the users with the most connections.
+Args:
+    limit (int, query, optional): Number of users to return.
+Returns:
+    jsonify: The most connected users with their `connections`, most connected first.
+    - 200 OK with `users` and `limit`.
+    - 400 Bad Request if the limit is invalid.
+"""
+@network_bp.route("/network/top-connectors", methods=["GET"])
+@query_budget(2)
+def get_top_connectors():
+    return _network_response(NetworkService.get_top_connectors)
+
+"""
+Suggests people a user should meet: friends of friends they aren't connected to yet.
+Args:
+    badge_code (str): The badge code of the user.
+    limit (int, query, optional): Number of users to return.
+Returns:
+    jsonify: The suggested users with their `mutual_connections`, most shared first.
+    - 200 OK with `users` and `limit`.
+    - 400 Bad Request if the limit is invalid.
+    - 404 Not Found if the user is not found.
+"""
+@network_bp.route("/network/suggestions/<badge_code>", methods=["GET"])
+@query_budget(3)
+def get_suggestions(badge_code):
+    return _network_response(lambda db, limit: NetworkService.get_suggestions(db, badge_code, limit))
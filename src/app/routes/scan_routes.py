@@ -1,10 +1,26 @@
-from flask import Blueprint, request, jsonify
+import threading
+from flask import Blueprint, Response, request, jsonify, current_app
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.diagnostics.query_budget import query_budget
+from app.cache.response_cache import response_cache, SCAN_COUNTS_TAG, activity_tag, category_tag
+from app.cache.scan_feed import scan_feed, FeedFull
 from app.services.scan_service import ScanService
+from app.ingest.scan_buffer import BufferFull
+from app.utils.sse import SSE_HEADERS
 
 scan_bp = Blueprint("scan", __name__)
 
+
+def _aggregate_tags(results):
+    # A category filter narrows the response to scans of that category
+    activity_category = request.args.get("activity_category")
+    return [category_tag(activity_category) if activity_category else SCAN_COUNTS_TAG]
+
+
+def _time_period_tags(results):
+    return [activity_tag(request.args["activity_name"])]
+
 """
 Adds a scan for a user by badge code.
 Args:
@@ -12,9 +28,13 @@ Args:
 Returns:
     jsonify: The response with scan details or error message.
     - 200 OK with scan details if the scan was successfully created.
+    - 202 Accepted with scan details if buffered ingestion acknowledges on enqueue.
     - 400 Bad Request if activity fields are missing from the request body.
+    - 404 Not Found if the user is not found.
+    - 503 Service Unavailable if the scan buffer is full (retry after the Retry-After delay).
 """
 @scan_bp.route("/scan/<string:badge_code>", methods=["PUT"])
+@query_budget(6)
 def add_scan(badge_code):
     db: Session = get_db()
     data = request.json
@@ -23,9 +43,45 @@ def add_scan(badge_code):
     if "activity_name" not in data or "activity_category" not in data:
         return jsonify({"error": "Missing activity fields"}), 400
 
-    # Call service to add scan
-    response = ScanService.add_scan(db, badge_code, data["activity_name"], data["activity_category"])
-    
+    # Call service to add scan, through the write-behind buffer when it is enabled
+    scan_buffer = current_app.extensions.get("scan_buffer")
+    if scan_buffer is not None:
+        try:
+            response = ScanService.enqueue_scan(db, scan_buffer, badge_code, data["activity_name"], data["activity_category"])
+        except BufferFull as e:
+            return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    else:
+        response = ScanService.add_scan(db, badge_code, data["activity_name"], data["activity_category"])
+
+    if isinstance(response, tuple):
+        return jsonify(response[0]), response[1]
+    return jsonify(response)
+
+"""
+Adds many scans in one request, e.g. when a badge reader replays scans it buffered offline.
+Request Body:
+    A JSON array of objects with badge_code, activity_name, activity_category and an
+    optional ISO 8601 scanned_at (defaults to the database's current time; values with
+    an offset are converted to the database clock's zone, DB_TIMEZONE).
+Returns:
+    jsonify: The number of scans created and failed, with one result per item in request order.
+    - 200 OK with per-item results (items with unknown badges or missing fields are reported as errors).
+    - 400 Bad Request if the body is not a JSON array.
+    - 413 Payload Too Large if the batch exceeds SCAN_BATCH_MAX_SIZE items.
+"""
+@scan_bp.route("/scans/batch", methods=["POST"])
+def add_scans_batch():
+    db: Session = get_db()
+    items = request.get_json(silent=True)
+
+    # Validate request body
+    if not isinstance(items, list):
+        return jsonify({"error": "Request body must be a JSON array of scans"}), 400
+    if len(items) > current_app.config["SCAN_BATCH_MAX_SIZE"]:
+        return jsonify({"error": f"Batch exceeds {current_app.config['SCAN_BATCH_MAX_SIZE']} scans"}), 413
+
+    response = ScanService.add_scans_batch(db, items)
+
     return jsonify(response)
 
 """
@@ -40,8 +96,10 @@ Returns:
     - 200 OK with aggregated scan counts for each activity.
 """
 @scan_bp.route("/scans", methods=["GET"])
+@response_cache.cached(("min_frequency", "max_frequency", "activity_category"), _aggregate_tags)
+@query_budget(1)
 def get_scan_aggregates():
-    db: Session = get_db()
+    db: Session = get_db(read_only=True)
 
     # Parse query parameters
     min_frequency = request.args.get("min_frequency", type=int)
@@ -54,34 +112,72 @@ def get_scan_aggregates():
     return jsonify(results)
 
 """
-Retrieves the scan count for a specific activity, grouped by time period.
+Streams live per-activity scan counts to dashboards as Server-Sent Events, instead
+of polling GET /scans. See ScanService.stream_scan_counts for the events sent.
+Each stream holds one of the worker's threads for as long as it is open, so a
+worker serves at most WEB_THREADS - 1 streams and always keeps a thread for other
+requests; large dashboard fleets belong on the async app.
+Returns:
+    Response: A text/event-stream response that stays open until the client leaves.
+    - 200 OK with the event stream.
+    - 503 Service Unavailable if this process already serves its maximum number of streams.
+"""
+@scan_bp.route("/scans/stream", methods=["GET"])
+def stream_scan_counts():
+    # Reconcile on the primary; a replica's counts may lag the scans published here
+    db: Session = get_db()
+
+    # Streams stay open for hours; don't hold a pooled connection in between
+    ScanService.load_scan_feed(db)
+    db.close()
+
+    wake = threading.Event()
+    try:
+        subscriber, snapshot = scan_feed.subscribe(wake.set)
+    except FeedFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    events = ScanService.stream_scan_counts(db, current_app.json.dumps, subscriber, snapshot, wake)
+    response = Response(events, mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Frees the slot even if the server closes the response before streaming it
+    response.call_on_close(lambda: scan_feed.unsubscribe(subscriber))
+    return response
+
+"""
+Retrieves the scan count for a specific activity in fixed-width time buckets.
 Args:
-    None (query parameters required):
+    None (query parameters):
     - activity_name (str): The name of the activity.
-    - start_time (str): The start time in HH:MM format.
-    - end_time (str): The end time in HH:MM format.
+    - start (str): The inclusive start of the range, as an ISO 8601 date or datetime.
+    - end (str): The exclusive end of the range, as an ISO 8601 date or datetime.
+    - bucket (str, optional): The bucket width: 5m, 15m, 1h (default) or 1d.
 Returns:
-    jsonify: A list of scan counts grouped by hour for the specified activity.
+    jsonify: Every bucket in the range with its start time and scan count (0 when empty).
     - 200 OK with the time distribution if successful.
-    - 400 Bad Request if any required parameter is missing or time format is invalid.
+    - 400 Bad Request if any required parameter is missing, or the range or bucket is invalid.
 """
 @scan_bp.route("/scan_count_by_time_period", methods=["GET"])
+@response_cache.cached(("activity_name", "start", "end", "bucket"), _time_period_tags)
+@query_budget(3)
 def get_scan_count_by_time_period():
-    db: Session = get_db()  
+    db: Session = get_db(read_only=True)
 
     # Get parameters from the request
     activity_name = request.args.get("activity_name")
-    start_time_str = request.args.get("start_time")
-    end_time_str = request.args.get("end_time")
+    start_str = request.args.get("start")
+    end_str = request.args.get("end")
+    bucket = request.args.get("bucket", "1h")
 
     # Validate the required parameters
-    if not activity_name or not start_time_str or not end_time_str:
+    if not activity_name or not start_str or not end_str:
         return jsonify({"error": "Missing required parameters"}), 400
 
-    # Call the service to get the scan counts grouped by hour
+    # Call the service to get the scan counts per bucket
     try:
-        time_distribution = ScanService.get_scan_count_by_time_period(db, activity_name, start_time_str, end_time_str)
+        time_distribution = ScanService.get_scan_count_by_time_period(
+            db, activity_name, start_str, end_str, bucket, current_app.config["TIME_BUCKET_MAX_COUNT"]
+        )
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
-    return jsonify({"time_distribution": time_distribution})
\ No newline at end of file
+    return jsonify({"time_distribution": time_distribution})
@@ -1,93 +1,112 @@
-from flask import Blueprint, jsonify, request
-from sqlalchemy import func
+from flask import Blueprint, current_app, jsonify, request
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.diagnostics.query_budget import query_budget
 from app.services.user_service import UserService
+from app.serializers.serializer import serialize_user
+from app.utils.pagination import parse_limit
+from app.utils.http_cache import user_validators, is_not_modified, with_validators, not_modified
+from app.utils.projection import parse_user_projection, projection_variant
 
 user_bp = Blueprint("user", __name__)
 
 """
-Retrieves all users and their scan details.
+Retrieves one page of users and their scan details, ordered by ID.
+Args:
+    None (query parameters are optional):
+    - limit (int): Maximum number of users per page.
+    - cursor (str): The `next_cursor` from the previous page.
+    - fields (str): Comma-separated user columns to return, e.g. name,badge_code.
+    - include (str): "scans" to embed scans when `fields` is given.
+    - scans_limit (int): Only embed each user's N most recent scans.
+    - scans_since (str): Only embed scans at or after this ISO 8601 date or datetime.
 Returns:
-    jsonify: A list of users with their scan activity details.
-    - 200 OK with user information and scan activities.
+    jsonify: A page of users with their scan activity details (every column and
+    every scan unless the parameters above narrow it).
+    - 200 OK with `users`, `limit` and `next_cursor` (null on the last page).
+    - 400 Bad Request if the limit, cursor or a projection parameter is invalid.
 """
 @user_bp.route("/users", methods=["GET"])
+@query_budget(2)
 def get_all_users():
-    db: Session = get_db()
-    users = UserService.get_all_users(db)
-    return jsonify([{
-        "id": user.id, 
-        "name": user.name, 
-        "email": user.email, 
-        "phone": user.phone, 
-        "badge_code": user.badge_code,
-        "updated_at": user.updated_at,
-        "scans": [{
-            "activity_name": scan.activity.activity_name,
-            "activity_category": scan.activity.activity_category,
-            "scanned_at": scan.scanned_at.isoformat()
-        } for scan in user.scans]
-    } for user in users])
+    db: Session = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+        projection = parse_user_projection(request.args)
+        users, next_cursor = UserService.get_user_page(db, projection, limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "users": users,
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
 
 """
 Retrieves a specific user by their ID and their scan details.
 Args:
     user_id (int): The ID of the user to retrieve.
+    fields, include, scans_limit, scans_since (query, optional): As for GET /users.
 Returns:
-    jsonify: The user information with scan activities.
+    jsonify: The user information with scan activities, with ETag and Last-Modified headers.
     - 200 OK with user details and scan activities.
+    - 304 Not Modified if If-None-Match or If-Modified-Since shows the client's copy is current.
+    - 400 Bad Request if a projection parameter is invalid.
     - 404 Not Found if the user is not found.
 """
 @user_bp.route("/users/<int:user_id>", methods=["GET"])
+@query_budget(2)
 def get_user(user_id):
-    db: Session = get_db()
-    user = UserService.get_user_by_id(db, user_id)
-    if not user:
-        return jsonify({"error": "User not found"}), 404
-    return jsonify({
-        "id": user.id, 
-        "name": user.name, 
-        "email": user.email, 
-        "phone": user.phone, 
-        "badge_code": user.badge_code,
-        "updated_at": user.updated_at,
-        "scans": [{
-            "activity_name": scan.activity.activity_name,
-            "activity_category": scan.activity.activity_category,
-            "scanned_at": scan.scanned_at.isoformat()
-        } for scan in user.scans]
-    })
+    db: Session = get_db(read_only=True)
+    return _conditional_user_response(db, user_id=user_id)
 
 """
 Retrieves a specific user by their badge code and their scan details.
 Args:
     badge_code (str): The badge code of the user to retrieve.
+    fields, include, scans_limit, scans_since (query, optional): As for GET /users.
 
 Returns:
-    jsonify: The user information with scan activities.
+    jsonify: The user information with scan activities, with ETag and Last-Modified headers.
     - 200 OK with user details and scan activities.
+    - 304 Not Modified if If-None-Match or If-Modified-Since shows the client's copy is current.
+    - 400 Bad Request if a projection parameter is invalid.
     - 404 Not Found if the user is not found.
 """
 @user_bp.route("/users/badge/<string:badge_code>", methods=["GET"])
+@query_budget(2)
 def get_user_badge(badge_code):
-    db: Session = get_db()
-    user = UserService.get_user_by_badge_code(db, badge_code)
-    if not user:
+    db: Session = get_db(read_only=True)
+    return _conditional_user_response(db, badge_code=badge_code)
+
+"""
+Answers a user profile request, checking the client's cached copy first.
+The version check is a single indexed query; scans are only loaded and the body
+only serialized when the client's copy is missing or out of date. The response is
+built from the version row's columns, plus one scans query if scans are included.
+Args:
+    db (Session): The read-only session.
+    user_id (int, optional): The ID of the user.
+    badge_code (str, optional): The badge code of the user, if no ID is given.
+Returns:
+    Response: 200 with the profile, 304 Not Modified, or 404 Not Found.
+"""
+def _conditional_user_response(db, user_id=None, badge_code=None):
+    try:
+        projection = parse_user_projection(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    version = UserService.get_user_version(db, user_id=user_id, badge_code=badge_code)
+    if not version:
         return jsonify({"error": "User not found"}), 404
-    return jsonify({
-        "id": user.id, 
-        "name": user.name, 
-        "email": user.email, 
-        "phone": user.phone, 
-        "badge_code": user.badge_code,
-        "updated_at": user.updated_at,
-        "scans": [{
-            "activity_name": scan.activity.activity_name,
-            "activity_category": scan.activity.activity_category,
-            "scanned_at": scan.scanned_at.isoformat()
-        } for scan in user.scans]
-    })
+    etag, last_modified = user_validators(version, projection_variant(projection))
+    if is_not_modified(etag, last_modified):
+        return not_modified(etag, last_modified)
+
+    user = UserService.get_user_profile(db, projection, version)
+    return with_validators(jsonify(user), etag, last_modified)
 
 """
 Updates the information of an existing user.
@@ -100,6 +119,7 @@ Returns:
     - 400 Bad Request if no valid fields are provided for update.
 """
 @user_bp.route("/users/<int:user_id>", methods=["PUT"])
+@query_budget(4)
 def update_user(user_id):
     db: Session = get_db()
     update_data = request.json
@@ -119,22 +139,7 @@ def update_user(user_id):
     if not update_data:
         return jsonify({"error": "No valid fields provided for the update"}), 400
 
-    # Apply updates
-    for key, value in update_data.items():
-        setattr(user, key, value)
+    # Apply updates; this also bumps `updated_at` and evicts the cached badge lookup
+    user = UserService.update_user(db, user_id, update_data)
 
-    # Manually update `updated_at`
-    user.updated_at = func.now()
-
-    # Commit changes
-    db.commit()
-    db.refresh(user)
-
-    return jsonify({
-        "id": user.id, 
-        "name": user.name, 
-        "email": user.email, 
-        "phone": user.phone, 
-        "badge_code": user.badge_code,
-        "updated_at": user.updated_at
-})
+    return jsonify(serialize_user(user))
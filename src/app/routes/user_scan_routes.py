@@ -1,10 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.diagnostics.query_budget import query_budget
+from app.cache.response_cache import response_cache, user_tag
 from app.services.user_scan_service import UserScanService
+from app.utils.pagination import parse_limit
 
 user_scan_bp = Blueprint("user_scan", __name__)
 
+
+def _user_page_tags(page):
+    # The owner's new user scans change the page, as do edits to any user listed on it
+    return [user_tag(page["user_id"])] + [user_tag(user["id"]) for user in page["users"]]
+
 """
 Scans a user's badge and records the scan activity.
 Request Body:
@@ -13,9 +21,11 @@ Request Body:
 Returns:
     jsonify: The result of the scan operation.
     - 200 OK with scan details if successful.
-    - 400 Bad Request if scanner_badge or scanned_badge is missing.
+    - 400 Bad Request if scanner_badge or scanned_badge is missing, or a user scans themselves.
+    - 404 Not Found if either user is not found.
 """
 @user_scan_bp.route("/scan-badge", methods=["POST"])
+@query_budget(4)
 def scan_badge():
     db: Session = get_db()
     data = request.json
@@ -26,32 +36,60 @@ def scan_badge():
         return jsonify({"error": "Both scanner_badge and scanned_badge are required"}), 400
 
     result = UserScanService.scan_badge(db, scanner_badge, scanned_badge)
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
     return jsonify(result)
 
 """
-Retrieves a list of users scanned by the specified badge code.
+Retrieves one page of users scanned by the specified badge code, in scan order.
 Args:
     badge_code (str): The badge code of the user.
+    limit (int, query, optional): Maximum number of users per page.
+    cursor (str, query, optional): The `next_cursor` from the previous page.
 Returns:
-    jsonify: A list of scanned users.
-    - 200 OK with scanned user details.
+    jsonify: A page of scanned users.
+    - 200 OK with the owner's `user_id`, `users`, `limit` and `next_cursor` (null on the last page).
+    - 400 Bad Request if the limit or cursor is invalid.
+    - 404 Not Found if the user is not found.
 """
 @user_scan_bp.route("/scanned-users/<badge_code>", methods=["GET"])
+@response_cache.cached(("limit", "cursor"), _user_page_tags)
+@query_budget(2)
 def get_scanned_users(badge_code):
-    db: Session = get_db()
-    result = UserScanService.get_scanned_users(db, badge_code)
+    db: Session = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+        result = UserScanService.get_scanned_users(db, badge_code, limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
     return jsonify(result)
 
 """
-Retrieves a list of users who have scanned the specified badge code.
+Retrieves one page of users who have scanned the specified badge code, in scan order.
 Args:
     badge_code (str): The badge code of the user.
+    limit (int, query, optional): Maximum number of users per page.
+    cursor (str, query, optional): The `next_cursor` from the previous page.
 Returns:
-    jsonify: A list of users who performed scans.
-    - 200 OK with users who scanned the given badge.
+    jsonify: A page of users who performed scans.
+    - 200 OK with the owner's `user_id`, `users`, `limit` and `next_cursor` (null on the last page).
+    - 400 Bad Request if the limit or cursor is invalid.
+    - 404 Not Found if the user is not found.
 """
 @user_scan_bp.route("/users-who-scanned/<badge_code>", methods=["GET"])
+@response_cache.cached(("limit", "cursor"), _user_page_tags)
+@query_budget(2)
 def get_users_who_scanned(badge_code):
-    db: Session = get_db()
-    result = UserScanService.get_users_who_scanned(db, badge_code)
+    db: Session = get_db(read_only=True)
+    try:
+        limit = parse_limit(request.args.get("limit", type=int), current_app.config)
+        result = UserScanService.get_users_who_scanned(db, badge_code, limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if isinstance(result, tuple):
+        return jsonify(result[0]), result[1]
     return jsonify(result)
@@ -0,0 +1,75 @@
+from datetime import datetime
+from app.utils.projection import USER_FIELDS
+
+
+def format_datetime(value):
+    """
+    Encodes a timestamp the way every endpoint returns it: ISO 8601, e.g.
+    2025-02-21T18:04:12, as stored (naive, in the database clock's zone).
+    Args:
+        value (datetime): The timestamp, or None.
+    Returns:
+        str: The ISO 8601 string, or None.
+    """
+    return value.isoformat() if value is not None else None
+
+
+def serialize_scan(row):
+    """
+    Serializes a scan row from UserRepository.get_scan_rows into a JSON-ready dict.
+    Args:
+        row (Row): A row with activity_name, activity_category and scanned_at.
+    Returns:
+        dict: The activity name, category and scan timestamp.
+    """
+    return {
+        "activity_name": row.activity_name,
+        "activity_category": row.activity_category,
+        "scanned_at": format_datetime(row.scanned_at)
+    }
+
+
+def serialize_user(row, fields=USER_FIELDS, scan_rows=None):
+    """
+    Serializes the selected columns of a user into a JSON-ready dict. Works on Core
+    rows and on User objects alike, since both expose the columns as attributes.
+    Args:
+        row (Row or User): A row with at least the requested columns.
+        fields (tuple): The columns to return, in order (default: all of them).
+        scan_rows (list, optional): The user's scan rows, embedded as `scans` if given.
+    Returns:
+        dict: The requested user columns, optionally with their scan activities.
+    """
+    data = {}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = format_datetime(value) if isinstance(value, datetime) else value
+    if scan_rows is not None:
+        data["scans"] = [serialize_scan(scan) for scan in scan_rows]
+    return data
+
+
+def serialize_user_ref(row):
+    """
+    Serializes the short form of a user used by the networking endpoints.
+    Args:
+        row (Row or UserRef): A row with id, name and badge_code.
+    Returns:
+        dict: The user's ID, name and badge code.
+    """
+    return {"id": row.id, "name": row.name, "badge_code": row.badge_code}
+
+
+def serialize_scan_count(row):
+    """
+    Serializes a row from ScanRepository.get_scan_counts.
+    Args:
+        row (Row): A row with activity_name, activity_category and scan_count.
+    Returns:
+        dict: The activity name, category and number of scans.
+    """
+    return {
+        "activity_name": row.activity_name,
+        "activity_category": row.activity_category,
+        "scan_count": row.scan_count
+    }
@@ -0,0 +1,82 @@
+from sqlalchemy.orm import Session
+from app.repositories.user_repository import UserRepository
+from app.repositories.user_scan_repository import UserScanRepository
+from app.serializers.serializer import serialize_user_ref
+
+class NetworkService:
+    """
+    Names the users in a ranked list of (user_id, count) pairs from the networking graph.
+    Args:
+        db (Session): The SQLAlchemy session.
+        ranked (list): (user_id, count) pairs in response order.
+        count_field (str): The key the count is returned under.
+    Returns:
+        list: The users' IDs, names and badge codes, each with their count.
+    """
+    @staticmethod
+    def _ranked_users(db: Session, ranked, count_field):
+        users = UserRepository.get_user_refs_by_ids(db, [user_id for user_id, _ in ranked])
+        return [
+            {**serialize_user_ref(users[user_id]), count_field: count}
+            for user_id, count in ranked if user_id in users
+        ]
+
+    """
+    Retrieves the users connected to both given users, i.e. who scanned or were scanned
+    by each of them.
+    Args:
+        db (Session): The SQLAlchemy session.
+        badge_code (str): The badge code of the first user.
+        other_badge_code (str): The badge code of the second user.
+        limit (int): The maximum number of users to return.
+    Returns:
+        dict: The total number of mutual connections and up to `limit` of them, ordered
+        by ID, or an error message.
+    """
+    @staticmethod
+    def get_mutual_connections(db: Session, badge_code: str, other_badge_code: str, limit: int):
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
+        other = UserRepository.get_user_ref_by_badge_code(db, other_badge_code)
+        if not user or not other:
+            return {"error": "One or both users not found"}, 404
+
+        mutual = UserScanRepository.get_network_graph(db).mutual(user.id, other.id)
+        users = UserRepository.get_user_refs_by_ids(db, mutual[:limit])
+        return {
+            "count": len(mutual),
+            "users": [serialize_user_ref(users[user_id]) for user_id in mutual[:limit] if user_id in users],
+            "limit": limit
+        }
+
+    """
+    Retrieves the most connected users.
+    Args:
+        db (Session): The SQLAlchemy session.
+        limit (int): The number of users to return.
+    Returns:
+        dict: Up to `limit` users with their number of connections, most connected first.
+    """
+    @staticmethod
+    def get_top_connectors(db: Session, limit: int):
+        ranked = UserScanRepository.get_network_graph(db).top_connectors(limit)
+        return {"users": NetworkService._ranked_users(db, ranked, "connections"), "limit": limit}
+
+    """
+    Suggests people a user should meet: users connected to their connections but not
+    to them yet, ranked by the number of connections they share.
+    Args:
+        db (Session): The SQLAlchemy session.
+        badge_code (str): The badge code of the user.
+        limit (int): The number of users to return.
+    Returns:
+        dict: Up to `limit` suggested users with their number of mutual connections,
+        or an error message.
+    """
+    @staticmethod
+    def get_suggestions(db: Session, badge_code: str, limit: int):
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
+        if not user:
+            return {"error": "User not found"}, 404
+
+        ranked = UserScanRepository.get_network_graph(db).suggestions(user.id, limit)
+        return {"users": NetworkService._ranked_users(db, ranked, "mutual_connections"), "limit": limit}
@@ -1,7 +1,19 @@
-from datetime import datetime
+import math
+import time
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.repositories.scan_repository import ScanRepository
 from app.repositories.user_repository import UserRepository
+from app.cache.activity_cache import activity_cache
+from app.cache.recent_scans import recent_scans, scan_key
+from app.cache.scan_feed import scan_feed
+from app.ingest.scan_buffer import DURABILITY_ENQUEUE
+from app.database import unit_of_work, database_clock
+from app.serializers.serializer import format_datetime, serialize_scan_count
+from app.utils.sse import KEEP_ALIVE, format_event
+
+# Supported widths for /scan_count_by_time_period buckets, in seconds
+BUCKET_WIDTHS = {"5m": 5 * 60, "15m": 15 * 60, "1h": 60 * 60, "1d": 24 * 60 * 60}
 
 
 class ScanService:
@@ -19,31 +31,201 @@ class ScanService:
     """
     @staticmethod
     def add_scan(db: Session, badge_code: str, activity_name: str, activity_category: str):
-        # Fetch user by badge_code
-        user = UserRepository.get_user_by_badge_code(db, badge_code)
+        # Resolve badge_code (served from the badge cache when warm)
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
+        if not user:
+            return {"error": "User not found"}, 404
+
+        # A repeat within the activity's dedupe window returns the first scan
+        window = ScanService._dedupe_window(activity_name, activity_category)
+        with recent_scans.claim(scan_key(user.id, activity_name), window) as claim:
+            if claim.duplicate is not None:
+                return claim.duplicate
+
+            with unit_of_work(db):
+                # Get or create activity
+                activity = ScanRepository.get_or_create_activity(db, activity_name, activity_category)
+
+                # Create new scan
+                scan = ScanRepository.create_scan(db, user.id, activity)
+
+            # Return scan details
+            result = {
+                "user": {
+                    "name": user.name,
+                    "email": user.email,
+                    "phone": user.phone,
+                    "badge_code": user.badge_code
+                },
+                "activity": {
+                    "activity_name": activity.activity_name,
+                    "activity_category": activity.activity_category
+                },
+                "scanned_at": format_datetime(scan.scanned_at)
+            }
+            claim.complete(result)
+            return result
+
+    """
+    Returns the dedupe window for a scan of an activity. Existing activities keep
+    their stored category, so that one decides which category override applies.
+    Args:
+        activity_name (str): The name of the activity.
+        activity_category (str): The category sent with the scan.
+    Returns:
+        float: The window in seconds (0 if duplicates aren't suppressed).
+    """
+    @staticmethod
+    def _dedupe_window(activity_name: str, activity_category: str):
+        activity = activity_cache.get(activity_name)
+        if activity:
+            activity_category = activity.activity_category
+        return recent_scans.window_for(activity_name, activity_category)
+
+    """
+    Accepts a scan into the write-behind buffer instead of committing it in the request.
+    The badge is still resolved up front (usually from the badge cache) so unknown badges
+    are rejected immediately; the activity is resolved and the scan inserted by the
+    buffer's group commit. With "flush" durability this waits for that commit; with
+    "enqueue" durability it returns 202 as soon as the scan is queued.
+    Args:
+        db (Session): The SQLAlchemy session.
+        scan_buffer (ScanBuffer): The buffer the scan is queued on.
+        badge_code (str): The badge code of the user scanning.
+        activity_name (str): The name of the activity.
+        activity_category (str): The category of the activity.
+    Returns:
+        dict: The same scan details as add_scan, or an error message and status code.
+    Raises:
+        BufferFull: If the buffer can't take the scan (backpressure).
+    """
+    @staticmethod
+    def enqueue_scan(db: Session, scan_buffer, badge_code: str, activity_name: str, activity_category: str):
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
         if not user:
             return {"error": "User not found"}, 404
 
-        # Get or create activity
-        activity = ScanRepository.get_or_create_activity(db, activity_name, activity_category)
+        # Existing activities keep their stored category, as in add_scan
+        activity = activity_cache.get(activity_name)
+        if activity:
+            activity_category = activity.activity_category
+
+        # Hand the pooled connection back before queueing; the flusher needs one to commit
+        db.close()
+
+        window = recent_scans.window_for(activity_name, activity_category)
+        with recent_scans.claim(scan_key(user.id, activity_name), window) as claim:
+            if claim.duplicate is not None:
+                return claim.duplicate
+
+            # The flusher stamps the scan with the database's clock when its group commits
+            pending = scan_buffer.submit(user.id, activity_name, activity_category)
+            response = {
+                "user": {
+                    "name": user.name,
+                    "email": user.email,
+                    "phone": user.phone,
+                    "badge_code": user.badge_code
+                },
+                "activity": {
+                    "activity_name": activity_name,
+                    "activity_category": activity_category
+                },
+                "scanned_at": None
+            }
+
+            if scan_buffer.durability == DURABILITY_ENQUEUE:
+                claim.complete((response, 202))
+                return response, 202
+            if not pending.wait(scan_buffer.ack_timeout):
+                return {"error": "Timed out waiting for the scan to be saved"}, 503
+            if pending.error is not None:
+                return {"error": "Failed to save scan"}, 500
+            response["scanned_at"] = format_datetime(pending.scanned_at)
+            claim.complete(response)
+            return response
+
+    """
+    Parses an optional ISO 8601 scan timestamp. Timezone-aware values are converted to
+    the database clock's zone, which stamps the rest of the scans table.
+    Args:
+        value (str): The timestamp sent by the badge reader, or None.
+    Returns:
+        datetime: The naive scan timestamp, or None if none was sent.
+    Raises:
+        ValueError: If the timestamp is not valid ISO 8601.
+    """
+    @staticmethod
+    def _parse_scanned_at(value):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            raise ValueError("Invalid scanned_at")
+        return database_clock.to_database(datetime.fromisoformat(value))
+
+    """
+    Adds many scans at once, e.g. a badge reader replaying scans it buffered while offline.
+    Badges and activities are resolved with set-based queries, and every valid scan is
+    inserted in one bulk statement and one transaction. Items that fail validation or
+    reference an unknown badge are reported individually and don't block the others.
+    Args:
+        db (Session): The SQLAlchemy session.
+        items (list): Dicts with badge_code, activity_name, activity_category and an
+            optional ISO 8601 scanned_at (defaults to the database's current time).
+    Returns:
+        dict: The number of scans created and failed, and one result per item, in order.
+    """
+    @staticmethod
+    def add_scans_batch(db: Session, items: list):
+        results = [None] * len(items)
+        valid = []
+
+        # Validate every item before touching the database
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get("badge_code"):
+                results[index] = {"index": index, "status": "error", "error": "Missing badge_code"}
+                continue
+            if not item.get("activity_name") or not item.get("activity_category"):
+                results[index] = {"index": index, "status": "error", "error": "Missing activity fields"}
+                continue
+            try:
+                scanned_at = ScanService._parse_scanned_at(item.get("scanned_at"))
+            except ValueError:
+                results[index] = {"index": index, "status": "error", "error": "Invalid scanned_at"}
+                continue
+            valid.append((index, item, scanned_at))
+
+        # Resolve badges first so unknown users never create activities
+        users = UserRepository.get_user_refs_by_badge_codes(db, (item["badge_code"] for _, item, _ in valid))
+        found = []
+        for index, item, scanned_at in valid:
+            if item["badge_code"] in users:
+                found.append((index, item, scanned_at))
+            else:
+                results[index] = {"index": index, "status": "error", "error": "User not found"}
+
+        activity_categories = {}
+        for _, item, _ in found:
+            activity_categories.setdefault(item["activity_name"], item["activity_category"])
+        with unit_of_work(db):
+            activities = ScanRepository.get_or_create_activities(db, activity_categories)
+            # Scans sent without a timestamp get the database's time, like PUT /scan
+            now = None
+            if any(scanned_at is None for _, _, scanned_at in found):
+                now = ScanRepository.get_database_time(db)
 
-        # Create new scan
-        scan = ScanRepository.create_scan(db, user, activity)
+            scans = []
+            for index, item, scanned_at in found:
+                scanned_at = scanned_at or now
+                scans.append({
+                    "user_id": users[item["badge_code"]].id,
+                    "activity": activities[item["activity_name"]],
+                    "scanned_at": scanned_at
+                })
+                results[index] = {"index": index, "status": "created", "scanned_at": format_datetime(scanned_at)}
 
-        # Return scan details
-        return {
-            "user": {
-                "name": user.name,
-                "email": user.email,
-                "phone": user.phone,
-                "badge_code": user.badge_code
-            },
-            "activity": {
-                "activity_name": activity.activity_name,
-                "activity_category": activity.activity_category
-            },
-            "scanned_at": scan.scanned_at.isoformat()
-        }
+            created = ScanRepository.create_scans(db, scans)
+        return {"created": created, "failed": len(items) - created, "results": results}
 
     """
     Retrieves scan counts grouped by activity, optionally filtered by frequency or activity category.
@@ -59,40 +241,127 @@ class ScanService:
     def get_scan_aggregates(db: Session, min_frequency=None, max_frequency=None, activity_category=None):
         results = ScanRepository.get_scan_counts(db, min_frequency, max_frequency, activity_category)
 
-        return [
-            {
-                "activity_name": row.activity_name,
-                "activity_category": row.activity_category,
-                "scan_count": row.scan_count
-            }
-            for row in results
-        ]
+        return [serialize_scan_count(row) for row in results]
     
     """
-    Retrieves scan counts for a given activity, grouped by hour within a specified time range.
+    Loads the live feed's per-activity counts from the summary table, once per process.
     Args:
         db (Session): The SQLAlchemy session.
-        activity_name (str): The name of the activity.
-        start_time_str (str): The start time in "HH:MM" format.
-        end_time_str (str): The end time in "HH:MM" format.
+    """
+    @staticmethod
+    def load_scan_feed(db: Session):
+        scan_feed.ensure_loaded(lambda: ScanRepository.get_scan_counts(db))
+
+    """
+    Publishes the scans other processes recorded since the last reconciliation.
+    Args:
+        db (Session): A session on the primary; a lagging replica would move counts
+            that already include this process's scans backwards.
+    """
+    @staticmethod
+    def reconcile_scan_feed(db: Session):
+        scan_feed.reconcile(ScanRepository.get_scan_counts(db))
+
+    """
+    Streams per-activity scan counts as Server-Sent Events: a `snapshot` event with
+    every activity's count, then a `counts` event with the activities that changed,
+    at most SCAN_STREAM_MAX_RATE times per second. Quiet streams get a keep-alive
+    comment every SCAN_STREAM_HEARTBEAT_SECONDS. The caller subscribes first, so it
+    can turn the stream away when the process is full, and unsubscribes when the
+    response is closed; the stream also unsubscribes when the client disconnects.
+    Args:
+        db (Session): A session on the primary, closed between queries.
+        dumps (callable): Encodes the event payloads, e.g. app.json.dumps.
+        subscriber: The subscriber returned by scan_feed.subscribe.
+        snapshot (list): The snapshot returned with it.
+        wake (threading.Event): The event the subscriber sets on changes.
+    Yields:
+        str: The events.
+    """
+    @staticmethod
+    def stream_scan_counts(db: Session, dumps, subscriber, snapshot, wake):
+        try:
+            yield format_event("snapshot", {"activities": snapshot}, dumps)
+            sent_at = time.monotonic()
+            while True:
+                wake.wait(scan_feed.wait_interval)
+                wake.clear()
+                if scan_feed.claim_reconcile():
+                    ScanService.reconcile_scan_feed(db)
+                    db.close()
+
+                # Let changes pile up until the client's next update is due
+                delay = sent_at + scan_feed.min_interval - time.monotonic()
+                if subscriber.pending and delay > 0:
+                    time.sleep(delay)
+                changes = scan_feed.drain(subscriber)
+                if changes:
+                    yield format_event("counts", {"activities": changes}, dumps)
+                elif time.monotonic() - sent_at >= scan_feed.heartbeat_interval:
+                    yield KEEP_ALIVE
+                else:
+                    continue
+                sent_at = time.monotonic()
+        finally:
+            scan_feed.unsubscribe(subscriber)
+
+    """
+    Parses an ISO 8601 range boundary for the time-bucket query. Timezone-aware values
+    are converted to the database clock's zone to match the scans table.
+    Args:
+        value (str): The timestamp from the query string.
+        name (str): The parameter name, used in the error message.
     Returns:
-        list: A list of dictionaries containing hour and corresponding scan count.
+        datetime: The naive timestamp.
     Raises:
-        ValueError: If the time strings are not in valid "HH:MM" format.
+        ValueError: If the timestamp is not valid ISO 8601.
     """
     @staticmethod
-    def get_scan_count_by_time_period(db, activity_name, start_time_str, end_time_str):
-        # Convert time strings to time objects
+    def _parse_range_boundary(value, name):
         try:
-            start_time = datetime.strptime(start_time_str, "%H:%M").time()
-            end_time = datetime.strptime(end_time_str, "%H:%M").time()
+            boundary = datetime.fromisoformat(value)
         except ValueError:
-            raise ValueError("Invalid time format. Use HH:MM")
+            raise ValueError(f"Invalid {name}. Use an ISO 8601 date or datetime, e.g. 2025-02-21T18:00")
+        return database_clock.to_database(boundary)
+
+    """
+    Retrieves scan counts for a given activity in fixed-width buckets over a datetime range.
+    Every bucket in the range is returned, with a count of 0 for buckets without scans.
+    Args:
+        db (Session): The SQLAlchemy session.
+        activity_name (str): The name of the activity.
+        start_str (str): The inclusive start of the range, in ISO 8601 format.
+        end_str (str): The exclusive end of the range, in ISO 8601 format.
+        bucket (str): The bucket width, one of BUCKET_WIDTHS (e.g. "15m").
+        max_buckets (int): The most buckets a range may span (TIME_BUCKET_MAX_COUNT).
+    Returns:
+        list: A list of dictionaries containing each bucket's start time and scan count.
+    Raises:
+        ValueError: If the range or bucket width is invalid, or the range has too many buckets.
+    """
+    @staticmethod
+    def get_scan_count_by_time_period(db, activity_name, start_str, end_str, bucket="1h", max_buckets=2000):
+        if bucket not in BUCKET_WIDTHS:
+            raise ValueError(f"Invalid bucket. Use one of: {', '.join(BUCKET_WIDTHS)}")
+        bucket_seconds = BUCKET_WIDTHS[bucket]
+        start = ScanService._parse_range_boundary(start_str, "start")
+        end = ScanService._parse_range_boundary(end_str, "end")
+        if end <= start:
+            raise ValueError("end must be after start")
 
-        # Fetch data from the repository
-        result = ScanRepository.get_scan_count_by_time_period(db, activity_name, start_time, end_time)
+        bucket_count = math.ceil((end - start).total_seconds() / bucket_seconds)
+        if bucket_count > max_buckets:
+            raise ValueError(f"Range spans {bucket_count} buckets; the maximum is {max_buckets}")
 
-        # Prepare the data in the desired format
-        time_distribution = [{"hour": row.time_period, "count": row.scan_count} for row in result]
+        counts = {}
+        activity = ScanRepository.get_activity(db, activity_name)
+        if activity:
+            result = ScanRepository.get_scan_count_by_time_period(db, activity.id, start, end, bucket_seconds)
+            counts = {row.bucket: row.scan_count for row in result}
 
-        return time_distribution
\ No newline at end of file
+        # Fill in empty buckets so the series is dense
+        width = timedelta(seconds=bucket_seconds)
+        return [
+            {"bucket_start": format_datetime(start + index * width), "count": counts.get(index, 0)}
+            for index in range(bucket_count)
+        ]
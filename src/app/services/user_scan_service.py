@@ -2,6 +2,10 @@ from sqlalchemy.orm import Session
 from app.models.models import UserScan, User
 from app.repositories.user_scan_repository import UserScanRepository
 from app.repositories.user_repository import UserRepository
+from app.utils.pagination import encode_cursor, decode_cursor, InvalidCursor
+from app.database import unit_of_work
+from app.cache.recent_scans import recent_scans, user_scan_key
+from app.serializers.serializer import format_datetime, serialize_user_ref
 from datetime import datetime
 
 class UserScanService:
@@ -18,8 +22,8 @@ class UserScanService:
 
     @staticmethod
     def scan_badge(db: Session, scanner_badge: str, scanned_badge: str):
-        scanner = UserRepository.get_user_by_badge_code(db, scanner_badge)
-        scanned = UserRepository.get_user_by_badge_code(db, scanned_badge)
+        scanner = UserRepository.get_user_ref_by_badge_code(db, scanner_badge)
+        scanned = UserRepository.get_user_ref_by_badge_code(db, scanned_badge)
 
         if not scanner or not scanned:
             return {"error": "One or both users not found"}, 404
@@ -28,45 +32,106 @@ class UserScanService:
         if scanner.id == scanned.id:
             return {"error": "Users cannot scan themselves"}, 400
 
-        # Create scan record
-        user_scan = UserScanRepository.create_user_scan(db, scanner.id, scanned.id)
+        # A repeat within the dedupe window returns the first scan
+        key = user_scan_key(scanner.id, scanned.id)
+        with recent_scans.claim(key, recent_scans.user_scan_window) as claim:
+            if claim.duplicate is not None:
+                return claim.duplicate
 
+            # Create scan record
+            with unit_of_work(db):
+                user_scan = UserScanRepository.create_user_scan(db, scanner.id, scanned.id)
+
+            result = {
+                "scanner": serialize_user_ref(scanner),
+                "scanned": serialize_user_ref(scanned),
+                "scanned_at": format_datetime(user_scan.scanned_at),
+            }
+            claim.complete(result)
+            return result
+
+    """
+    Decodes a (scanned_at, id) cursor for the user scan lists.
+    Args:
+        cursor (str): The `next_cursor` returned with the previous page, or None.
+    Returns:
+        tuple: The (scanned_at, id) of the last user scan on the previous page, or None.
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    @staticmethod
+    def _decode_scan_cursor(cursor):
+        after = decode_cursor(cursor, 2)
+        if after is None:
+            return None
+        try:
+            return datetime.fromisoformat(after[0]), int(after[1])
+        except (TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+
+    """
+    Turns a page of (id, name, badge_code, scanned_at, scan_id) rows into the list response.
+    Args:
+        rows (list): Up to `limit + 1` rows from UserScanRepository.
+        limit (int): The page size.
+    Returns:
+        dict: The users on the page, the page size and the cursor for the next page.
+    """
+    @staticmethod
+    def _user_page(user_id, rows, limit):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].scanned_at.isoformat(), rows[-1].scan_id)
         return {
-            "scanner": {"id": scanner.id, "name": scanner.name, "badge_code": scanner.badge_code},
-            "scanned": {"id": scanned.id, "name": scanned.name, "badge_code": scanned.badge_code},
-            "scanned_at": user_scan.scanned_at.isoformat(),
+            "user_id": user_id,
+            "users": [serialize_user_ref(row) for row in rows],
+            "limit": limit,
+            "next_cursor": next_cursor
         }
 
     """
-    Retrieves a list of users that a given user has scanned.
+    Retrieves one page of users that a given user has scanned, in scan order.
     Args:
         db: The SQLAlchemy session.
         badge_code (str): The badge code of the user.
+        limit (int): The maximum number of users on the page.
+        cursor (str, optional): The `next_cursor` returned with the previous page.
     Returns:
-        list: A list of scanned users with their IDs, names, and badge codes.
+        dict: The user's ID and a page of scanned users with their IDs, names, and badge codes,
+        or an error message.
+    Raises:
+        ValueError: If the cursor is invalid.
     """
     @staticmethod
-    def get_scanned_users(db: Session, badge_code: str):
-        user = UserRepository.get_user_by_badge_code(db, badge_code)
+    def get_scanned_users(db: Session, badge_code: str, limit: int, cursor: str = None):
+        after = UserScanService._decode_scan_cursor(cursor)
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
         if not user:
             return {"error": "User not found"}, 404
 
-        scanned_users = UserScanRepository.get_users_scanned_by(db, user.id)
-        return [{"id": u.id, "name": u.name, "badge_code": u.badge_code} for u in scanned_users]
+        rows = UserScanRepository.get_users_scanned_by(db, user.id, limit, after)
+        return UserScanService._user_page(user.id, rows, limit)
 
     """
-    Retrieves a list of users who have scanned a given user.
+    Retrieves one page of users who have scanned a given user, in scan order.
     Args:
         db: The SQLAlchemy session.
         badge_code (str): The badge code of the user.
+        limit (int): The maximum number of users on the page.
+        cursor (str, optional): The `next_cursor` returned with the previous page.
     Returns:
-        list: A list of users who have scanned the given user with their IDs, names, and badge codes.
+        dict: The user's ID and a page of users who have scanned them with their IDs, names,
+        and badge codes, or an error message.
+    Raises:
+        ValueError: If the cursor is invalid.
     """
     @staticmethod
-    def get_users_who_scanned(db: Session, badge_code: str):
-        user = UserRepository.get_user_by_badge_code(db, badge_code)
+    def get_users_who_scanned(db: Session, badge_code: str, limit: int, cursor: str = None):
+        after = UserScanService._decode_scan_cursor(cursor)
+        user = UserRepository.get_user_ref_by_badge_code(db, badge_code)
         if not user:
             return {"error": "User not found"}, 404
 
-        users_who_scanned = UserScanRepository.get_users_who_scanned(db, user.id)
-        return [{"id": u.id, "name": u.name, "badge_code": u.badge_code} for u in users_who_scanned]
+        rows = UserScanRepository.get_users_who_scanned(db, user.id, limit, after)
+        return UserScanService._user_page(user.id, rows, limit)
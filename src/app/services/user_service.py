@@ -1,16 +1,62 @@
+from collections import defaultdict
 from app.repositories.user_repository import UserRepository
+from app.serializers.serializer import serialize_user
+from app.database import unit_of_work
+from app.utils.pagination import encode_cursor, decode_cursor, InvalidCursor
 
 class UserService:
     """
-    Retrieves a list of all users from the database.
+    Retrieves one page of users, ordered by ID, in the shape requested with ?fields=
+    and ?include=. Only the requested columns are selected, and scans are only queried
+    when they are included: one query for the page and one per chunk of users for scans.
     Args:
         db: The SQLAlchemy session.
+        projection (UserProjection): The requested fields and scan options.
+        limit (int): The maximum number of users on the page.
+        cursor (str, optional): The `next_cursor` returned with the previous page.
     Returns:
-        list: A list of all users.
+        tuple: The serialized users on the page, and the cursor for the next page.
+    Raises:
+        ValueError: If the cursor is invalid.
     """
     @staticmethod
-    def get_all_users(db):
-        return UserRepository.get_all_users(db)
+    def get_user_page(db, projection, limit, cursor=None):
+        after = decode_cursor(cursor, 1)
+        after_id = after[0] if after else None
+        if after_id is not None and not isinstance(after_id, int):
+            raise InvalidCursor("Invalid cursor")
+
+        rows = UserRepository.get_user_columns_page(db, projection.fields, limit, after_id)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].id)
+        return UserService._serialize_projection(db, projection, rows), next_cursor
+
+    """
+    Serializes one user in the shape requested with ?fields= and ?include=, adding
+    their scans if included.
+    Args:
+        db: The SQLAlchemy session.
+        projection (UserProjection): The requested fields and scan options.
+        version (Row): The user's row from get_user_version, which has every user column.
+    Returns:
+        dict: The serialized user.
+    """
+    @staticmethod
+    def get_user_profile(db, projection, version):
+        return UserService._serialize_projection(db, projection, [version])[0]
+
+    @staticmethod
+    def _serialize_projection(db, projection, rows):
+        if not projection.include_scans:
+            return [serialize_user(row, projection.fields) for row in rows]
+        scans = defaultdict(list)
+        for scan in UserRepository.get_scan_rows(
+            db, [row.id for row in rows], projection.scans_limit, projection.scans_since
+        ):
+            scans[scan.user_id].append(scan)
+        return [serialize_user(row, projection.fields, scans[row.id]) for row in rows]
 
     """
     Retrieves a user by their ID.
@@ -36,6 +82,22 @@ class UserService:
     def get_user_by_badge_code(db, badge_code):
         return UserRepository.get_user_by_badge_code(db, badge_code)
 
+    """
+    Retrieves the version of a user's profile, used to answer conditional requests
+    without loading the user's scans.
+    Args:
+        db: The SQLAlchemy session.
+        user_id (int, optional): The ID of the user.
+        badge_code (str, optional): The badge code of the user, if no ID is given.
+    Returns:
+        Row: The user's columns plus scan_count and last_scan_id, or None if not found.
+    """
+    @staticmethod
+    def get_user_version(db, user_id=None, badge_code=None):
+        if user_id is not None:
+            return UserRepository.get_user_version_by_id(db, user_id)
+        return UserRepository.get_user_version_by_badge_code(db, badge_code)
+
     """
     Updates a user's information.
     Args:
@@ -47,4 +109,5 @@ class UserService:
     """
     @staticmethod
     def update_user(db, user_id, update_data):
-        return UserRepository.update_user(db, user_id, update_data)
+        with unit_of_work(db):
+            return UserRepository.update_user(db, user_id, update_data)
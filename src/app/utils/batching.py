@@ -0,0 +1,24 @@
+from itertools import islice
+from app.diagnostics.query_budget import chunked_statements
+
+# SQL Server caps a statement at 2100 bound parameters, so IN lists are split well below that.
+IN_CLAUSE_CHUNK_SIZE = 1000
+
+
+def chunked(iterable, size=IN_CLAUSE_CHUNK_SIZE):
+    """
+    Splits an iterable into lists of at most `size` items. Statements run while the
+    chunks are consumed are exempt from N+1 detection, since one per chunk is intended.
+    Args:
+        iterable (iterable): The items to split.
+        size (int): The maximum number of items per chunk.
+    Returns:
+        generator: Successive lists of items.
+    """
+    iterator = iter(iterable)
+    with chunked_statements():
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
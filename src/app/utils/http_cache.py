@@ -0,0 +1,63 @@
+import hashlib
+from flask import request, Response
+from app.database import database_clock
+
+
+def user_validators(version, variant=""):
+    """
+    Builds the HTTP validators for a user's profile response.
+    Args:
+        version (Row): The row returned by UserService.get_user_version.
+        variant (str, optional): Identifies the response shape (see projection_variant),
+            so ?fields= or ?include= responses don't share an ETag with the full profile.
+    Returns:
+        tuple: The strong ETag and the Last-Modified datetime (UTC, whole seconds).
+    """
+    fingerprint = "|".join(str(value) for value in version) + "|" + variant
+    etag = hashlib.blake2b(fingerprint.encode(), digest_size=12).hexdigest()
+    last_modified = None
+    if version.updated_at is not None:
+        # Naive timestamps are in the database clock's zone, not this host's
+        last_modified = database_clock.to_utc(version.updated_at).replace(microsecond=0)
+    return etag, last_modified
+
+
+def is_not_modified(etag, last_modified, current_request=None):
+    """
+    Evaluates the request's If-None-Match / If-Modified-Since headers. If-None-Match
+    takes precedence when both are sent.
+    Args:
+        current_request (Request, optional): The request to check, e.g. the async app's;
+            defaults to Flask's current request.
+    Returns:
+        bool: Whether the client's copy is still current.
+    """
+    if current_request is None:
+        current_request = request
+    if current_request.if_none_match:
+        return current_request.if_none_match.contains(etag)
+    if current_request.if_modified_since and last_modified is not None:
+        return last_modified <= current_request.if_modified_since
+    return False
+
+
+def with_validators(response, etag, last_modified):
+    """
+    Sets ETag, Last-Modified and Cache-Control: no-cache (clients may keep the body but
+    must revalidate it) on `response`.
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified, response_class=Response):
+    """
+    Args:
+        response_class (type, optional): The response type to build, e.g. Quart's.
+    Returns:
+        Response: An empty 304 Not Modified response carrying the validators.
+    """
+    return with_validators(response_class(status=304), etag, last_modified)
@@ -0,0 +1,59 @@
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    """
+    Encodes the sort key of the last row on a page into an opaque cursor.
+    Args:
+        *values: JSON-serializable sort key values (e.g. an id, or an ISO timestamp and an id).
+    Returns:
+        str: A URL-safe cursor string.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor, size):
+    """
+    Decodes a cursor produced by `encode_cursor`.
+    Args:
+        cursor (str): The cursor string from a previous page, or None for the first page.
+        size (int): The number of sort key values the cursor must contain.
+    Returns:
+        list: The sort key values, or None if no cursor was given.
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def parse_limit(limit, config):
+    """
+    Validates a page size from the query string.
+    Args:
+        limit (int): The requested page size, or None to use the default.
+        config (dict): The app's config, for PAGE_SIZE_DEFAULT and PAGE_SIZE_MAX.
+    Returns:
+        int: The page size, capped at PAGE_SIZE_MAX.
+    Raises:
+        ValueError: If the page size is not a positive integer.
+    """
+    if limit is None:
+        return config["PAGE_SIZE_DEFAULT"]
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, config["PAGE_SIZE_MAX"])
@@ -0,0 +1,76 @@
+from collections import namedtuple
+from datetime import datetime
+from app.database import database_clock
+
+# The user columns a client may select with ?fields=, in response order
+USER_FIELDS = ("id", "name", "email", "phone", "badge_code", "updated_at")
+
+# fields: the user columns to return; include_scans: whether to embed scans;
+# scans_limit: keep only each user's N most recent scans; scans_since: only scans at or after this time
+UserProjection = namedtuple("UserProjection", ["fields", "include_scans", "scans_limit", "scans_since"])
+
+# The response without any projection parameters: every column plus every scan
+DEFAULT_PROJECTION = UserProjection(USER_FIELDS, True, None, None)
+
+
+def parse_user_projection(args):
+    """
+    Reads the ?fields=, ?include=, ?scans_limit= and ?scans_since= parameters of the
+    user routes. Without any of them the default response is kept: every column plus
+    every scan. With ?fields=, scans are only embedded if ?include=scans is also given.
+    Args:
+        args (MultiDict): The request's query parameters.
+    Returns:
+        UserProjection: The requested shape, or DEFAULT_PROJECTION.
+    Raises:
+        ValueError: If a field, include, limit or timestamp is invalid.
+    """
+    fields = args.get("fields")
+    include = args.get("include")
+    scans_limit = args.get("scans_limit")
+    scans_since = args.get("scans_since")
+    if fields is None and include is None and scans_limit is None and scans_since is None:
+        return DEFAULT_PROJECTION
+
+    if fields is None:
+        selected = USER_FIELDS
+    else:
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested - set(USER_FIELDS)
+        if unknown or not requested:
+            raise ValueError(f"Invalid fields. Choose from: {', '.join(USER_FIELDS)}")
+        selected = tuple(field for field in USER_FIELDS if field in requested)
+
+    includes = {value.strip() for value in (include or "").split(",") if value.strip()}
+    if includes - {"scans"}:
+        raise ValueError("Invalid include. The only supported value is scans")
+
+    if scans_limit is not None:
+        try:
+            scans_limit = int(scans_limit)
+        except ValueError:
+            scans_limit = 0
+        if scans_limit < 1:
+            raise ValueError("scans_limit must be a positive integer")
+
+    if scans_since is not None:
+        try:
+            scans_since = datetime.fromisoformat(scans_since)
+        except ValueError:
+            raise ValueError("Invalid scans_since. Use an ISO 8601 date or datetime, e.g. 2025-02-21T18:00")
+        # Scans are stored naive, in the database clock's zone
+        scans_since = database_clock.to_database(scans_since)
+
+    return UserProjection(selected, "scans" in includes or fields is None, scans_limit, scans_since)
+
+
+def projection_variant(projection):
+    """
+    Returns:
+        str: A stable description of the response shape, mixed into the ETag so each
+             shape of the same user has its own validator ("" for the default response).
+    """
+    if projection == DEFAULT_PROJECTION:
+        return ""
+    since = projection.scans_since.isoformat() if projection.scans_since else ""
+    return f"{','.join(projection.fields)};{int(projection.include_scans)};{projection.scans_limit or ''};{since}"
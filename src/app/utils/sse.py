@@ -0,0 +1,18 @@
+# Stream responses must reach the client as they are written, not when a proxy's buffer fills
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# A comment line; EventSource ignores it, but writing it detects closed connections
+KEEP_ALIVE = ": keep-alive\n\n"
+
+
+def format_event(event, data, dumps):
+    """
+    Encodes one Server-Sent Event.
+    Args:
+        event (str): The event type, e.g. "snapshot".
+        data: The JSON-serializable payload.
+        dumps (callable): Encodes the payload on one line, e.g. app.json.dumps.
+    Returns:
+        str: The event, terminated by a blank line.
+    """
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
@@ -0,0 +1,88 @@
+"""
+Compares two load driver reports.
+
+    python -m bench.compare before.json after.json --threshold 10
+
+Prints throughput, p50/p95/p99 and queries per request for every scenario in both
+reports. Exits with status 1 if any scenario regressed by more than the threshold
+(percent lower throughput or higher p95), or now runs more queries per request.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def _format(value, change):
+    if value is None:
+        return f"{'-':>20}"
+    if change is None:
+        return f"{value:>12.2f}        "
+    return f"{value:>12.2f} ({change:+5.1f}%)"
+
+
+def compare(before, after, threshold=10.0):
+    """
+    Args:
+        before (dict): The baseline report.
+        after (dict): The report to check.
+        threshold (float): The allowed slowdown in percent.
+    Returns:
+        tuple: Printable rows, and the names of the scenarios that regressed.
+    """
+    rows = []
+    regressions = []
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        metrics = [
+            ("req/s", old["throughput_rps"], new["throughput_rps"]),
+            ("p50 ms", old["latency_ms"]["p50"], new["latency_ms"]["p50"]),
+            ("p95 ms", old["latency_ms"]["p95"], new["latency_ms"]["p95"]),
+            ("p99 ms", old["latency_ms"]["p99"], new["latency_ms"]["p99"]),
+            ("queries", old["queries_per_request"], new["queries_per_request"])
+        ]
+        rows.append((name, [(label, value, _change(base, value)) for label, base, value in metrics]))
+
+        throughput_change = _change(old["throughput_rps"], new["throughput_rps"])
+        p95_change = _change(old["latency_ms"]["p95"], new["latency_ms"]["p95"])
+        more_queries = (
+            old["queries_per_request"] is not None and new["queries_per_request"] is not None
+            and new["queries_per_request"] > old["queries_per_request"]
+        )
+        if (throughput_change is not None and throughput_change < -threshold) or \
+                (p95_change is not None and p95_change > threshold) or more_queries:
+            regressions.append(name)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('git_commit')} ({before['meta']['started_at']})")
+    print(f"after:  {after['meta'].get('git_commit')} ({after['meta']['started_at']})")
+    rows, regressions = compare(before, after, args.threshold)
+    labels = [label for label, _, _ in rows[0][1]] if rows else []
+    print(f"{'scenario':28}" + "".join(f"{label:>21}" for label in labels))
+    for name, metrics in rows:
+        marker = " !" if name in regressions else ""
+        print(f"{name:28}" + "".join(f" {_format(value, change)}" for _, value, change in metrics) + marker)
+
+    if regressions:
+        print(f"Regressed beyond {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
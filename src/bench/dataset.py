@@ -0,0 +1,176 @@
+"""
+Deterministic synthetic dataset for benchmarks.
+
+    python -m bench.dataset --database-url sqlite:///bench.db --scale 100k
+
+The scale is the number of scans. Each scale also gets one user per 10 scans,
+one user scan per 2 scans and a fixed set of activities. The same scale and seed
+always produce the same rows.
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.migrations import runner
+from app.models.models import User, Activity, Scan, UserScan
+from app.repositories.scan_repository import ScanRepository
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+
+EVENT_START = datetime(2025, 2, 21)
+EVENT_DAYS = 3
+
+# Meal scans cluster around these times of day (hour, minute), which produces the
+# rushes the time-bucket and aggregate endpoints see during a real event
+MEAL_TIMES = [(8, 0), (12, 30), (18, 30), (23, 59)]
+MEAL_RUSH_MINUTES = 20  # Standard deviation of a scan's distance from the meal time
+
+# activity_category -> number of activities; meals get a larger share of scans below
+ACTIVITY_CATEGORIES = {"meal": len(MEAL_TIMES) * EVENT_DAYS, "workshop": 30, "activity": 20, "social": 10}
+MEAL_SCAN_SHARE = 0.4
+
+INSERT_CHUNK_SIZE = 10_000
+
+
+def badge_code(user_index):
+    """
+    Returns:
+        str: The badge code of the `user_index`-th generated user (0-based).
+    """
+    return f"bench-{user_index:07d}"
+
+
+def _zipf_cum_weights(n, exponent=1.1):
+    # A few popular users and activities take most of the scans, as at a real event
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def _pick(rng, cum_weights):
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def _activities():
+    activities = []
+    meal_slots = [(day, hour, minute) for day in range(EVENT_DAYS) for hour, minute in MEAL_TIMES]
+    for day, hour, minute in meal_slots:
+        activities.append({
+            "activity_name": f"meal-day{day + 1}-{hour:02d}{minute:02d}",
+            "activity_category": "meal",
+            "slot": EVENT_START + timedelta(days=day, hours=hour, minutes=minute)
+        })
+    for category, count in ACTIVITY_CATEGORIES.items():
+        if category == "meal":
+            continue
+        for i in range(count):
+            activities.append({"activity_name": f"{category}-{i:02d}", "activity_category": category, "slot": None})
+    return activities
+
+
+def _daytime(rng):
+    # Non-meal scans spread over 09:00-23:00 on one of the event days
+    day = rng.randrange(EVENT_DAYS)
+    return EVENT_START + timedelta(days=day, hours=9, seconds=rng.randrange(14 * 60 * 60))
+
+
+def generate(engine, scale="10k", seed=42):
+    """
+    Creates the schema through the migrations and fills it with synthetic users,
+    activities, scans and user scans, then rebuilds the per-activity summary table.
+    Args:
+        engine (Engine): An engine on an empty database.
+        scale (str): One of SCALES.
+        seed (int): The random seed.
+    Returns:
+        dict: The number of rows inserted per table.
+    """
+    rng = random.Random(seed)
+    n_scans = SCALES[scale]
+    n_users = n_scans // 10
+    n_user_scans = n_scans // 2
+
+    runner.upgrade(engine)
+
+    activities = _activities()
+    meals = [i for i, activity in enumerate(activities) if activity["activity_category"] == "meal"]
+    others = [i for i, activity in enumerate(activities) if activity["activity_category"] != "meal"]
+    other_weights = _zipf_cum_weights(len(others))
+    user_weights = _zipf_cum_weights(n_users, exponent=0.6)
+
+    with engine.begin() as conn:
+        conn.execute(insert(Activity), [
+            {"activity_name": a["activity_name"], "activity_category": a["activity_category"]} for a in activities
+        ])
+        activity_ids = dict(conn.execute(select(Activity.activity_name, Activity.id)).tuples().all())
+
+    for chunk_start in range(0, n_users, INSERT_CHUNK_SIZE):
+        with engine.begin() as conn:
+            conn.execute(insert(User), [{
+                "name": f"Bench User {i}",
+                "email": f"user{i}@bench.test",
+                "phone": f"+1-555-{i:07d}",
+                "badge_code": badge_code(i)
+            } for i in range(chunk_start, min(chunk_start + INSERT_CHUNK_SIZE, n_users))])
+
+    with engine.connect() as conn:
+        user_ids = conn.execute(
+            select(User.id).where(User.badge_code.like("bench-%")).order_by(User.badge_code)
+        ).scalars().all()
+    # Spread the popular users over the ID range, so the first pages aren't all outliers
+    rng.shuffle(user_ids)
+
+    for chunk_start in range(0, n_scans, INSERT_CHUNK_SIZE):
+        rows = []
+        for _ in range(min(INSERT_CHUNK_SIZE, n_scans - chunk_start)):
+            user_id = user_ids[_pick(rng, user_weights)]
+            if rng.random() < MEAL_SCAN_SHARE:
+                activity = activities[rng.choice(meals)]
+                scanned_at = activity["slot"] + timedelta(minutes=rng.gauss(0, MEAL_RUSH_MINUTES))
+            else:
+                activity = activities[others[_pick(rng, other_weights)]]
+                scanned_at = _daytime(rng)
+            rows.append({
+                "user_id": user_id,
+                "activity_id": activity_ids[activity["activity_name"]],
+                "scanned_at": scanned_at.replace(microsecond=0)
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(Scan), rows)
+
+    for chunk_start in range(0, n_user_scans, INSERT_CHUNK_SIZE):
+        rows = []
+        for _ in range(min(INSERT_CHUNK_SIZE, n_user_scans - chunk_start)):
+            scanner = _pick(rng, user_weights)
+            scanned = _pick(rng, user_weights)
+            if scanned == scanner:
+                scanned = (scanned + 1) % n_users
+            rows.append({
+                "scanner_id": user_ids[scanner],
+                "scanned_id": user_ids[scanned],
+                "scanned_at": _daytime(rng)
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(UserScan), rows)
+
+    with Session(engine) as session, session.begin():
+        ScanRepository.rebuild_scan_counts(session)
+
+    return {"users": n_users, "activities": len(activities), "scans": n_scans, "user_scans": n_user_scans}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark dataset.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--scale", choices=SCALES, default="10k", help="Number of scans to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    started = time.monotonic()
+    counts = generate(engine, args.scale, args.seed)
+    print(f"Generated {counts} in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,324 @@
+"""
+Load driver for every blueprint route, run at a fixed concurrency.
+
+    python -m bench.load --database-url sqlite:///bench.db --out before.json
+    python -m bench.load --database-url sqlite:///bench.db --app async --concurrency 64 --out async.json
+    python -m bench.load --database-url sqlite:///bench.db --base-url http://localhost:3000 --out before.json
+
+Without --base-url the app is created in-process and driven through Flask's test
+client, and SQL statements are counted per request; --app async does the same for
+the asyncio app (app.aio), with every request run on one event loop. With --base-url, requests go
+over HTTP to a running server and queries per request are not reported. In both
+cases --database-url is used to pick the badges, users and activities that the
+requests refer to.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.engine import make_url
+
+from app.models.models import User, Activity
+
+SAMPLE_SIZE = 1000
+
+
+class Target:
+    """
+    The data requests are built from: a sample of users and every activity.
+    """
+
+    def __init__(self, database_url):
+        engine = create_engine(database_url)
+        with engine.connect() as conn:
+            self.users = conn.execute(
+                select(User.id, User.badge_code).order_by(User.id).limit(SAMPLE_SIZE)
+            ).tuples().all()
+            self.activities = conn.execute(
+                select(Activity.activity_name, Activity.activity_category).order_by(Activity.id)
+            ).tuples().all()
+            self.user_count = conn.execute(select(func.count(User.id))).scalar()
+        engine.dispose()
+        if len(self.users) < 2 or not self.activities:
+            raise SystemExit("The database needs users and activities; run bench.dataset first")
+
+
+# name -> function(rng, target) returning (method, path, json body or None)
+SCENARIOS = {
+    "users_page": lambda rng, t: ("GET", "/users?limit=100", None),
+    "user_by_id": lambda rng, t: ("GET", f"/users/{rng.choice(t.users)[0]}", None),
+    "user_by_badge": lambda rng, t: ("GET", f"/users/badge/{rng.choice(t.users)[1]}", None),
+    "users_page_fields": lambda rng, t: ("GET", "/users?limit=100&fields=name,badge_code", None),
+    "user_by_badge_fields": lambda rng, t: (
+        "GET", f"/users/badge/{rng.choice(t.users)[1]}?fields=name,badge_code&include=scans&scans_limit=5", None
+    ),
+    "update_user": lambda rng, t: (
+        "PUT", f"/users/{rng.choice(t.users)[0]}", {"phone": f"+1-555-{rng.randrange(10 ** 7):07d}"}
+    ),
+    "add_scan": lambda rng, t: _add_scan(rng, t),
+    # Readers double-firing: a few badges scanned into one activity over and over
+    "add_scan_repeats": lambda rng, t: (
+        "PUT", f"/scan/{rng.choice(t.users[:20])[1]}", dict(zip(("activity_name", "activity_category"), t.activities[0]))
+    ),
+    "add_scans_batch": lambda rng, t: ("POST", "/scans/batch", [_scan_item(rng, t) for _ in range(50)]),
+    "scan_aggregates": lambda rng, t: ("GET", "/scans?activity_category=meal", None),
+    "scan_count_by_time_period": lambda rng, t: (
+        "GET",
+        f"/scan_count_by_time_period?activity_name={rng.choice(t.activities)[0]}"
+        f"&start=2025-02-21&end=2025-02-24&bucket=15m",
+        None
+    ),
+    "scan_badge": lambda rng, t: _scan_badge(rng, t),
+    "scanned_users": lambda rng, t: ("GET", f"/scanned-users/{rng.choice(t.users)[1]}?limit=50", None),
+    "users_who_scanned": lambda rng, t: ("GET", f"/users-who-scanned/{rng.choice(t.users)[1]}?limit=50", None),
+    "network_mutual": lambda rng, t: (
+        "GET", f"/network/mutual/{rng.choice(t.users)[1]}/{rng.choice(t.users)[1]}?limit=50", None
+    ),
+    "network_top_connectors": lambda rng, t: ("GET", "/network/top-connectors?limit=10", None),
+    "network_suggestions": lambda rng, t: ("GET", f"/network/suggestions/{rng.choice(t.users)[1]}?limit=10", None),
+}
+
+
+def _scan_item(rng, target):
+    activity_name, activity_category = rng.choice(target.activities)
+    return {
+        "badge_code": rng.choice(target.users)[1],
+        "activity_name": activity_name,
+        "activity_category": activity_category
+    }
+
+
+def _add_scan(rng, target):
+    item = _scan_item(rng, target)
+    return "PUT", f"/scan/{item.pop('badge_code')}", item
+
+
+def _scan_badge(rng, target):
+    scanner, scanned = rng.sample(target.users, 2)
+    return "POST", "/scan-badge", {"scanner_badge": scanner[1], "scanned_badge": scanned[1]}
+
+
+class InProcessClient:
+    """
+    Drives the app through Flask's test client and counts the SQL statements each
+    request runs on any of the app's engines.
+    """
+
+    def __init__(self, database_url):
+        from sqlalchemy import event
+        from app import create_app
+        from app.database import db
+
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": database_url})
+        self._local = threading.local()
+        with self.app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+
+    def session(self):
+        return self.app.test_client()
+
+    def request(self, client, method, path, body):
+        self._local.queries = 0
+        response = client.open(path, method=method, json=body)
+        return response.status_code, len(response.get_data()), self._local.queries
+
+
+class AsyncInProcessClient:
+    """
+    Drives the asyncio app through Quart's test client. Requests from every worker
+    thread are run on a single event loop, as one ASGI worker would serve them, and SQL
+    statements are counted per request through a context variable that follows each
+    request's task.
+    """
+
+    def __init__(self, database_url):
+        from sqlalchemy import event
+        from app.aio import create_async_app
+
+        self.app = create_async_app({"SQLALCHEMY_DATABASE_URI": database_url})
+        self._queries = ContextVar("bench_queries", default=None)
+        event.listen(self.app.extensions["async_engine"].sync_engine, "before_cursor_execute", self._count)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.app.startup(), self._loop).result()
+
+    def _count(self, *args):
+        queries = self._queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+    def session(self):
+        return self.app.test_client()
+
+    async def _request(self, client, method, path, body):
+        queries = [0]
+        self._queries.set(queries)
+        response = await client.open(path, method=method, json=body)
+        return response.status_code, len(await response.get_data()), queries[0]
+
+    def request(self, client, method, path, body):
+        return asyncio.run_coroutine_threadsafe(self._request(client, method, path, body), self._loop).result()
+
+
+class HTTPClient:
+    """
+    Drives a running server over HTTP.
+    """
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip("/")
+
+    def session(self):
+        return self._requests.Session()
+
+    def request(self, client, method, path, body):
+        response = client.request(method, self.base_url + path, json=body)
+        return response.status_code, len(response.content), None
+
+
+def percentile(sorted_values, p):
+    """
+    Returns:
+        float: The nearest-rank `p`th percentile of an ascending list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(client, target, name, requests_count, concurrency, seed):
+    """
+    Sends `requests_count` requests of one scenario from `concurrency` threads.
+    Returns:
+        dict: Throughput, latency percentiles, error count and queries per request.
+    """
+    build = SCENARIOS[name]
+    remaining = iter(range(requests_count))
+    lock = threading.Lock()
+    latencies, queries = [], []
+    errors = 0
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random(f"{seed}-{name}-{index}")
+        session = client.session()
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            method, path, body = build(rng, target)
+            started = time.perf_counter()
+            status, _, query_count = client.request(session, method, path, body)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                if query_count is not None:
+                    queries.append(query_count)
+                if status >= 400:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None
+        },
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(database_url, base_url=None, scenarios=None, requests_count=500, concurrency=8, warmup=20, seed=1,
+        app="sync"):
+    """
+    Runs the selected scenarios one after another.
+    Args:
+        app (str): The in-process app to drive without `base_url`: "sync" or "async".
+    Returns:
+        dict: The report, with run metadata and one entry per scenario.
+    """
+    target = Target(database_url)
+    if base_url:
+        client = HTTPClient(base_url)
+    elif app == "async":
+        client = AsyncInProcessClient(database_url)
+    else:
+        client = InProcessClient(database_url)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "target": base_url or ("in-process-async" if app == "async" else "in-process"),
+            "database": make_url(database_url).get_backend_name(),
+            "users": target.user_count,
+            "concurrency": concurrency,
+            "requests_per_scenario": requests_count,
+            "seed": seed
+        },
+        "scenarios": {}
+    }
+    for name in scenarios or SCENARIOS:
+        if warmup:
+            run_scenario(client, target, name, warmup, 1, f"warmup-{seed}")
+        result = run_scenario(client, target, name, requests_count, concurrency, seed)
+        report["scenarios"][name] = result
+        print(f"{name:28} {result['throughput_rps']:>9} req/s  p50 {result['latency_ms']['p50']:8.2f} ms  "
+              f"p95 {result['latency_ms']['p95']:8.2f} ms  p99 {result['latency_ms']['p99']:8.2f} ms  "
+              f"queries {result['queries_per_request']}  errors {result['errors']}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every route at a fixed concurrency.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--base-url", help="Benchmark a running server instead of an in-process app")
+    parser.add_argument("--app", choices=("sync", "async"), default="sync", help="The in-process app to benchmark")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Repeat to run several (default: all)")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.database_url, args.base_url, args.scenario, args.requests, args.concurrency, args.warmup, args.seed,
+                 args.app)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
@@ -1,5 +1,12 @@
 import os
 
+
+def _seconds_by_name(value):
+    # Parses "meal=1800,workshop=300" into {"meal": 1800.0, "workshop": 300.0}
+    pairs = (item.rsplit("=", 1) for item in value.split(",") if "=" in item)
+    return {name.strip(): float(seconds) for name, seconds in pairs}
+
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")  # Security key
     DEBUG = os.getenv("DEBUG", True)  # Enable debugging in development
@@ -8,6 +15,117 @@ class Config:
     DB_SERVER = "localhost"
     DB_NAME = "HTNBackEndChallenge"
     DRIVER = "ODBC+Driver+17+for+SQL+Server"
-    SQLALCHEMY_DATABASE_URI = f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?trusted_connection=yes&driver={DRIVER}"
+    # DATABASE_URL selects the backend (e.g. sqlite:///htn.db or postgresql+psycopg2://...);
+    # without it the local trusted-connection SQL Server is used
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        "DATABASE_URL",
+        f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?trusted_connection=yes&driver={DRIVER}"
+    )
+
+    # Connection pool, sized per worker process (see app.database.engine_options)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))  # 0 disables the timeout
+    DB_FAST_EXECUTEMANY = os.getenv("DB_FAST_EXECUTEMANY", "true").lower() in ("1", "true", "yes")  # pyodbc only
+
+    # Optional read replicas (comma-separated URLs) for the read-only sessions of GET routes
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", 5))  # Staleness tolerance
+    DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 2))  # Seconds between lag checks
+    DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", 30))  # Skip a failed replica this long
     
+    # Zone of the database's clock, which stamps scans through the column defaults:
+    # "UTC", an IANA name, "local" (this host's zone) or empty for UTC on SQLite and
+    # "local" elsewhere. Client and app timestamps are stored in this zone too
+    DB_TIMEZONE = os.getenv("DB_TIMEZONE", "")
+
+    # Pooled connections each server worker opens before accepting requests (see gunicorn.conf.py)
+    WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", 4))
+
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # Disable event tracking for better performance
+
+    # Request, SQL and component metrics served on /metrics (off removes every hook)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # Statement budgets (app.diagnostics.query_budget): "off", "log" or "raise" (for tests)
+    QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log")
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", 5))  # Same statement N times = suspected N+1
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 500))  # Log statements slower than this (0 disables)
+
+    # Keyset pagination for list endpoints
+    PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", 100))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 1000))
+
+    # Encode JSON responses with orjson when it is installed
+    JSON_USE_ORJSON = os.getenv("JSON_USE_ORJSON", "true").lower() in ("1", "true", "yes")
+
+    # In-process badge_code -> user cache used by the scan endpoints (size 0 disables it)
+    BADGE_CACHE_SIZE = int(os.getenv("BADGE_CACHE_SIZE", 10000))
+    BADGE_CACHE_TTL = float(os.getenv("BADGE_CACHE_TTL", 300))  # Seconds
+    # TTL cap with several server workers: a badge edit only invalidates its own worker's
+    # entry, so the others could credit scans to the badge's old owner until it expires
+    BADGE_CACHE_MULTI_WORKER_TTL = float(os.getenv("BADGE_CACHE_MULTI_WORKER_TTL", 5))
+
+    # In-process connection graph behind the /network endpoints
+    NETWORK_GRAPH_REFRESH_SECONDS = float(os.getenv("NETWORK_GRAPH_REFRESH_SECONDS", 5))  # Catch up on other processes' scans
+    NETWORK_GRAPH_COMPACT_EDGES = int(os.getenv("NETWORK_GRAPH_COMPACT_EDGES", 50000))  # New edges before rebuilding the CSR arrays
+
+    # Response cache for the scan aggregate, time bucket and user list routes:
+    # "local" (per process), "redis" (shared), "off", or "auto" for local with one
+    # server worker and off with several, since local invalidations reach one process
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "auto")
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))  # Entries per process (local backend)
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 60))  # Seconds; bounds staleness across processes
+    RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_LOCK_TIMEOUT = float(os.getenv("RESPONSE_CACHE_LOCK_TIMEOUT", 5))  # Seconds to wait for a cold key
+
+    # Duplicate-scan suppression: repeating a scan within its window returns the first
+    # one instead of inserting again (0 disables). Activity scans can be overridden per
+    # category or activity name, e.g. SCAN_DEDUPE_CATEGORY_WINDOWS="meal=1800,workshop=300"
+    SCAN_DEDUPE_WINDOW_SECONDS = float(os.getenv("SCAN_DEDUPE_WINDOW_SECONDS", 10))
+    SCAN_DEDUPE_CATEGORY_WINDOWS = _seconds_by_name(os.getenv("SCAN_DEDUPE_CATEGORY_WINDOWS", ""))
+    SCAN_DEDUPE_ACTIVITY_WINDOWS = _seconds_by_name(os.getenv("SCAN_DEDUPE_ACTIVITY_WINDOWS", ""))
+    USER_SCAN_DEDUPE_WINDOW_SECONDS = float(os.getenv("USER_SCAN_DEDUPE_WINDOW_SECONDS", 10))  # Same scanner and scanned badge
+    SCAN_DEDUPE_MAX_ENTRIES = int(os.getenv("SCAN_DEDUPE_MAX_ENTRIES", 100000))  # Recent scans remembered per process
+
+    # Live scan counts at GET /scans/stream (per process)
+    SCAN_STREAM_MAX_RATE = float(os.getenv("SCAN_STREAM_MAX_RATE", 2))  # Updates per second per client
+    SCAN_STREAM_HEARTBEAT_SECONDS = float(os.getenv("SCAN_STREAM_HEARTBEAT_SECONDS", 15))
+    SCAN_STREAM_RECONCILE_SECONDS = float(os.getenv("SCAN_STREAM_RECONCILE_SECONDS", 5))  # Picks up other processes' scans (0 disables)
+    SCAN_STREAM_MAX_CLIENTS = int(os.getenv("SCAN_STREAM_MAX_CLIENTS", 100))
+    # Server worker processes; gunicorn.conf.py sets it to the number it starts
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+    # Threads per gunicorn worker (gunicorn.conf.py); the sync app serves at most
+    # WEB_THREADS - 1 streams per worker, since each one holds a thread while open
+    WEB_THREADS = int(os.getenv("WEB_THREADS", 4))
+
+    # Maximum number of scans accepted by one POST /scans/batch request
+    SCAN_BATCH_MAX_SIZE = int(os.getenv("SCAN_BATCH_MAX_SIZE", 10000))
+
+    # Maximum number of buckets one /scan_count_by_time_period response may contain
+    TIME_BUCKET_MAX_COUNT = int(os.getenv("TIME_BUCKET_MAX_COUNT", 2000))
+
+    # Scan ingestion for PUT /scan/<badge_code>: "sync" commits per request, "buffered"
+    # queues scans in-process and commits them in groups from a background thread
+    SCAN_INGEST_MODE = os.getenv("SCAN_INGEST_MODE", "sync")
+    SCAN_BUFFER_MAX_SIZE = int(os.getenv("SCAN_BUFFER_MAX_SIZE", 10000))  # Queued scans before backpressure
+    SCAN_BUFFER_BATCH_SIZE = int(os.getenv("SCAN_BUFFER_BATCH_SIZE", 500))  # Scans per group commit
+    SCAN_BUFFER_FLUSH_INTERVAL_MS = int(os.getenv("SCAN_BUFFER_FLUSH_INTERVAL_MS", 50))
+    SCAN_BUFFER_DURABILITY = os.getenv("SCAN_BUFFER_DURABILITY", "flush")  # "flush" or "enqueue"
+    SCAN_BUFFER_ENQUEUE_TIMEOUT = float(os.getenv("SCAN_BUFFER_ENQUEUE_TIMEOUT", 0.5))  # Seconds
+    SCAN_BUFFER_ACK_TIMEOUT = float(os.getenv("SCAN_BUFFER_ACK_TIMEOUT", 5))  # Seconds
+
+
+class TestConfig(Config):
+    """
+    Overrides for the test suite (tests/conftest.py): query budgets fail the test
+    instead of logging, and the database is a throwaway SQLite file set per test.
+    """
+    TESTING = True
+    QUERY_BUDGET_MODE = "raise"
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    RESPONSE_CACHE_BACKEND = "local"
+    WEB_CONCURRENCY = 1
@@ -1,10 +1,14 @@
+import argparse
+import codecs
 import json
-import requests
-import sqlalchemy
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, func
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-import pyodbc
+import os
+import time
 from datetime import datetime
+from itertools import islice
+
+import requests
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, func, select, insert
+from sqlalchemy.orm import declarative_base, relationship
 
 # Database configuration (update with your SQL Server details)
 DB_SERVER = "localhost"
@@ -12,8 +16,8 @@ DB_NAME = "HTNBackEndChallenge"
 
 CONN_STRING = f"mssql+pyodbc://@{DB_SERVER}/{DB_NAME}?trusted_connection=yes&driver=ODBC+Driver+17+for+SQL+Server"
 
-# Create database engine
-engine = create_engine(CONN_STRING, echo=True, future=True)
+DEFAULT_SOURCE = "https://gist.githubusercontent.com/SuperZooper3/685fe234d711a92d4f950bdfbed3bd2c/raw/"
+
 Base = declarative_base()
 
 # Define User model
@@ -51,67 +55,240 @@ class Scan(Base):
     user = relationship("User", back_populates="scans")
     activity = relationship("Activity", back_populates="scans")
 
-# Create tables
-Base.metadata.create_all(engine)
+# SQL Server caps a statement at 2100 bound parameters, so IN lists are split well below that
+IN_CLAUSE_CHUNK_SIZE = 1000
 
-# Fetch and insert JSON data
-def fetch_and_insert_data():
-    url = "https://gist.githubusercontent.com/SuperZooper3/685fe234d711a92d4f950bdfbed3bd2c/raw/"
-    response = requests.get(url)
-    data = response.json()
+READ_SIZE = 64 * 1024
 
-    Session = sessionmaker(bind=engine)
-    session = Session()
 
-    activity_cache = {}
+def chunked(iterable, size):
+    """
+    Splits an iterable into lists of at most `size` items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_text(source):
+    """
+    Yields the text of a local JSON file or a URL in fixed-size pieces, so the
+    dump never has to fit in memory.
+    Args:
+        source (str): A file path or an http(s) URL.
+    """
+    if source.startswith(("http://", "https://")):
+        response = requests.get(source, stream=True)
+        response.raise_for_status()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for block in response.iter_content(chunk_size=READ_SIZE):
+            yield decoder.decode(block)
+        yield decoder.decode(b"", final=True)
+    else:
+        with open(source, encoding="utf-8") as f:
+            while True:
+                text = f.read(READ_SIZE)
+                if not text:
+                    return
+                yield text
+
+
+def iter_json_array(pieces):
+    """
+    Incrementally parses a top-level JSON array, yielding one element at a time.
+    Args:
+        pieces (iterable): Successive pieces of the JSON text.
+    Raises:
+        ValueError: If the text is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    pieces = iter(pieces)
+    buffer = ""
+    pos = 0
+    started = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ",")):
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array of users")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element is cut off at the end of the buffer; read more below
+                pass
+            else:
+                yield element
+                pos = end
+                continue
+
+        piece = next(pieces, None)
+        if piece is None:
+            raise ValueError("Unexpected end of JSON input")
+        buffer = buffer[pos:] + piece
+        pos = 0
+
+
+def read_checkpoint(path):
+    """
+    Returns:
+        int: The number of source entries already committed by a previous run.
+    """
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f)["entries_done"]
+
+
+def write_checkpoint(path, entries_done):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"entries_done": entries_done}, f)
+    os.replace(tmp_path, path)
+
+
+def resolve_activities(conn, activities, activity_cache):
+    """
+    Makes sure every activity in `activities` exists and is in `activity_cache`.
+    Args:
+        conn (Connection): The connection of the chunk's transaction.
+        activities (dict): activity_name -> activity_category seen in the chunk.
+        activity_cache (dict): activity_name -> id, filled in place.
+    """
+    missing = [name for name in activities if name not in activity_cache]
+    for names in chunked(missing, IN_CLAUSE_CHUNK_SIZE):
+        rows = conn.execute(select(Activity.activity_name, Activity.id).where(Activity.activity_name.in_(names)))
+        activity_cache.update((name, activity_id) for name, activity_id in rows)
 
-    for entry in data:
+    new = [
+        {"activity_name": name, "activity_category": activities[name]}
+        for name in missing if name not in activity_cache
+    ]
+    if new:
+        conn.execute(insert(Activity), new)
+        for names in chunked([row["activity_name"] for row in new], IN_CLAUSE_CHUNK_SIZE):
+            rows = conn.execute(select(Activity.activity_name, Activity.id).where(Activity.activity_name.in_(names)))
+            activity_cache.update((name, activity_id) for name, activity_id in rows)
+
+
+def insert_chunk(conn, entries, activity_cache):
+    """
+    Inserts one chunk of users with their activities and scans using bulk executemany
+    statements. IDs are resolved through natural keys (badge_code, activity_name) rather
+    than per-row flushes. Users whose badge_code already exists are skipped along with
+    their scans, which makes re-running a partially loaded chunk safe.
+    Args:
+        conn (Connection): The connection of the chunk's transaction.
+        entries (list): Raw user entries from the JSON source.
+        activity_cache (dict): activity_name -> id, shared across chunks.
+    Returns:
+        tuple: The number of users and scans inserted.
+    """
+    users = {}
+    for entry in entries:
         # Skip users with empty badge_code
-        if not entry["badge_code"].strip():
-            continue  
-
-        # Insert User
-        user = User(
-            name=entry["name"],
-            email=entry["email"],
-            phone=entry["phone"],
-            badge_code=entry["badge_code"]
-        )
-        session.add(user)
-        session.flush()  # Get user ID before adding scans
+        badge_code = entry["badge_code"]
+        if badge_code.strip() and badge_code not in users:
+            users[badge_code] = entry
+
+    for badge_codes in chunked(list(users), IN_CLAUSE_CHUNK_SIZE):
+        existing = conn.execute(select(User.badge_code).where(User.badge_code.in_(badge_codes))).scalars()
+        for badge_code in existing:
+            del users[badge_code]
+    if not users:
+        return 0, 0
+
+    conn.execute(insert(User), [{
+        "name": entry["name"],
+        "email": entry["email"],
+        "phone": entry["phone"],
+        "badge_code": badge_code
+    } for badge_code, entry in users.items()])
+
+    user_ids = {}
+    for badge_codes in chunked(list(users), IN_CLAUSE_CHUNK_SIZE):
+        rows = conn.execute(select(User.badge_code, User.id).where(User.badge_code.in_(badge_codes)))
+        user_ids.update((badge_code, user_id) for badge_code, user_id in rows)
 
+    activities = {}
+    for entry in users.values():
         for scan in entry.get("scans", []):
-            activity_key = scan["activity_name"]
-
-            if activity_key not in activity_cache:
-                # Insert Activity if not already in DB
-                activity = Activity(
-                    activity_name=scan["activity_name"],
-                    activity_category=scan["activity_category"]
-                )
-                session.add(activity)
-                session.flush()  # Get activity ID
-                activity_cache[activity_key] = activity.id
-            else:
-                activity = session.query(Activity).filter_by(activity_name=scan["activity_name"]).first()
-                activity_cache[activity_key] = activity.id
-
-            # Convert scanned_at to datetime
-            scanned_at_dt = datetime.fromisoformat(scan["scanned_at"])
-
-            # Insert Scan
-            scan_entry = Scan(
-                user_id=user.id,
-                activity_id=activity_cache[activity_key],
-                scanned_at=scanned_at_dt
-            )
-            session.add(scan_entry)
-
-    session.commit()
-    session.close()
+            activities.setdefault(scan["activity_name"], scan["activity_category"])
+    resolve_activities(conn, activities, activity_cache)
+
+    scans = [{
+        "user_id": user_ids[badge_code],
+        "activity_id": activity_cache[scan["activity_name"]],
+        "scanned_at": datetime.fromisoformat(scan["scanned_at"])
+    } for badge_code, entry in users.items() for scan in entry.get("scans", [])]
+    if scans:
+        conn.execute(insert(Scan), scans)
+
+    return len(users), len(scans)
+
+
+# Fetch and insert JSON data
+def fetch_and_insert_data(engine, source=DEFAULT_SOURCE, chunk_size=1000, checkpoint=None):
+    """
+    Streams users from `source` and loads them in chunks of `chunk_size` entries, one
+    transaction per chunk. After each chunk commits, the number of entries processed
+    is written to `checkpoint`, and a later run with the same checkpoint resumes there.
+    Args:
+        engine (Engine): The database engine.
+        source (str): A local JSON file or a URL.
+        chunk_size (int): The number of source entries per transaction.
+        checkpoint (str, optional): Path of the progress file used for resuming.
+    """
+    entries_done = read_checkpoint(checkpoint)
+    entries = islice(iter_json_array(read_text(source)), entries_done, None)
+    if entries_done:
+        print(f"Resuming after {entries_done} entries")
+
+    activity_cache = {}
+    users_total = scans_total = 0
+    started = time.monotonic()
+
+    for chunk in chunked(entries, chunk_size):
+        with engine.begin() as conn:
+            users, scans = insert_chunk(conn, chunk, activity_cache)
+        entries_done += len(chunk)
+        users_total += users
+        scans_total += scans
+        write_checkpoint(checkpoint, entries_done)
+
+        elapsed = time.monotonic() - started
+        print(f"{entries_done} entries processed: {users_total} users, {scans_total} scans "
+              f"inserted ({scans_total / elapsed if elapsed else 0:.0f} scans/s)")
+
     print("Data successfully inserted!")
 
 
 # Run the script
 if __name__ == "__main__":
-    fetch_and_insert_data()
+    parser = argparse.ArgumentParser(description="Load users, activities and scans from a JSON dump.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Local JSON file or URL to load")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", CONN_STRING))
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Source entries per transaction")
+    parser.add_argument("--checkpoint", help="Progress file; re-run with the same path to resume")
+    parser.add_argument("--echo", action="store_true", help="Log every SQL statement")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url, echo=args.echo, future=True)
+
+    # Create tables
+    Base.metadata.create_all(engine)
+
+    fetch_and_insert_data(engine, args.source, args.chunk_size, args.checkpoint)
@@ -0,0 +1,53 @@
+"""
+Production server settings: `gunicorn --config gunicorn.conf.py main:app`.
+
+The app is created once in the master (preload) and forked into WEB_CONCURRENCY
+workers, each serving WEB_THREADS requests at a time. Keep DB_POOL_SIZE at least
+WEB_THREADS, since every thread may hold a connection; the database sees up to
+WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+
+# Handlers mostly wait on the database, so threads rather than more processes cover
+# the waiting; processes scale with the cores available for the Python work
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# The app reads it to pick per-process defaults, e.g. RESPONSE_CACHE_BACKEND=auto
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 4))
+
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))  # Time to finish requests and drain scans
+keepalive = int(os.getenv("WEB_KEEPALIVE", 5))
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # Runs in the master before the first fork
+    from app.lifecycle import load_network_graph
+    server.log.info("Networking graph loaded: %s", load_network_graph(server.app.wsgi()))
+
+
+def post_fork(server, worker):
+    from app.lifecycle import dispose_engines
+    dispose_engines(worker.app.wsgi())
+
+
+def post_worker_init(worker):
+    # Runs before the worker accepts its first connection
+    from app.lifecycle import warm_up
+    worker.log.info("Worker %s warmed up: %s", worker.pid, warm_up(worker.app.wsgi()))
+
+
+def worker_exit(server, worker):
+    from app.lifecycle import shut_down
+    stats = shut_down(worker.app.wsgi())
+    if stats is not None:
+        worker.log.info("Worker %s drained its scan buffer: %s", worker.pid, stats)
@@ -3,4 +3,5 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server only; containers run gunicorn (see gunicorn.conf.py)
     app.run(debug=True, port=3000)
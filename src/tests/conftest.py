@@ -0,0 +1,110 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.orm import Session
+from app import create_app
+from app.aio import create_async_app
+from app.database import db
+from app.cache.activity_cache import activity_cache
+from app.cache.badge_cache import badge_cache
+from app.cache.network_graph import network_graph
+from app.cache.scan_feed import scan_feed
+from app.migrations import runner
+from app.models.models import User, Activity, Scan, UserScan
+from config.config import TestConfig
+
+START = datetime(2025, 2, 21, 18, 0)
+
+
+def make_app(tmp_path, **overrides):
+    """
+    Creates the app on a fresh SQLite database built by the migrations, with the
+    process-wide caches emptied so nothing leaks in from an earlier test.
+    """
+    activity_cache.clear()
+    badge_cache.clear()
+    network_graph.load([])
+    network_graph.loaded = False
+    scan_feed.load([])
+    scan_feed.loaded = False
+
+    config = {key: value for key, value in vars(TestConfig).items() if key.isupper()}
+    config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    config.update(overrides)
+    app = create_app(config)
+    with app.app_context():
+        runner.upgrade(db.engine)
+    return app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def async_app(app):
+    """
+    The async app on the same database as `app`, so `seed` fills both.
+    """
+    config = {key: value for key, value in vars(TestConfig).items() if key.isupper()}
+    config["SQLALCHEMY_DATABASE_URI"] = app.config["SQLALCHEMY_DATABASE_URI"]
+    return create_async_app(config)
+
+
+def run_async(coro, timeout=10):
+    """
+    Runs `coro` on a fresh event loop in another thread, failing the test instead of
+    hanging it if the loop is blocked for longer than `timeout` seconds.
+    """
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = asyncio.run(coro)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail(f"The event loop was still blocked after {timeout}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("result")
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    """
+    Inserts users b0..b(n-1) (IDs 1..n), the activities dinner (meal) and workshop
+    (workshop), and optionally scans; returns the engine's Session factory.
+    """
+    def seed(users=5, scans=(), user_scans=()):
+        with app.app_context(), Session(db.engine) as session:
+            session.add_all([
+                User(name=f"User {i}", email=f"user{i}@example.com", phone=f"555-{i:04d}", badge_code=f"b{i}")
+                for i in range(users)
+            ])
+            session.add_all([
+                Activity(activity_name="dinner", activity_category="meal"),
+                Activity(activity_name="workshop", activity_category="workshop"),
+            ])
+            session.flush()
+            for user_id, activity_id, minutes in scans:
+                session.add(Scan(user_id=user_id, activity_id=activity_id, scanned_at=START + timedelta(minutes=minutes)))
+            for scanner_id, scanned_id, minutes in user_scans:
+                session.add(UserScan(scanner_id=scanner_id, scanned_id=scanned_id, scanned_at=START + timedelta(minutes=minutes)))
+            session.commit()
+    return seed
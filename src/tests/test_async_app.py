@@ -0,0 +1,65 @@
+import asyncio
+import time
+from sqlalchemy import create_engine, func, select
+from app.models.models import Scan
+from tests.conftest import run_async
+
+
+def scan_count(app):
+    engine = create_engine(app.config["SQLALCHEMY_DATABASE_URI"])
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(func.count(Scan.id))).scalar()
+    finally:
+        engine.dispose()
+
+
+def test_concurrent_cold_network_requests(async_app, seed):
+    seed(users=3, user_scans=[(1, 2, 0), (2, 3, 1)])
+
+    async def requests():
+        async with async_app.test_app() as test_app:
+            client = test_app.test_client()
+            responses = await asyncio.gather(*(client.get("/network/top-connectors") for _ in range(8)))
+            return [(response.status_code, await response.get_json()) for response in responses]
+
+    results = run_async(requests())
+    assert {status for status, _ in results} == {200}
+    assert results[0][1]["users"][0]["id"] == 2
+
+
+def test_concurrent_cold_streams(async_app, client, seed):
+    seed(users=1)
+    client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+
+    async def first_event(test_client):
+        async with test_client.request("/scans/stream") as connection:
+            await connection.send_complete()
+            event = await connection.receive()
+            await connection.disconnect()
+            return event
+
+    async def streams():
+        async with async_app.test_app() as test_app:
+            return await asyncio.gather(*(first_event(test_app.test_client()) for _ in range(4)))
+
+    for event in run_async(streams()):
+        assert event.startswith(b"event: snapshot\n")
+        assert b'"scan_count":1' in event
+
+
+def test_double_fired_scan_is_answered_without_waiting(async_app, seed):
+    seed(users=1)
+
+    async def double_fire():
+        async with async_app.test_app() as test_app:
+            client = test_app.test_client()
+            scan = {"activity_name": "dinner", "activity_category": "meal"}
+            started = time.monotonic()
+            responses = await asyncio.gather(*(client.put("/scan/b0", json=scan) for _ in range(2)))
+            return time.monotonic() - started, [response.status_code for response in responses]
+
+    elapsed, statuses = run_async(double_fire())
+    assert elapsed < 2
+    assert 200 in statuses and set(statuses) <= {200, 409}
+    assert scan_count(async_app) == 1
@@ -0,0 +1,60 @@
+import threading
+import time
+from app.cache.network_graph import NetworkGraph
+
+
+def make_graph(rows, compact_threshold=50000):
+    graph = NetworkGraph()
+    graph.configure(refresh_interval=0, compact_threshold=compact_threshold)
+    graph.load(rows)
+    return graph
+
+
+def test_new_edges_are_merged_by_compaction():
+    graph = make_graph([(1, 1, 2), (2, 2, 3)], compact_threshold=2)
+    graph.add([(3, 1, 3), (4, 3, 4)])
+    deadline = time.monotonic() + 5
+    while graph.stats()["compactions"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stats = graph.stats()
+    assert stats["compactions"] == 1
+    assert (stats["users"], stats["edges"], stats["pending_edges"]) == (4, 4, 0)
+    assert graph.neighbours(3) == {1, 2, 4}
+    assert graph.mutual(1, 3) == [2]
+    assert graph.suggestions(1, 10) == [(4, 1)]
+    assert graph.top_connectors(1) == [(3, 3)]
+
+
+def test_stats_while_edges_are_added():
+    graph = make_graph([])
+    errors = []
+
+    def add_edges():
+        for scan_id in range(1, 20000):
+            graph.add([(scan_id, scan_id, scan_id + 1)])
+
+    def read_stats():
+        try:
+            while writer.is_alive():
+                graph.stats()
+        except RuntimeError as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=add_edges)
+    reader = threading.Thread(target=read_stats)
+    writer.start()
+    reader.start()
+    writer.join()
+    reader.join()
+
+    assert errors == []
+    assert graph.stats()["edges"] == 19999
+
+
+def test_mutual_connections_route(client, seed):
+    seed(users=3, user_scans=[(1, 2, 0), (3, 2, 1)])
+    response = client.get("/network/mutual/b0/b2")
+
+    assert response.status_code == 200
+    assert [user["id"] for user in response.get_json()["users"]] == [2]
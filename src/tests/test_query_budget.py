@@ -0,0 +1,83 @@
+import logging
+import pytest
+from sqlalchemy import text
+from app.database import db
+from app.diagnostics.query_budget import query_budget, QueryBudgetExceeded, statement_shape
+from app.utils.batching import IN_CLAUSE_CHUNK_SIZE
+from tests.conftest import make_app
+
+
+def test_statement_shape_ignores_whitespace_and_list_length():
+    assert statement_shape("SELECT *\n  FROM users WHERE id IN (?, ?)") == statement_shape(
+        "SELECT * FROM users WHERE id IN (?, ?, ?, ?)"
+    )
+
+
+def test_route_over_budget_raises(app, client):
+    @app.route("/_test/over-budget")
+    @query_budget(1)
+    def over_budget():
+        db.session.execute(text("SELECT 1"))
+        db.session.execute(text("SELECT 2"))
+        return "ok"
+
+    with pytest.raises(QueryBudgetExceeded, match="over_budget ran 2 SQL statements; its budget is 1"):
+        client.get("/_test/over-budget")
+
+
+def test_route_within_budget_passes(app, client):
+    @app.route("/_test/within-budget")
+    @query_budget(1)
+    def within_budget():
+        db.session.execute(text("SELECT 1"))
+        return "ok"
+
+    assert client.get("/_test/within-budget").status_code == 200
+
+
+def test_repeated_statement_reported_as_n_plus_one_with_call_site(app):
+    with app.app_context():
+        with pytest.raises(QueryBudgetExceeded) as error:
+            with query_budget(name="loop"):
+                for user_id in range(app.config["QUERY_REPEAT_THRESHOLD"]):
+                    db.session.execute(text("SELECT :id"), {"id": user_id})
+    message = str(error.value)
+    assert "Suspected N+1 in loop" in message
+    assert "test_query_budget.py" in message and "test_repeated_statement_reported_as_n_plus_one" in message
+
+
+def test_repeats_below_threshold_pass(app):
+    with app.app_context(), query_budget(name="loop"):
+        for user_id in range(app.config["QUERY_REPEAT_THRESHOLD"] - 1):
+            db.session.execute(text("SELECT :id"), {"id": user_id})
+
+
+def test_block_error_is_not_masked_by_the_budget(app):
+    with app.app_context():
+        with pytest.raises(ZeroDivisionError):
+            with query_budget(0):
+                db.session.execute(text("SELECT 1"))
+                1 / 0
+
+
+def test_slow_query_is_logged_with_call_site(tmp_path, caplog):
+    app = make_app(tmp_path, SLOW_QUERY_MS=1e-9)
+    with caplog.at_level(logging.WARNING, logger="app.diagnostics.query_budget"), app.app_context():
+        db.session.execute(text("SELECT 42"))
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(
+        "Slow query" in message and "SELECT 42" in message and "test_slow_query_is_logged_with_call_site" in message
+        for message in messages
+    ), messages
+
+
+def test_chunked_in_queries_are_not_reported_as_n_plus_one(app, client, seed):
+    # Enough badges for more IN_CLAUSE_CHUNK_SIZE chunks than QUERY_REPEAT_THRESHOLD
+    users = IN_CLAUSE_CHUNK_SIZE * (app.config["QUERY_REPEAT_THRESHOLD"] + 1)
+    seed(users=users)
+    response = client.post("/scans/batch", json=[
+        {"badge_code": f"b{i}", "activity_name": "dinner", "activity_category": "meal"} for i in range(users)
+    ])
+
+    assert response.status_code == 200
+    assert response.get_json()["created"] == users
@@ -0,0 +1,42 @@
+from app.database import db
+from app.diagnostics import query_plans
+
+
+def test_migrations_create_every_model_index(app):
+    with app.app_context():
+        assert query_plans.missing_indexes(db.engine) == []
+
+
+def test_hot_queries_do_not_scan_large_tables(app):
+    with app.app_context():
+        assert query_plans.full_scans(db.engine) == []
+
+
+SHOWPLAN = """<ShowPlanXML xmlns="http://schemas.microsoft.com/sqlserver/2004/07/showplan"><BatchSequence><Batch><Statements>
+<StmtSimple><QueryPlan>
+  <RelOp PhysicalOp="Nested Loops">
+    <NestedLoops>
+      <RelOp PhysicalOp="Clustered Index Scan">
+        <IndexScan><Object Database="[app]" Schema="[dbo]" Table="[scans]" Index="[PK_scans]" /></IndexScan>
+      </RelOp>
+      <RelOp PhysicalOp="Index Seek">
+        <IndexScan><Object Database="[app]" Schema="[dbo]" Table="[users]" Index="[ix_users_badge_code]" /></IndexScan>
+      </RelOp>
+    </NestedLoops>
+  </RelOp>
+</QueryPlan></StmtSimple>
+</Statements></Batch></BatchSequence></ShowPlanXML>"""
+
+
+def test_sql_server_plans_report_scans_by_table():
+    lines = query_plans.showplan_operators(SHOWPLAN)
+
+    assert lines == ["Clustered Index Scan on scans", "Index Seek on users"]
+    assert [query_plans.FULL_SCAN_PATTERNS["mssql"].findall(line) for line in lines] == [["scans"], []]
+
+
+def test_unsupported_backends_are_skipped(app, monkeypatch, caplog):
+    monkeypatch.delitem(query_plans.FULL_SCAN_PATTERNS, "sqlite")
+    with app.app_context():
+        assert query_plans.full_scans(db.engine) == []
+    assert "not supported on sqlite" in caplog.text
@@ -0,0 +1,89 @@
+from sqlalchemy import func, select
+from app.cache.recent_scans import IN_PROGRESS, RecentScans
+from app.database import db
+from app.models.models import Scan, UserScan
+
+
+def make_index(**windows):
+    index = RecentScans()
+    index.configure(
+        windows.get("scan_window", 10), windows.get("category_windows", {}), windows.get("activity_windows", {}),
+        windows.get("user_scan_window", 10), windows.get("max_entries", 100), windows.get("wait_timeout", 5.0)
+    )
+    return index
+
+
+def record(index, key, result, window=10):
+    with index.claim(key, window) as claim:
+        if claim.duplicate is not None:
+            return claim.duplicate
+        claim.complete(result)
+        return result
+
+
+def count(app, model):
+    with app.app_context():
+        return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def test_repeat_within_the_window_returns_the_first_result():
+    index = make_index()
+    assert record(index, (1, "dinner"), "first") == "first"
+    assert record(index, (1, "dinner"), "second") == "first"
+    assert record(index, (2, "dinner"), "other") == "other"
+    assert index.duplicates == 1
+
+
+def test_failed_scan_releases_its_key():
+    index = make_index()
+    with index.claim((1, "dinner"), 10) as claim:
+        assert claim.duplicate is None
+    assert record(index, (1, "dinner"), "retried") == "retried"
+
+
+def test_repeat_of_a_scan_in_progress_does_not_wait_when_told_not_to():
+    index = make_index(wait_timeout=0)
+    with index.claim((1, "dinner"), 10) as first:
+        with index.claim((1, "dinner"), 10) as repeat:
+            assert repeat.duplicate == IN_PROGRESS
+        first.complete("first")
+    assert record(index, (1, "dinner"), "second") == "first"
+
+
+def test_windows_by_category_and_activity():
+    index = make_index(category_windows={"meal": 1800}, activity_windows={"breakfast": 60})
+    assert index.window_for("dinner", "meal") == 1800
+    assert index.window_for("breakfast", "meal") == 60
+    assert index.window_for("workshop", "workshop") == 10
+
+
+def test_index_is_capped_at_max_entries():
+    index = make_index(max_entries=2)
+    for user_id in range(3):
+        record(index, (user_id, "dinner"), user_id)
+    assert index.stats()["size"] == 2
+    assert record(index, (2, "dinner"), "again") == 2
+
+
+def test_repeated_activity_scan_is_recorded_once(app, client, seed):
+    seed(users=1)
+    first = client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+    second = client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+
+    assert first.get_json() == second.get_json()
+    assert count(app, Scan) == 1
+
+
+def test_repeated_badge_scan_is_recorded_once(app, client, seed):
+    seed(users=2)
+    first = client.post("/scan-badge", json={"scanner_badge": "b0", "scanned_badge": "b1"})
+    second = client.post("/scan-badge", json={"scanner_badge": "b0", "scanned_badge": "b1"})
+
+    assert first.get_json() == second.get_json()
+    assert count(app, UserScan) == 1
+
+
+def test_badge_scan_errors_keep_their_status(client, seed):
+    seed(users=1)
+    assert client.post("/scan-badge", json={"scanner_badge": "b0", "scanned_badge": "missing"}).status_code == 404
+    assert client.post("/scan-badge", json={"scanner_badge": "b0", "scanned_badge": "b0"}).status_code == 400
@@ -0,0 +1,40 @@
+from app.cache.response_cache import LocalBackend, make_backend, response_cache
+from config.config import TestConfig
+
+
+def backend_config(**overrides):
+    config = {key: getattr(TestConfig, key) for key in dir(TestConfig) if key.isupper()}
+    config.update(overrides)
+    return config
+
+
+def test_auto_backend_is_local_with_one_worker():
+    assert isinstance(make_backend(backend_config(RESPONSE_CACHE_BACKEND="auto", WEB_CONCURRENCY=1)), LocalBackend)
+
+
+def test_auto_backend_is_off_with_several_workers():
+    assert make_backend(backend_config(RESPONSE_CACHE_BACKEND="auto", WEB_CONCURRENCY=4)) is None
+
+
+def test_scan_invalidates_the_aggregate(client, seed):
+    seed(users=2)
+    client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+    assert client.get("/scans").get_json()[0]["scan_count"] == 1
+    assert client.get("/scans").get_json()[0]["scan_count"] == 1
+    hits = response_cache.stats()["hits"]
+
+    client.put("/scan/b1", json={"activity_name": "dinner", "activity_category": "meal"})
+
+    assert client.get("/scans").get_json()[0]["scan_count"] == 2
+    assert response_cache.stats()["hits"] == hits
+
+
+def test_user_page_is_tagged_with_its_owner(client, seed):
+    seed(users=3, user_scans=[(1, 2, 0)])
+    page = client.get("/scanned-users/b0").get_json()
+    assert page["user_id"] == 1
+    assert [user["id"] for user in page["users"]] == [2]
+
+    client.post("/scan-badge", json={"scanner_badge": "b0", "scanned_badge": "b2"})
+
+    assert [user["id"] for user in client.get("/scanned-users/b0").get_json()["users"]] == [2, 3]
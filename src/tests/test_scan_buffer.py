@@ -0,0 +1,71 @@
+from functools import partial
+from sqlalchemy import func, select
+from app.database import db, new_session
+from app.ingest.scan_buffer import ScanBuffer
+from app.models.models import Scan, User
+from tests.conftest import make_app
+
+
+def make_buffer(app, **options):
+    with app.app_context():
+        engine = db.engine
+    return ScanBuffer(partial(new_session, engine), **options)
+
+
+def scan_count(app):
+    with app.app_context():
+        return db.session.execute(select(func.count(Scan.id))).scalar()
+
+
+def test_group_is_committed_together(app, seed):
+    seed(users=3)
+    buffer = make_buffer(app, batch_size=10, flush_interval_ms=200, durability="enqueue")
+    pending = [buffer.submit(user_id, "dinner", "meal") for user_id in (1, 2, 3)]
+    buffer.stop()
+
+    assert all(scan.wait(1) and scan.error is None for scan in pending)
+    assert scan_count(app) == 3
+    assert buffer.stats()["flushed"] == 3
+
+
+def test_scans_are_stamped_by_the_database(app, seed):
+    seed(users=1)
+    buffer = make_buffer(app, durability="flush")
+    pending = buffer.submit(1, "dinner", "meal")
+    assert pending.wait(1) and pending.error is None
+    buffer.stop()
+
+    with app.app_context():
+        stored = db.session.execute(select(Scan.scanned_at)).scalar_one()
+    assert pending.scanned_at == stored
+
+
+def test_one_bad_scan_fails_alone(app, seed):
+    seed(users=3)
+    buffer = make_buffer(app, batch_size=10, flush_interval_ms=200, durability="enqueue")
+    good = [buffer.submit(user_id, "dinner", "meal") for user_id in (1, 2)]
+    # activities.activity_category is NOT NULL, so this scan's activity can't be created
+    bad = buffer.submit(3, "hackathon", None)
+    buffer.stop()
+
+    assert all(scan.wait(1) and scan.error is None for scan in good)
+    assert bad.wait(1) and bad.error is not None
+    assert scan_count(app) == 2
+    stats = buffer.stats()
+    assert (stats["flushed"], stats["failed"]) == (2, 1)
+
+
+def test_buffered_scan_waits_with_the_app_ack_timeout(tmp_path):
+    app = make_app(tmp_path, SCAN_INGEST_MODE="buffered", SCAN_BUFFER_ACK_TIMEOUT=2.5)
+    buffer = app.extensions["scan_buffer"]
+    assert buffer.ack_timeout == 2.5
+    with app.app_context():
+        db.session.add(User(name="User", email="user@example.com", phone="555-0000", badge_code="b0"))
+        db.session.commit()
+
+    response = app.test_client().put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+    buffer.stop()
+
+    assert response.status_code == 200
+    assert response.get_json()["scanned_at"] is not None
+    assert scan_count(app) == 1
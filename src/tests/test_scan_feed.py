@@ -0,0 +1,58 @@
+import pytest
+from app.cache.scan_feed import FeedFull, ScanFeed
+from app.cache.activity_cache import ActivityRef
+from tests.conftest import make_app
+
+
+class Row:
+    def __init__(self, activity_name, activity_category, scan_count):
+        self.activity_name = activity_name
+        self.activity_category = activity_category
+        self.scan_count = scan_count
+
+
+def make_feed(max_clients=10):
+    feed = ScanFeed()
+    feed.configure(max_rate=0, heartbeat_interval=15, reconcile_interval=5, max_clients=max_clients)
+    feed.load([Row("dinner", "meal", 3)])
+    return feed
+
+
+def test_subscriber_gets_a_snapshot_then_merged_deltas():
+    feed = make_feed()
+    wakes = []
+    subscriber, snapshot = feed.subscribe(lambda: wakes.append(1))
+    assert snapshot == [{"activity_name": "dinner", "activity_category": "meal", "scan_count": 3}]
+
+    dinner = ActivityRef(1, "dinner", "meal")
+    feed.publish({dinner: 1})
+    feed.publish({dinner: 2})
+
+    assert len(wakes) == 2
+    assert feed.drain(subscriber) == [{"activity_name": "dinner", "activity_category": "meal", "scan_count": 6, "delta": 3}]
+    assert feed.drain(subscriber) == []
+
+
+def test_reconcile_publishes_other_processes_scans():
+    feed = make_feed()
+    subscriber, _ = feed.subscribe(lambda: None)
+    feed.reconcile([Row("dinner", "meal", 5), Row("workshop", "workshop", 1)])
+
+    assert [(change["activity_name"], change["delta"]) for change in feed.drain(subscriber)] == [("dinner", 2), ("workshop", 1)]
+
+
+def test_subscribe_stops_at_max_clients():
+    feed = make_feed(max_clients=1)
+    subscriber, _ = feed.subscribe(lambda: None)
+    with pytest.raises(FeedFull):
+        feed.subscribe(lambda: None)
+    feed.unsubscribe(subscriber)
+    feed.subscribe(lambda: None)
+
+
+def test_sync_stream_leaves_a_thread_for_other_requests(tmp_path):
+    client = make_app(tmp_path, WEB_THREADS=1).test_client()
+    response = client.get("/scans/stream")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
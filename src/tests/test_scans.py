@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.database import db
+from app.models.models import Scan
+from tests.conftest import make_app
+
+
+def stored_scan_times(app):
+    with app.app_context():
+        return db.session.execute(select(Scan.scanned_at).order_by(Scan.id)).scalars().all()
+
+
+def test_batch_uses_the_database_clock(app, client, seed):
+    seed(users=2)
+    response = client.post("/scans/batch", json=[
+        {"badge_code": "b0", "activity_name": "dinner", "activity_category": "meal"},
+        {"badge_code": "b1", "activity_name": "dinner", "activity_category": "meal",
+         "scanned_at": "2025-02-21T13:00:00-05:00"},
+    ])
+
+    assert response.status_code == 200
+    defaulted, supplied = stored_scan_times(app)
+    # SQLite's CURRENT_TIMESTAMP is UTC, so both scans are stored in UTC
+    utc_now = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert abs(defaulted - utc_now) < timedelta(seconds=5)
+    assert supplied == datetime(2025, 2, 21, 18, 0)
+    assert [result["scanned_at"] for result in response.get_json()["results"]] == [
+        defaulted.isoformat(), "2025-02-21T18:00:00"
+    ]
+
+
+def test_single_scan_and_batch_agree(app, client, seed):
+    seed(users=2)
+    client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+    client.post("/scans/batch", json=[{"badge_code": "b1", "activity_name": "dinner", "activity_category": "meal"}])
+
+    single, batch = stored_scan_times(app)
+    assert abs(batch - single) < timedelta(seconds=5)
+
+
+def test_time_buckets_fill_the_range(client, seed):
+    seed(users=1, scans=[(1, 1, 5), (1, 1, 20)])
+    response = client.get("/scan_count_by_time_period?activity_name=dinner&start=2025-02-21T18:00&end=2025-02-21T19:00&bucket=15m")
+
+    assert [bucket["count"] for bucket in response.get_json()["time_distribution"]] == [1, 1, 0, 0]
+
+
+def test_time_bucket_limit_comes_from_app_config(tmp_path):
+    client = make_app(tmp_path, TIME_BUCKET_MAX_COUNT=3).test_client()
+    response = client.get("/scan_count_by_time_period?activity_name=dinner&start=2025-02-21T18:00&end=2025-02-21T19:00&bucket=15m")
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Range spans 4 buckets; the maximum is 3"
@@ -0,0 +1,36 @@
+from app.database import db, new_session
+from app.cache.badge_cache import badge_cache
+from app.repositories.user_repository import UserRepository
+from tests.conftest import make_app
+
+
+def lookup(app, badge_code, replica):
+    with app.app_context():
+        session = new_session(db.engine, read_only=True)
+        session.info["replica"] = replica
+        try:
+            return UserRepository.get_user_ref_by_badge_code(session, badge_code)
+        finally:
+            session.close()
+
+
+def test_primary_lookups_fill_the_badge_cache(app, seed):
+    seed(users=1)
+    assert lookup(app, "b0", replica=False).id == 1
+    assert badge_cache.get("b0").id == 1
+
+
+def test_replica_lookups_skip_the_badge_cache(app, seed):
+    seed(users=1)
+    assert lookup(app, "b0", replica=True).id == 1
+    assert badge_cache.get("b0") is None
+
+
+def test_badge_cache_ttl_is_capped_with_several_workers(tmp_path):
+    make_app(tmp_path, WEB_CONCURRENCY=4, BADGE_CACHE_TTL=300, BADGE_CACHE_MULTI_WORKER_TTL=5)
+    assert badge_cache.ttl == 5
+
+
+def test_badge_cache_ttl_is_kept_with_one_worker(tmp_path):
+    make_app(tmp_path, WEB_CONCURRENCY=1, BADGE_CACHE_TTL=300)
+    assert badge_cache.ttl == 300
@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime as http_date
+from sqlalchemy import update
+from app.database import db
+from app.models.models import User
+from tests.conftest import make_app
+
+
+def set_updated_at(app, user_id, updated_at):
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == user_id).values(updated_at=updated_at))
+        db.session.commit()
+
+
+def test_unchanged_profile_is_not_modified(client, seed):
+    seed(users=1)
+    first = client.get("/users/1")
+    assert first.status_code == 200
+
+    assert client.get("/users/1", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.get("/users/1", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+
+def test_scan_changes_the_etag(client, seed):
+    seed(users=1)
+    etag = client.get("/users/1").headers["ETag"]
+    client.put("/scan/b0", json={"activity_name": "dinner", "activity_category": "meal"})
+
+    response = client.get("/users/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_last_modified_uses_the_database_zone(tmp_path):
+    app = make_app(tmp_path, DB_TIMEZONE="America/Toronto")
+    with app.app_context():
+        db.session.add(User(name="User", email="user@example.com", phone="555-0000", badge_code="b0"))
+        db.session.commit()
+    set_updated_at(app, 1, datetime(2025, 2, 21, 13, 0, 0))
+
+    response = app.test_client().get("/users/1")
+    # 13:00 in Toronto in February is 18:00 UTC, whatever this host's zone is
+    assert response.headers["Last-Modified"] == http_date(datetime(2025, 2, 21, 18, 0, tzinfo=timezone.utc), usegmt=True)
+
+
+def test_cursor_walks_every_page(client, seed):
+    seed(users=5)
+    ids, cursor = [], None
+    while True:
+        page = client.get("/users", query_string={"limit": 2, "cursor": cursor} if cursor else {"limit": 2}).get_json()
+        ids += [user["id"] for user in page["users"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [1, 2, 3, 4, 5]
+
+
+def test_invalid_cursor_is_rejected(client, seed):
+    seed(users=1)
+    assert client.get("/users", query_string={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_page_size_comes_from_app_config(tmp_path):
+    app = make_app(tmp_path, PAGE_SIZE_DEFAULT=1, PAGE_SIZE_MAX=2)
+    with app.app_context():
+        db.session.add_all([
+            User(name=f"User {i}", email=f"user{i}@example.com", phone=f"555-{i:04d}", badge_code=f"b{i}") for i in range(3)
+        ])
+        db.session.commit()
+    client = app.test_client()
+
+    assert client.get("/users").get_json()["limit"] == 1
+    assert len(client.get("/users?limit=50").get_json()["users"]) == 2